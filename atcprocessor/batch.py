@@ -0,0 +1,560 @@
+import os
+import json
+import time
+import logging
+import traceback
+from collections import namedtuple
+from glob import glob
+from multiprocessing import Pool
+
+import pandas as pd
+
+from . import processor
+from .summary import combine_summaries, SUMMARY_NAME
+from .instrument import StageRecorder, RUN_REPORT_NAME
+from .manifest import (BuildManifest, build_digest, frame_digest,
+                       input_digest)
+from .progress import Progress, Cancelled
+from .render import SCATTER_MODES
+from .writers import check_output_format
+from .utilities import make_folder_if_necessary
+from .version import __version__
+
+logger = logging.getLogger(__name__)
+
+# Defaults match those used by the GUI, so a partial settings file behaves
+# the same way whether it is run from the GUI or headless
+DEFAULT_SETTINGS = {
+    'input_folder': '',
+    'site_list': '',
+    'path_to_csv': '',
+    'output_folder': '',
+    'site_col': '',
+    'count_col': '',
+    'dir_col': '',
+    'date_col': '',
+    'time_col': '',
+    'std_range': 2.0,
+    'combined_datetime': False,
+    'hour_only': True,
+    'by_direction': True,
+    'valid_only': True,
+    'clean_data': True,
+    'outside_std_invalid': False,
+    'outage_hours': 0.0,
+    'rolling_baseline': False,
+    'baseline_weeks': 8.0,
+}
+
+REPORT_NAME = 'Batch Report.csv'
+
+# Each input's part of a consolidated summary, kept so inputs that haven't
+# changed needn't be cleaned again to rebuild it
+INPUT_SUMMARIES_FOLDER = 'Input Summaries'
+
+# Pipeline stages, in the order they are run
+STAGES = ('clean', 'summary', 'aggregates', 'scatter', 'facets', 'calendar')
+CLEANED_STAGES = ('summary', 'aggregates', 'scatter')
+
+# Saving the aggregates is only done when asked for
+DEFAULT_STAGES = tuple(s for s in STAGES if s != 'aggregates')
+
+# Stages that can be timed and profiled, including loading the input
+PROFILE_STAGES = ('load',) + STAGES
+
+GRAPH_FORMATS = ('png', 'pdf', 'svg')
+
+FileResult = namedtuple('FileResult', ['source', 'site', 'success',
+                                       'error_type', 'error', 'details'])
+
+# Everything a task hands back to the main process
+TaskOutcome = namedtuple('TaskOutcome', ['result', 'summary',
+                                         'manifest_updates', 'stage_records'])
+
+# Thresholds, settings and run options held by each worker process. These
+# are sent once when the pool starts rather than with every file.
+_worker_state = {}
+
+
+def load_settings(path_to_json):
+    with open(path_to_json, 'r') as f:
+        settings = json.load(f)
+
+    unknown = set(settings) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError(
+            'The settings file contains the following unrecognised '
+            'settings:\n' + '\n'.join(sorted(unknown))
+        )
+
+    return dict(DEFAULT_SETTINGS, **settings)
+
+
+def check_stages(stages):
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(
+            'Unrecognised stages: {}. Choose from: {}'.format(
+                ', '.join(sorted(unknown)), ', '.join(STAGES))
+        )
+
+    needs_cleaning = [s for s in CLEANED_STAGES if s in stages]
+    if needs_cleaning and 'clean' not in stages:
+        raise ValueError(
+            'The following stages require the "clean" stage:\n'
+            + '\n'.join(needs_cleaning)
+        )
+
+
+def _stage_digests(data, thresholds, settings, stages, date_format,
+                   incremental, consolidated_summary, graph_format,
+                   scatter_mode, output_format, database):
+    # Folders don't change the outputs, everything else might
+    base = build_digest(
+        input_digest(data), frame_digest(thresholds.data),
+        {k: v for k, v in settings.items()
+         if k not in ('input_folder', 'output_folder')},
+        date_format, incremental
+    )
+    options = {
+        'clean': [output_format, database],
+        'summary': [consolidated_summary],
+        'scatter': [graph_format, scatter_mode],
+        'facets': [graph_format],
+        'calendar': [graph_format],
+    }
+
+    return {s: build_digest(base, s, *options.get(s, [])) for s in stages}
+
+
+def process_file(data, thresholds, settings, stages=DEFAULT_STAGES,
+                 graph_format='png', chunksize=None, date_format=None,
+                 compact=False, cache=None, incremental=False,
+                 consolidated_summary=False, graph_workers=1,
+                 scatter_mode='points', manifest=None, source=None,
+                 recorder=None, progress=None, output_format='csv',
+                 write_workers=1, database=None, engine='long',
+                 graph_pool=None):
+    # Cleaning stages only run when the settings ask for cleaning
+    stages = [s for s in STAGES if s in stages]
+    if not settings['clean_data']:
+        stages = [s for s in stages
+                  if s not in ('clean',) + CLEANED_STAGES]
+
+    # With a manifest, only run stages whose inputs or settings have changed
+    # since they were last run, or whose outputs have gone
+    if source is None and not isinstance(data, pd.DataFrame):
+        source = data
+
+    if progress is None:
+        progress = Progress()
+
+    digests = None
+    if manifest is not None:
+        digests = _stage_digests(data, thresholds, settings, stages,
+                                 date_format, incremental,
+                                 consolidated_summary, graph_format,
+                                 scatter_mode, output_format, database)
+        stale = [s for s in stages
+                 if not manifest.is_current(manifest.key(source, s),
+                                            digests[s])]
+
+        if not stale:
+            logger.info('Up to date: %s', source)
+            progress.update(source, None, None, 1.0)
+            return None
+
+        # With cleaning on, every later stage is drawn from the cleaned
+        # data, whose lanes and intervals have been totalled by hour, so
+        # needs it in memory
+        if 'clean' in stages and any(s != 'clean' for s in stale):
+            stale.append('clean')
+        stages = [s for s in stages if s in stale]
+
+    if recorder is None:
+        recorder = StageRecorder()
+
+    # Cancelling takes effect between stages, loading counts as one
+    steps = len(stages) + 1
+    progress.check()
+    progress.update(source, None, 'load', 0.0)
+    with recorder.stage('load', source) as run:
+        c = processor.CountSite(
+            data=data, thresholds=thresholds,
+            output_folder=settings['output_folder'],
+            site_col=settings['site_col'],
+            count_col=settings['count_col'],
+            dir_col=settings['dir_col'],
+            date_col=settings['date_col'],
+            time_col=settings['time_col'],
+            combined_datetime=settings['combined_datetime'],
+            hour_only=settings['hour_only'],
+            graph_format=graph_format,
+            chunksize=chunksize,
+            date_format=date_format,
+            compact=compact,
+            cache=cache,
+            graph_workers=graph_workers,
+            output_format=output_format,
+            write_workers=write_workers,
+            database=database,
+            graph_pool=graph_pool
+        )
+        run.count_site = c
+
+    for i, stage in enumerate(stages, 1):
+        progress.check()
+        progress.update(source, None, stage, i / steps)
+        first_output = len(c.written)
+        with recorder.stage(stage, source, c):
+            _run_stage(c, stage, settings, incremental, consolidated_summary,
+                       scatter_mode, engine, source)
+
+        if manifest is not None:
+            manifest.record(manifest.key(source, stage), digests[stage],
+                            c.written[first_output:])
+
+    progress.update(source, None, None, 1.0)
+    return c
+
+
+def input_summary_path(output_folder, source):
+    """
+    Where the part of a consolidated summary from source is kept.
+    """
+    return os.path.join(output_folder, INPUT_SUMMARIES_FOLDER,
+                        build_digest(source)[:16] + '.csv')
+
+
+def _run_stage(c, stage, settings, incremental, consolidated_summary,
+               scatter_mode, engine, source=None):
+    if stage == 'clean':
+        c.clean_data(std_range=settings['std_range'],
+                     outside_std_invalid=settings['outside_std_invalid'],
+                     incremental=incremental, engine=engine,
+                     outage_hours=settings['outage_hours'],
+                     rolling_baseline=settings['rolling_baseline'],
+                     baseline_weeks=settings['baseline_weeks'])
+    elif stage == 'summary':
+        # A consolidated summary is left in c.summary for the caller to
+        # combine with those of other files and write
+        summary = c.summarise_cleaned_data(write=not consolidated_summary)
+        if consolidated_summary and source is not None:
+            dest = input_summary_path(settings['output_folder'], source)
+            make_folder_if_necessary(dest)
+            summary.to_csv(dest, index=False)
+            c.written.append(dest)
+    elif stage == 'aggregates':
+        c.write_aggregates()
+    elif stage == 'scatter':
+        c.cleaned_scatter(mode=scatter_mode)
+    elif stage == 'facets':
+        c.facet_grids(valid_only=settings['valid_only'],
+                      by_direction=settings['by_direction'])
+    elif stage == 'calendar':
+        c.produce_cal_plots(valid_only=settings['valid_only'],
+                            by_direction=settings['by_direction'])
+
+
+def _init_worker(thresholds, settings, options, progress, graph_pool=None):
+    _worker_state['thresholds'] = thresholds
+    _worker_state['settings'] = settings
+    _worker_state['options'] = options
+    _worker_state['progress'] = progress
+    _worker_state['graph_pool'] = graph_pool
+
+
+def _run_task(task):
+    source, site, data, (start, end) = task
+    settings = _worker_state['settings']
+    options = dict(_worker_state['options'])
+    use_manifest = options.pop('use_manifest')
+    force = options.pop('force')
+    profile_stage = options.pop('profile_stage')
+
+    key = os.path.relpath(source, settings['input_folder'])
+    options['source'] = key if site is None else '{}|{}'.format(key, site)
+    options['progress'] = _worker_state['progress'].span(start, end,
+                                                         file=key, site=site)
+    options['graph_pool'] = _worker_state['graph_pool']
+
+    # Each task reads the manifest, and hands back what it ran and how long
+    # it took for the main process to record
+    manifest = None
+    updates = dict()
+    if use_manifest:
+        manifest = BuildManifest(settings['output_folder'], force=force)
+        options['manifest'] = manifest
+        # Stages that finish before any error are still recorded
+        updates = manifest.updates
+    recorder = StageRecorder(profile_stage,
+                             os.path.join(settings['output_folder'],
+                                          'Profiles'))
+
+    try:
+        c = process_file(data if data is not None else source,
+                         _worker_state['thresholds'], settings,
+                         recorder=recorder, **options)
+    except Cancelled as e:
+        return TaskOutcome(
+            FileResult(source, site, False, type(e).__name__, str(e), None),
+            None, updates, recorder.records
+        )
+    except Exception as e:
+        options['progress'].update(None, None, None, 1.0)
+        return TaskOutcome(
+            FileResult(source, site, False, type(e).__name__, str(e),
+                       traceback.format_exc()),
+            None, updates, recorder.records
+        )
+
+    # Read back whether or not the summary stage was run this time, so
+    # every file's summary reaches the caller the same way
+    summary = None
+    path = input_summary_path(settings['output_folder'], options['source'])
+    if options['consolidated_summary'] and settings['clean_data'] \
+            and 'summary' in options['stages'] and os.path.isfile(path):
+        summary = pd.read_csv(path)
+
+    return TaskOutcome(FileResult(source, site, True, None, None, None),
+                       summary, updates, recorder.records)
+
+
+class BatchReport:
+    def __init__(self, results):
+        self.results = sorted(results, key=lambda r: (r.source, r.site or ''))
+
+    @property
+    def failures(self):
+        return [r for r in self.results if not r.success]
+
+    @property
+    def succeeded(self):
+        return not self.failures
+
+    def to_frame(self):
+        return pd.DataFrame(list(self.results), columns=FileResult._fields)
+
+    def write(self, destination_path):
+        make_folder_if_necessary(destination_path)
+        self.to_frame().to_csv(destination_path, index=False)
+
+
+class BatchRunner:
+    def __init__(self, settings, workers=None, split_sites=False,
+                 stages=DEFAULT_STAGES, graph_format='png', chunksize=None,
+                 date_format=None, compact=False, cache=None,
+                 incremental=False, consolidated_summary=False,
+                 graph_workers=1, scatter_mode='points', use_manifest=True,
+                 force=False, profile_stage=None, output_format='csv',
+                 write_workers=1, database=None, engine='long'):
+        if not isinstance(settings, dict):
+            settings = load_settings(settings)
+        else:
+            settings = dict(DEFAULT_SETTINGS, **settings)
+        self.settings = settings
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self.workers = workers
+
+        # Pool workers can't start pools of their own
+        if graph_workers < 1:
+            raise ValueError('graph_workers must be at least 1')
+        if workers > 1 and graph_workers > 1:
+            raise ValueError(
+                'Graphs can only be drawn in parallel when files are '
+                'processed one at a time (workers=1)'
+            )
+        self.split_sites = split_sites
+
+        check_stages(stages)
+        if incremental and set(stages) != {'clean'}:
+            raise ValueError(
+                'Incremental runs only add to the cleaned data, so only the '
+                '"clean" stage can be run'
+            )
+        if incremental and settings['rolling_baseline']:
+            raise ValueError(
+                'A rolling baseline can\'t be used with incremental runs'
+            )
+        if graph_format not in GRAPH_FORMATS:
+            raise ValueError(
+                'graph_format must be one of: ' + ', '.join(GRAPH_FORMATS)
+            )
+        if scatter_mode not in SCATTER_MODES:
+            raise ValueError(
+                'scatter_mode must be one of: ' + ', '.join(SCATTER_MODES)
+            )
+        if engine not in processor.CLEANING_ENGINES:
+            raise ValueError(
+                'engine must be one of: '
+                + ', '.join(processor.CLEANING_ENGINES)
+            )
+        check_output_format(output_format)
+        if write_workers < 1:
+            raise ValueError('write_workers must be at least 1')
+        if profile_stage is not None and profile_stage not in PROFILE_STAGES:
+            raise ValueError(
+                'profile_stage must be one of: ' + ', '.join(PROFILE_STAGES)
+            )
+        self.options = dict(stages=tuple(stages), graph_format=graph_format,
+                            chunksize=chunksize, date_format=date_format,
+                            compact=compact, cache=cache,
+                            incremental=incremental,
+                            consolidated_summary=consolidated_summary,
+                            graph_workers=graph_workers,
+                            scatter_mode=scatter_mode,
+                            use_manifest=use_manifest, force=force,
+                            profile_stage=profile_stage,
+                            output_format=output_format,
+                            write_workers=write_workers,
+                            database=database, engine=engine)
+
+        # Load once, workers receive their copy when the pool starts
+        self.thresholds = processor.Thresholds(
+            path_to_csv=settings['path_to_csv'],
+            site_list=settings['site_list']
+        )
+        if settings['site_col'] in self.thresholds.data.columns:
+            self.thresholds.compile(settings['site_col'])
+
+    def input_files(self):
+        return sorted(glob(os.path.join(self.settings['input_folder'],
+                                        '*.csv')))
+
+    def _tasks(self, input_files, progress):
+        # Each task carries the share of the run it covers, for progress
+        for i, f in enumerate(input_files):
+            if progress.cancelled:
+                return
+
+            start, end = i / len(input_files), (i + 1) / len(input_files)
+            if not self.split_sites:
+                yield f, None, None, (start, end)
+                continue
+
+            # Splitting by site means reading here and sending each site's
+            # rows on. Any problem reading the file is reported by the worker.
+            try:
+                data = pd.read_csv(f)
+                site_groups = data.groupby(self.settings['site_col'])
+            except Exception:
+                yield f, None, None, (start, end)
+                continue
+
+            width = (end - start) / site_groups.ngroups
+            for j, (site, site_data) in enumerate(site_groups):
+                yield (f, str(site), site_data.reset_index(drop=True),
+                       (start + j * width, start + (j + 1) * width))
+
+    def run(self, input_files=None, progress=None):
+        """
+        Process every input, returning a BatchReport. progress, a Progress,
+        is told how far the run has got. Once it is cancelled, inputs yet to
+        start are skipped and those underway stop before their next stage.
+        """
+        if input_files is None:
+            input_files = self.input_files()
+        if not input_files:
+            raise ValueError(
+                'No CSV files could be found in {}'.format(
+                    self.settings['input_folder'])
+            )
+
+        settings_dest = os.path.join(self.settings['output_folder'],
+                                     'settings.json')
+        make_folder_if_necessary(settings_dest)
+        with open(settings_dest, 'w') as f:
+            json.dump(self.settings, f, indent=4)
+
+        if progress is None:
+            progress = Progress()
+
+        started = time.time()
+        tasks = self._tasks(input_files, progress)
+        if self.workers == 1:
+            # One pool draws the graphs of every file, rather than each
+            # stage of each file starting its own
+            graph_workers = self.options['graph_workers']
+            graph_pool = Pool(graph_workers) if graph_workers > 1 else None
+            _init_worker(self.thresholds, self.settings, self.options,
+                         progress, graph_pool)
+            try:
+                outcomes = [_run_task(t) for t in tasks]
+            finally:
+                if graph_pool is not None:
+                    graph_pool.close()
+                    graph_pool.join()
+                _worker_state['graph_pool'] = None
+        else:
+            # Workers can't call back, so progress is reported as each
+            # task finishes
+            spans = dict()
+
+            def track(tasks):
+                for t in tasks:
+                    spans[t[0], t[1]] = t[3][1] - t[3][0]
+                    yield t
+
+            pool = Pool(self.workers, initializer=_init_worker,
+                        initargs=(self.thresholds, self.settings,
+                                  self.options, progress))
+            try:
+                outcomes = []
+                done = 0.0
+                for o in pool.imap_unordered(_run_task, track(tasks)):
+                    outcomes.append(o)
+                    done += spans[o.result.source, o.result.site]
+                    progress.update(
+                        os.path.relpath(o.result.source,
+                                        self.settings['input_folder']),
+                        o.result.site, None, min(done, 1.0)
+                    )
+            finally:
+                pool.close()
+                pool.join()
+
+        results = [o.result for o in outcomes]
+        summaries = [o.summary for o in outcomes if o.summary is not None]
+
+        if self.options['use_manifest']:
+            manifest = BuildManifest(self.settings['output_folder'])
+            for o in outcomes:
+                manifest.update(o.manifest_updates)
+            manifest.save()
+        if summaries:
+            dest = os.path.join(self.settings['output_folder'], SUMMARY_NAME)
+            make_folder_if_necessary(dest)
+            combine_summaries(summaries, [self.settings['site_col']])\
+                .to_csv(dest, index=False)
+
+        report = BatchReport(results)
+        report.write(os.path.join(self.settings['output_folder'],
+                                  REPORT_NAME))
+        self.write_run_report(started, outcomes)
+
+        return report
+
+    def write_run_report(self, started, outcomes):
+        finished = time.time()
+        run_report = {
+            'version': __version__,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                     time.localtime(started)),
+            'wall_time': finished - started,
+            'workers': self.workers,
+            'options': {k: v for k, v in self.options.items()
+                        if k != 'cache'},
+            'inputs': [dict(o.result._asdict(), stages=o.stage_records)
+                       for o in sorted(outcomes,
+                                       key=lambda o: (o.result.source,
+                                                      o.result.site or ''))],
+        }
+
+        # Next to settings.json
+        dest = os.path.join(self.settings['output_folder'], RUN_REPORT_NAME)
+        with open(dest, 'w') as f:
+            json.dump(run_report, f, indent=4, default=str)
@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+from glob import glob
+
+import pandas as pd
+
+from .utilities import atomic_write
+from .version import __version__
+
+CACHE_EXTENSION = '.parquet'
+
+# Default limit on the total size of a cache folder, in bytes
+DEFAULT_MAX_SIZE = 5 * 1024 ** 3
+
+
+def _hash(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()[:16]
+
+
+def file_digest(path, block_size=2 ** 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed input files, stored as Parquet.
+
+    Entries are keyed on the input file and the settings used to parse it.
+    By default a file is identified by its path, size and modification
+    time. Set hash_contents to identify it by its contents instead.
+    """
+    def __init__(self, folder, max_size=DEFAULT_MAX_SIZE,
+                 hash_contents=False):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                'pyarrow is required to cache parsed input files. Install '
+                'it with: pip install pyarrow'
+            )
+
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.folder = folder
+        self.max_size = max_size
+        self.hash_contents = hash_contents
+
+    def _source_prefix(self, path):
+        return _hash(os.path.abspath(path))
+
+    def path_for(self, path, settings):
+        stat = os.stat(path)
+        key = {
+            'version': __version__,
+            'size': stat.st_size,
+            'settings': settings,
+        }
+        if self.hash_contents:
+            key['contents'] = file_digest(path)
+        else:
+            key['mtime'] = stat.st_mtime
+
+        # Entries from the same input share a prefix so they can be
+        # invalidated together
+        name = '{}-{}{}'.format(self._source_prefix(path),
+                                _hash(json.dumps(key, sort_keys=True)),
+                                CACHE_EXTENSION)
+
+        return os.path.join(self.folder, name)
+
+    def load(self, path, settings):
+        cache_path = self.path_for(path, settings)
+        try:
+            data = pd.read_parquet(cache_path)
+        except (IOError, OSError, ValueError):
+            # Missing, or left unreadable by an interrupted run
+            return None
+
+        # Mark as recently used
+        try:
+            os.utime(cache_path, None)
+        except OSError:
+            pass
+
+        return data
+
+    def store(self, path, settings, data):
+        cache_path = self.path_for(path, settings)
+
+        atomic_write(cache_path,
+                     lambda tmp_path: data.to_parquet(tmp_path,
+                                                      engine='pyarrow'))
+
+        self.evict(keep=cache_path)
+
+    def entries(self):
+        entries = []
+        for f in glob(os.path.join(self.folder, '*' + CACHE_EXTENSION)):
+            try:
+                stat = os.stat(f)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, f))
+
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        # Remove least recently used entries until under the size limit
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, f in entries:
+            if total <= self.max_size:
+                break
+            if f == keep:
+                continue
+            self._remove(f)
+            total -= size
+
+    def invalidate(self, paths=None):
+        if paths is None:
+            files = [f for _, _, f in self.entries()]
+        else:
+            files = []
+            for p in paths:
+                files.extend(glob(os.path.join(
+                    self.folder,
+                    self._source_prefix(p) + '-*' + CACHE_EXTENSION
+                )))
+
+        for f in files:
+            self._remove(f)
+
+        return len(files)
+
+    @staticmethod
+    def _remove(path):
+        # Another process may have removed it already
+        try:
+            os.remove(path)
+        except OSError:
+            pass
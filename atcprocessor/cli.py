@@ -0,0 +1,244 @@
+import os
+import sys
+import logging
+import argparse
+from glob import glob
+
+from . import batch, dates, schema
+from .cache import ParseCache, DEFAULT_MAX_SIZE
+from .processor import CLEANING_ENGINES
+from .progress import Progress, TextProgress
+from .render import SCATTER_MODES
+from .writers import OUTPUT_FORMATS
+from .version import VERSION_TITLE
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='atcprocessor',
+                                     description=VERSION_TITLE)
+    parser.add_argument('--log-level', default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='Level of progress messages shown')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run = commands.add_parser(
+        'run', help='Process all input files using a saved settings file'
+    )
+    run.add_argument('settings', help='Path to a settings.json file')
+    run.add_argument('--stages', nargs='+', choices=batch.STAGES,
+                     default=list(batch.DEFAULT_STAGES),
+                     help='Stages to run (default: all but aggregates)')
+    run.add_argument('--workers', type=int, default=None,
+                     help='Number of worker processes (default: one per CPU)')
+    run.add_argument('--split-sites', action='store_true',
+                     help='Process each site separately rather than each '
+                          'file')
+    run.add_argument('--graph-format', choices=batch.GRAPH_FORMATS,
+                     default='png', help='File format for graphs')
+    run.add_argument('--chunksize', type=int, default=None,
+                     help='Read input files this many rows at a time to '
+                          'limit memory use')
+    run.add_argument('--date-format', default=None,
+                     help='strptime format of the date column, e.g. '
+                          '%%d/%%m/%%Y, or "{}" to work it out from the '
+                          'data'.format(dates.SNIFF))
+    run.add_argument('--compact', action='store_true',
+                     help='Store data using categorical and smaller integer '
+                          'types to reduce memory use')
+    run.add_argument('--cache-dir', default=None,
+                     help='Folder to cache parsed input files in, so '
+                          'unchanged files are not parsed again')
+    run.add_argument('--cache-size', type=float,
+                     default=DEFAULT_MAX_SIZE / 1024 ** 2,
+                     help='Maximum size of the cache in MB. Least recently '
+                          'used files are removed beyond this')
+
+    run.add_argument('--incremental', action='store_true',
+                     help='Only clean records newer than the last '
+                          'incremental run, appending them to the cleaned '
+                          'data. Requires --stages clean')
+    run.add_argument('--consolidated-summary', action='store_true',
+                     help='Write one cleaning summary covering every site '
+                          'rather than one per site')
+    run.add_argument('--scatter-mode', choices=SCATTER_MODES,
+                     default='points',
+                     help='"points" draws a marker for every record on the '
+                          'cleaned scatter. "binned" draws each status as '
+                          'one image, which is faster and smaller for large '
+                          'amounts of data')
+    run.add_argument('--profile-stage', choices=batch.PROFILE_STAGES,
+                     default=None,
+                     help='Profile this stage with cProfile, writing a '
+                          'profile for each input to the Profiles folder '
+                          'in the output folder')
+    run.add_argument('--force', action='store_true',
+                     help='Run every stage for every input, even those '
+                          'whose inputs and settings are unchanged since '
+                          'the last run')
+    run.add_argument('--graph-workers', type=int, default=1,
+                     help='Number of processes used to draw each file\'s '
+                          'graphs. Only available with --workers 1')
+    run.add_argument('--output-format', choices=OUTPUT_FORMATS,
+                     default='csv',
+                     help='Format of the cleaned data. "parquet" writes a '
+                          'folder for each site with a file for each year, '
+                          'and needs pyarrow')
+    run.add_argument('--write-workers', type=int, default=1,
+                     help='Number of threads used to write cleaned data, '
+                          'one site at a time')
+    run.add_argument('--database', default=None,
+                     help='SQLite database to add the cleaned data of '
+                          'every site to, for querying with '
+                          'atcprocessor.store.CountStore')
+    run.add_argument('--engine', choices=CLEANING_ENGINES,
+                     default='long',
+                     help='How cleaning checks are run. "dense" places '
+                          'counts on a grid of site by direction by time, '
+                          'which is faster but uses more memory where '
+                          'sites cover different periods. Both give the '
+                          'same results')
+    run.add_argument('--progress', action='store_true',
+                     help='Show a progress bar. Use with --log-level '
+                          'WARNING to keep it on one line')
+
+    check = commands.add_parser(
+        'check', help='Check every input file has the same columns, column '
+                      'types and date format before running'
+    )
+    check.add_argument('settings', help='Path to a settings.json file')
+    check.add_argument('--workers', type=int, default=schema.DEFAULT_WORKERS,
+                       help='Number of threads reading input files')
+    check.add_argument('--cache', default=None,
+                       help='File to keep each input\'s schema in, so '
+                            'unchanged files are not read again')
+    check.add_argument('--report', default=None,
+                       help='CSV file to write the schema and any problems '
+                            'of every input file to')
+
+    cache = commands.add_parser('cache',
+                                help='Manage the parsed input file cache')
+    cache_commands = cache.add_subparsers(dest='cache_command')
+    cache_commands.required = True
+
+    clear = cache_commands.add_parser(
+        'clear', help='Remove cached files, for all inputs or those given'
+    )
+    clear.add_argument('cache_dir', help='Cache folder')
+    clear.add_argument('inputs', nargs='*',
+                       help='Input files to remove from the cache')
+
+    info = cache_commands.add_parser('info',
+                                     help='Show the size of the cache')
+    info.add_argument('cache_dir', help='Cache folder')
+
+    return parser
+
+
+def run(args):
+    try:
+        cache = None
+        if args.cache_dir:
+            cache = ParseCache(args.cache_dir,
+                               max_size=int(args.cache_size * 1024 ** 2))
+
+        runner = batch.BatchRunner(args.settings, workers=args.workers,
+                                   split_sites=args.split_sites,
+                                   stages=args.stages,
+                                   graph_format=args.graph_format,
+                                   chunksize=args.chunksize,
+                                   date_format=args.date_format,
+                                   compact=args.compact, cache=cache,
+                                   incremental=args.incremental,
+                                   consolidated_summary=(
+                                       args.consolidated_summary),
+                                   graph_workers=args.graph_workers,
+                                   scatter_mode=args.scatter_mode,
+                                   force=args.force,
+                                   profile_stage=args.profile_stage,
+                                   output_format=args.output_format,
+                                   write_workers=args.write_workers,
+                                   database=args.database,
+                                   engine=args.engine)
+        progress = Progress(TextProgress()) if args.progress else None
+        report = runner.run(progress=progress)
+    except (ValueError, IOError, ImportError) as e:
+        print('Error: {}'.format(e), file=sys.stderr)
+        return 2
+
+    for r in report.failures:
+        print('Failed: {}{} - {}: {}'.format(
+            r.source, ' [{}]'.format(r.site) if r.site else '',
+            r.error_type, r.error), file=sys.stderr)
+
+    print('Processed {} of {} inputs successfully'.format(
+        len(report.results) - len(report.failures), len(report.results)))
+
+    return 0 if report.succeeded else 1
+
+
+def check(args):
+    try:
+        settings = batch.load_settings(args.settings)
+    except (ValueError, IOError) as e:
+        print('Error: {}'.format(e), file=sys.stderr)
+        return 2
+
+    input_files = sorted(glob(os.path.join(settings['input_folder'],
+                                           '*.csv')))
+    if not input_files:
+        print('Error: no CSV files found in {}'.format(
+            settings['input_folder']), file=sys.stderr)
+        return 2
+
+    cache = schema.SchemaCache(args.cache) if args.cache else None
+    report = schema.inspect_files(input_files,
+                                  date_col=settings['date_col'],
+                                  required=schema.required_columns(settings),
+                                  workers=args.workers, cache=cache)
+    if args.report:
+        report.write(args.report)
+
+    for path, problems in zip(input_files, report.problems):
+        if problems:
+            print('Mismatch: {} - {}'.format(path, '; '.join(problems)),
+                  file=sys.stderr)
+
+    print('{} of {} input files match'.format(
+        len(input_files) - len(report.mismatched), len(input_files)))
+
+    return 0 if report.consistent else 1
+
+
+def manage_cache(args):
+    if not os.path.isdir(args.cache_dir):
+        print('Error: {} is not a folder'.format(args.cache_dir),
+              file=sys.stderr)
+        return 2
+
+    cache = ParseCache(args.cache_dir)
+    if args.cache_command == 'clear':
+        removed = cache.invalidate(args.inputs or None)
+        print('Removed {} cached files'.format(removed))
+    elif args.cache_command == 'info':
+        print('{} cached files, {:.1f}MB'.format(len(cache.entries()),
+                                                cache.size() / 1024 ** 2))
+
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.command == 'run':
+        return run(args)
+    elif args.command == 'check':
+        return check(args)
+    elif args.command == 'cache':
+        return manage_cache(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
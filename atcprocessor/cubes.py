@@ -0,0 +1,202 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .dates import MONTHS, DAYS
+from .siteindex import SiteIndex
+from .stats import group_index
+from .utilities import make_folder_if_necessary
+
+# Direction given to totals across every direction
+ALL_DIRECTIONS = 'All'
+
+# Keys of each cube after site and direction, and the file each is saved to
+CUBE_KEYS = {
+    'daily': ['Date', 'Year', 'Month', 'Day'],
+    'hourly': ['Year', 'Day', 'Hour'],
+    'weekly': ['Year', 'Day', 'WeekNumber'],
+}
+CUBE_FILES = {
+    'daily': 'Daily Totals',
+    'hourly': 'Hourly Profile',
+    'weekly': 'Weekly Totals',
+}
+
+# Total and number of records, for all records and for valid records only
+MEASURES = ['Sum', 'Records', 'ValidSum', 'ValidRecords']
+
+
+def cube_path(output_folder, site, name):
+    return os.path.join(output_folder, site,
+                        '{} {}.csv'.format(site, CUBE_FILES[name]))
+
+
+def _aggregate(data, by, weights, carry=(), integer=True):
+    """
+    Keys of each group of by, the values of the carry columns from each
+    group's first record, and the sum of each of the weights, which are
+    given for every record in the order of MEASURES.
+    """
+    ids, keys = group_index(data, by)
+
+    # Keys are numbered in order of first appearance
+    _, first = np.unique(ids, return_index=True)
+    if len(ids) and ids.min() < 0:
+        first = first[1:]
+    for col in carry:
+        keys[col] = data[col].values.take(first)
+
+    use = ids >= 0
+    for col, w in zip(MEASURES, weights):
+        total = np.bincount(ids[use], weights=w[use], minlength=len(keys))
+        keys[col] = total.astype(np.int64) if integer else total
+
+    return keys
+
+
+class AggregateCubes:
+    """
+    Daily totals, hourly profiles by day of the week and weekly totals by
+    day of the week for each site and direction, made once from the hourly
+    records and read by every summary and graph. Each cube holds totals for
+    all records and for valid records alone, with a direction of 'All' for
+    the totals across every direction.
+    """
+    def __init__(self, cubes, site_col, dir_col, cleaned=True):
+        self.cubes = cubes
+        self.site_col = site_col
+        self.dir_col = dir_col
+        self.cleaned = cleaned
+        self.indexes = {name: SiteIndex(cube, site_col)
+                        for name, cube in cubes.items()}
+
+        # Site indexes of the rows and columns chosen by select, made on
+        # first use as each graph reads the same choice for every site
+        self.selections = dict()
+
+    @classmethod
+    def from_data(cls, data, site_col, dir_col, count_col):
+        integer = data[count_col].dtype.kind in 'iub'
+        counts = data[count_col].values.astype(np.float64)
+        cleaned = 'Valid' in data.columns
+        if cleaned:
+            valid = data['Valid'].values.astype(np.float64)
+        else:
+            valid = np.zeros(len(data))
+        weights = [counts, np.ones(len(data)), counts * valid, valid]
+
+        # Totals across directions are of each hour, so an hour with records
+        # in both directions counts once, and as valid if any record is
+        hours = _aggregate(data, [site_col, 'DateTime'], weights,
+                           carry=('Date', 'Year', 'Month', 'Day',
+                                  'WeekNumber', 'Hour'), integer=integer)
+        any_valid = (hours['ValidRecords'].values > 0).astype(np.float64)
+        hour_weights = [hours['Sum'].values.astype(np.float64),
+                        np.ones(len(hours)),
+                        hours['ValidSum'].values.astype(np.float64),
+                        any_valid]
+
+        cubes = dict()
+        for name, keys in CUBE_KEYS.items():
+            # Calendar fields follow from the date, so daily totals are
+            # grouped on the date alone and carry the rest
+            by, carry = (keys[:1], keys[1:]) if name == 'daily' \
+                else (keys, ())
+
+            by_dir = _aggregate(data, [site_col, dir_col] + by, weights,
+                                carry, integer)
+            by_dir[dir_col] = by_dir[dir_col].astype(str)
+            total = _aggregate(hours, [site_col] + by, hour_weights, carry,
+                               integer)
+            total.insert(1, dir_col, ALL_DIRECTIONS)
+
+            cube = pd.concat([by_dir, total], ignore_index=True, sort=False)
+            cubes[name] = cls._tidy(cube, site_col, dir_col, keys)
+
+        return cls(cubes, site_col, dir_col, cleaned)
+
+    @staticmethod
+    def _tidy(cube, site_col, dir_col, keys):
+        cube[site_col] = cube[site_col].astype(str)
+        for col, categories in (('Month', MONTHS), ('Day', DAYS)):
+            if col in cube.columns:
+                cube[col] = pd.Categorical(cube[col], categories=categories,
+                                           ordered=True)
+
+        # Sorted by site for the site index, and by key as grouping would
+        cube = cube.sort_values([site_col, dir_col] + keys)
+        return cube[[site_col, dir_col] + keys + MEASURES]\
+            .reset_index(drop=True)
+
+    @property
+    def sites(self):
+        return self.indexes['daily'].sites
+
+    def select(self, name, site, valid_only=False, by_direction=True):
+        """
+        One site's rows of a cube, for each direction or for all directions
+        together. Sum and Records are of valid records only with valid_only,
+        in which case keys without any valid records are left out.
+        """
+        if valid_only and not self.cleaned:
+            raise ValueError('Data does not contain a "Valid" column - does'
+                             ' it need to be cleaned?')
+
+        key = (name, valid_only, by_direction)
+        if key not in self.selections:
+            self.selections[key] = self.__selection(*key)
+        selection = self.selections[key]
+
+        if site not in selection.positions:
+            return selection.data.iloc[:0]
+        return selection.rows(site)
+
+    def __selection(self, name, valid_only, by_direction):
+        cube = self.cubes[name]
+        all_dirs = (cube[self.dir_col] == ALL_DIRECTIONS).values
+        rows = cube[~all_dirs if by_direction else all_dirs]
+        if valid_only:
+            rows = rows[rows['ValidRecords'].values > 0]
+            rows = rows.assign(Sum=rows['ValidSum'],
+                               Records=rows['ValidRecords'])
+
+        cols = [self.site_col] + ([self.dir_col] if by_direction else []) \
+            + CUBE_KEYS[name] + ['Sum', 'Records']
+        return SiteIndex(rows[cols].reset_index(drop=True), self.site_col)
+
+    def write(self, output_folder):
+        """
+        Save each site's cubes to its folder, returning the files written.
+        """
+        written = []
+        for name, index in sorted(self.indexes.items()):
+            for site, rows in index:
+                dest = cube_path(output_folder, site, name)
+                make_folder_if_necessary(dest)
+                rows.to_csv(dest, index=False)
+                written.append(dest)
+
+        return written
+
+    @classmethod
+    def read(cls, output_folder, sites, site_col, dir_col):
+        """
+        Cubes saved by earlier runs for the given sites.
+        """
+        cubes = dict()
+        for name, keys in CUBE_KEYS.items():
+            parts = []
+            for site in sites:
+                path = cube_path(output_folder, site, name)
+                parse_dates = ['Date'] if 'Date' in keys else False
+                parts.append(pd.read_csv(path, parse_dates=parse_dates,
+                                         dtype={site_col: str,
+                                                dir_col: str}))
+
+            cubes[name] = cls._tidy(
+                pd.concat(parts, ignore_index=True, sort=False),
+                site_col, dir_col, keys
+            )
+
+        return cls(cubes, site_col, dir_col)
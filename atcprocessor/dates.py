@@ -0,0 +1,98 @@
+import calendar
+
+import numpy as np
+import pandas as pd
+
+MONTHS = calendar.month_name[1:]
+DAYS = list(calendar.day_name)
+
+# Tried in order when sniffing. Day-first formats come before month-first as
+# NTDS exports use UK dates, and formats with times come first as pandas can
+# be lenient about trailing times.
+SNIFF_FORMATS = (
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y',
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d',
+    '%d-%m-%Y %H:%M:%S', '%d-%m-%Y %H:%M', '%d-%m-%Y',
+    '%Y/%m/%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y/%m/%d',
+    '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y',
+    '%d/%m/%y %H:%M', '%d/%m/%y',
+)
+
+# Passing this as date_format asks for the format to be sniffed
+SNIFF = 'sniff'
+
+
+def sniff_date_format(values, formats=SNIFF_FORMATS):
+    values = pd.Series(pd.unique(values)).dropna().astype(str)
+    if values.empty:
+        raise ValueError('No dates available to determine the date format')
+
+    for fmt in formats:
+        try:
+            pd.to_datetime(values, format=fmt)
+        except (ValueError, TypeError):
+            continue
+        return fmt
+
+    raise ValueError(
+        'Could not determine the date format from values such as: '
+        + ', '.join(values.head(3))
+    )
+
+
+def parse_dates(values, date_format=None):
+    """
+    Parse each distinct value once and broadcast the result back to every
+    row. date_format may be a strptime format, SNIFF, or None to let pandas
+    work out each value as pd.to_datetime would.
+    """
+    codes, uniques = pd.factorize(values)
+
+    if date_format == SNIFF:
+        date_format = sniff_date_format(uniques)
+
+    parsed = pd.to_datetime(pd.Series(uniques), format=date_format).values
+    parsed = np.append(parsed, np.datetime64('NaT'))
+
+    # Point missing values at the NaT on the end
+    codes[codes < 0] = len(uniques)
+
+    return pd.Series(parsed.take(codes), index=getattr(values, 'index', None))
+
+
+def calendar_fields(dates):
+    """
+    Year, Month, WeekNumber and Day for a Series of dates, worked out once
+    per distinct date. Month and Day are ordered categoricals.
+    """
+    codes, uniques = pd.factorize(dates)
+    uniques = pd.DatetimeIndex(uniques)
+
+    # Missing dates are given the code -1. Point them at any date for now
+    # and blank them out afterwards.
+    missing = codes < 0
+    codes[missing] = 0
+
+    years = np.asarray(uniques.year, dtype=np.int64).take(codes)
+    week_numbers = np.array([d.isocalendar()[1] for d in uniques],
+                            dtype=np.int64).take(codes)
+    month_codes = np.asarray(uniques.month - 1, dtype=np.int8).take(codes)
+    day_codes = np.asarray(uniques.dayofweek, dtype=np.int8).take(codes)
+
+    if missing.any():
+        years = np.where(missing, np.nan, years)
+        week_numbers = np.where(missing, np.nan, week_numbers)
+        month_codes[missing] = -1
+        day_codes[missing] = -1
+
+    index = dates.index
+    return {
+        'Year': pd.Series(years, index=index),
+        'Month': pd.Series(pd.Categorical.from_codes(
+            month_codes, categories=MONTHS, ordered=True
+        ), index=index),
+        'WeekNumber': pd.Series(week_numbers, index=index),
+        'Day': pd.Series(pd.Categorical.from_codes(
+            day_codes, categories=DAYS, ordered=True
+        ), index=index),
+    }
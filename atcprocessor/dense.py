@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from .stats import GroupStats, group_index
+
+
+class CountGrid:
+    """
+    Hourly totals placed on a dense grid of site by direction by time, with
+    every site sharing one time axis. Checks run over the whole grid at
+    once, and their results are read back for each record from the cell it
+    came from. Cells without a record are empty.
+    """
+    def __init__(self, data, site_col, dir_col):
+        site_codes, self.sites = pd.factorize(data[site_col])
+        dir_codes, self.directions = pd.factorize(data[dir_col])
+        time_codes, self.times = pd.factorize(data['DateTime'], sort=True)
+        if len(data) and min(site_codes.min(), dir_codes.min(),
+                             time_codes.min()) < 0:
+            raise ValueError('Sites, directions and times must all be given '
+                             'to place counts on a grid')
+
+        self.shape = (len(self.sites), len(self.directions), len(self.times))
+        self.cells = np.ravel_multi_index((site_codes, dir_codes, time_codes),
+                                          self.shape)
+
+        # A record at each time, to read the calendar fields of the time from
+        self.time_records = np.zeros(len(self.times), dtype=np.int64)
+        self.time_records[time_codes] = np.arange(len(data))
+
+    def scatter(self, values, fill):
+        values = np.asarray(values)
+        grid = np.full(self.shape, fill, dtype=values.dtype)
+        grid.reshape(-1)[self.cells] = values
+        return grid
+
+    def gather(self, grid):
+        return np.broadcast_to(grid, self.shape).reshape(-1)[self.cells]
+
+    def at_times(self, series):
+        """
+        A record column for each time, as each time's records share their
+        date and hour.
+        """
+        return series.take(self.time_records)
+
+
+def flag_counts(data, thresholds, site_col, dir_col, count_col, sd_group,
+                std_range=2, previous_stats=()):
+    """
+    The threshold, missing day and standard deviation checks of
+    CountSite.clean_data, run on a CountGrid of hourly totals. Gives the
+    same flags: the statistics are totals of whole-number counts, so are
+    exact whichever order they are added in.
+
+    Returns the ThreshCheck, MissingDay, Valid and StdWarning flags of each
+    record, whether each record's group has statistics for the standard
+    deviation check, and the statistics, combined with previous_stats.
+    """
+    grid = CountGrid(data, site_col, dir_col)
+    present = grid.scatter(np.ones(len(data), dtype=bool), False)
+    counts = grid.scatter(data[count_col].values.astype(np.float64), np.nan)
+
+    # Thresholds are a table by site, hour and month, so are looked up for
+    # each site and time rather than each record
+    compiled = thresholds.compile(site_col)
+    if compiled.can_lookup(data):
+        low, high = compiled.lookup_grid(
+            grid.sites, grid.at_times(data['Hour']).values,
+            grid.at_times(data['Month'])
+        )
+        low, high = low[:, None, :], high[:, None, :]
+    else:
+        combined = data.merge(thresholds.data, how='left')
+        low = grid.scatter(combined['Low'].values.astype(np.float64), np.nan)
+        high = grid.scatter(combined['High'].values.astype(np.float64),
+                            np.nan)
+
+    # Missing thresholds are never exceeded
+    with np.errstate(invalid='ignore'):
+        thresh_check = np.select([counts < low, counts > high], [-1, 1],
+                                 default=0).astype(np.int8)
+
+    # Days whose total across every site and direction is 0
+    date_codes, _ = pd.factorize(grid.at_times(data['Date']))
+    time_totals = np.where(present, counts, 0).sum(axis=(0, 1))
+    day_totals = np.bincount(date_codes, weights=time_totals)
+    missing_day = (day_totals == 0)[date_codes].astype(np.int8)
+
+    valid = present & (thresh_check == 0) & (missing_day == 0)
+    if 'Outage' in data.columns:
+        valid &= grid.scatter(data['Outage'].values == 0, False)
+
+    # Each time's group within a site and direction, by hour and day
+    time_cols = [col for col in sd_group if col not in (site_col, dir_col)]
+    group_codes, group_keys = group_index(
+        pd.DataFrame({col: grid.at_times(data[col]).values
+                      for col in time_cols}), time_cols
+    )
+    size = grid.shape[0] * grid.shape[1] * len(group_keys)
+    groups = (np.arange(grid.shape[0] * grid.shape[1])[:, None]
+              * len(group_keys) + group_codes[None, :]).reshape(grid.shape)
+
+    cells = groups.reshape(-1)
+    valid_counts = np.where(valid, counts, 0).reshape(-1)
+    n = np.bincount(cells, weights=valid.reshape(-1), minlength=size)
+    total = np.bincount(cells, weights=valid_counts, minlength=size)
+    total_sq = np.bincount(cells, weights=valid_counts ** 2, minlength=size)
+
+    # Statistics are kept for every group with records, valid or not, keyed
+    # as those of the long engine are
+    record_groups = grid.gather(groups)
+    first = np.full(size, -1, dtype=np.int64)
+    first[record_groups[::-1]] = np.arange(len(data))[::-1]
+    used = np.flatnonzero(first >= 0)
+    keys = data[sd_group].iloc[first[used]]
+    stats = GroupStats(keys, n[used], total[used], total_sq[used])
+    positions = np.arange(len(used))
+    if previous_stats:
+        stats = GroupStats.combine(list(previous_stats) + [stats])
+        positions = stats.positions(keys)
+
+    lookup = np.full(size, -1, dtype=np.int64)
+    lookup[used] = positions
+    group_positions = lookup[groups]
+
+    std_min, std_max = stats.bounds(std_range)
+    with np.errstate(invalid='ignore'):
+        outside_std = (counts < std_min[group_positions]) \
+            | (counts > std_max[group_positions])
+    std_warning = (valid & outside_std).astype(np.int8)
+
+    flags = {
+        'ThreshCheck': grid.gather(thresh_check),
+        'MissingDay': grid.gather(missing_day),
+        'Valid': grid.gather(valid),
+        'StdWarning': grid.gather(std_warning),
+    }
+    has_stats = stats.n[lookup[record_groups]] > 0
+
+    return flags, has_stats, stats
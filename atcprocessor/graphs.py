@@ -1,14 +1,21 @@
 import os
 
 from matplotlib import use
-use('TKAgg')
+# Figures are only ever saved to file, so use a non-interactive backend
+# unless another is asked for through MPLBACKEND. This also allows graphs to
+# be drawn in worker processes and on machines without a display.
+if 'MPLBACKEND' not in os.environ:
+    use('Agg')
 import matplotlib.pyplot as plt
 from matplotlib.patches import Patch
+from matplotlib.colors import to_rgb
 import matplotlib.dates as mdates
+import numpy as np
 import pandas as pd
 import seaborn as sns
 
-from .utilities import make_folder_if_necessary
+from .utilities import make_folder_if_necessary, observed_groups
+from .render import SCATTER_MODES
 from .version import VERSION_TITLE
 from .calmap import calmap
 
@@ -21,18 +28,59 @@ Produced by {}
 MONTH_LOCATOR = mdates.MonthLocator()
 MONTH_FORMATTER = mdates.DateFormatter('%b\n%Y')
 
+# Bins across the time and flow axes of a binned scatter, each about the
+# size of a scatter marker at the default resolution
+SCATTER_BINS = (700, 200)
+
+
+def binned_scatter(ax, x, y, colour, x_range, y_range, bins=SCATTER_BINS):
+    """
+    Draw points as a single image, filling each bin that any point falls in.
+    """
+    counts, _, _ = np.histogram2d(x, y, bins=bins, range=[x_range, y_range])
+
+    # Rows of the image are flow, columns are time
+    image = np.zeros((bins[1], bins[0], 4))
+    image[..., :3] = to_rgb(colour)
+    image[..., 3] = counts.T > 0
+
+    ax.imshow(image, origin='lower', aspect='auto', interpolation='nearest',
+              extent=(x_range[0], x_range[1], y_range[0], y_range[1]))
+
 
 def yearly_scatter(data, datetime_col, value_col, category_col, colour_col,
-                   dir_col, destination_path, yearlong_x=True):
+                   dir_col, destination_path, yearlong_x=True,
+                   mode='points'):
+    if mode not in SCATTER_MODES:
+        raise ValueError(
+            'Scatter mode must be one of: ' + ', '.join(SCATTER_MODES)
+        )
+
     # Get years without modifying existing frame
     year_values = data[datetime_col].dt.year
 
     make_folder_if_necessary(destination_path)
 
     # Group by year, set up a plot per year
+    written = []
     for year, year_data in data.groupby(year_values):
+        if mode == 'binned':
+            # Every direction shares the same bins
+            if yearlong_x:
+                x_range = (mdates.date2num(pd.Timestamp(year, 1, 1)),
+                           mdates.date2num(pd.Timestamp(year + 1, 1, 1)))
+            else:
+                x_range = (mdates.date2num(year_data[datetime_col].min()),
+                           mdates.date2num(year_data[datetime_col].max()))
+            y_range = (0, year_data[value_col].max() * 1.05)
+            if x_range[1] <= x_range[0]:
+                x_range = (x_range[0], x_range[0] + 1)
+            if y_range[1] <= 0:
+                y_range = (0, 1)
+
         # Create a subplot per direction
-        directions = len(year_data[dir_col].unique())
+        dir_groups = list(observed_groups(year_data.groupby(dir_col)))
+        directions = len(dir_groups)
         fig, axes = plt.subplots(nrows=directions, sharex=True, sharey=True,
                                  figsize=(14, 4*directions + 1))
 
@@ -42,13 +90,25 @@ def yearly_scatter(data, datetime_col, value_col, category_col, colour_col,
             axes = [axes]
 
         # Group by direction
-        for i, (direction, dir_data) in enumerate(year_data.groupby(dir_col)):
+        for i, (direction, dir_data) in enumerate(dir_groups):
             axes[i].set_title(direction)
             # Plot all statuses with the right colour
-            for status, status_data in dir_data.groupby(category_col):
+            for status, status_data in observed_groups(
+                    dir_data.groupby(category_col)):
+                if mode == 'binned':
+                    for colour, colour_data in observed_groups(
+                            status_data.groupby(colour_col)):
+                        binned_scatter(
+                            axes[i],
+                            mdates.date2num(colour_data[datetime_col].values),
+                            colour_data[value_col].values,
+                            str(colour), x_range, y_range
+                        )
+                    continue
+
                 plot_data = status_data.set_index(datetime_col)
                 axes[i].scatter(plot_data.index, plot_data[value_col],
-                                c=plot_data[colour_col],
+                                c=plot_data[colour_col].astype(str),
                                 s=0.6, label=status)
 
             axes[i].set_ylabel('Flow (vehs/hour)')
@@ -67,9 +127,10 @@ def yearly_scatter(data, datetime_col, value_col, category_col, colour_col,
 
         # Use patches for larger colours on legend, consistency across
         # directions.
+        legend = year_data[[colour_col, category_col]].drop_duplicates()
+        legend = legend.astype(str).sort_values([colour_col, category_col])
         colour_patches = [Patch(color=c, label=s)
-                          for (c, s), _
-                          in year_data.groupby([colour_col, category_col])]
+                          for c, s in legend.itertuples(index=False)]
 
         axes[-1].legend(handles=colour_patches, ncol=5, loc='upper center',
                         bbox_to_anchor=(0.5, -0.15), fancybox=True)
@@ -77,6 +138,9 @@ def yearly_scatter(data, datetime_col, value_col, category_col, colour_col,
         dest = '_{}'.format(year).join(os.path.splitext(destination_path))
         plt.savefig(dest, bbox_to_inches='tight')
         plt.close('all')
+        written.append(dest)
+
+    return written
 
 
 def calendar_plot(data, count_column, destination_path, maxval=None):
@@ -0,0 +1,42 @@
+import os
+import json
+
+import pandas as pd
+
+from .utilities import atomic_write
+from .stats import GroupStats
+
+
+def state_path(output_folder, site):
+    return os.path.join(output_folder, site,
+                        '{} Cleaning State.json'.format(site))
+
+
+def load_state(output_folder, site, site_col, group_cols):
+    path = state_path(output_folder, site)
+    if not os.path.isfile(path):
+        return None, None
+
+    with open(path, 'r') as f:
+        state = json.load(f)
+
+    stats = pd.DataFrame(state['stats'])
+    stats[site_col] = stats[site_col].astype(str)
+
+    return (pd.Timestamp(state['last_datetime']),
+            GroupStats.from_frame(stats, group_cols))
+
+
+def save_state(output_folder, site, last_datetime, stats):
+    path = state_path(output_folder, site)
+
+    state = {
+        'last_datetime': pd.Timestamp(last_datetime).isoformat(),
+        'stats': json.loads(stats.to_frame().to_json(orient='records')),
+    }
+
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+
+    atomic_write(path, write)
@@ -0,0 +1,180 @@
+import os
+import re
+import sys
+import time
+import logging
+import cProfile
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+RUN_REPORT_NAME = 'Run Report.json'
+
+
+# Memory of this process as reported by Linux
+PROC_STATUS = '/proc/self/status'
+PROC_CLEAR_REFS = '/proc/self/clear_refs'
+
+
+def _proc_status_bytes(field):
+    try:
+        with open(PROC_STATUS) as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    # Given in kilobytes
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+def current_rss():
+    """
+    Resident memory of this process now in bytes, or None where it can't be
+    found.
+    """
+    return _proc_status_bytes('VmRSS')
+
+
+def process_peak_rss():
+    """
+    Peak resident memory of this process so far in bytes, or None where it
+    can't be found. On Linux this restarts from reset_peak_rss.
+    """
+    if resource is None:
+        return None
+
+    # Kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def reset_peak_rss():
+    """
+    Start measuring peak resident memory afresh, returning whether it could
+    be. Only possible on Linux.
+    """
+    try:
+        with open(PROC_CLEAR_REFS, 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def peak_rss_since_reset():
+    return _proc_status_bytes('VmHWM')
+
+
+def _row_counts(count_site):
+    data = getattr(count_site, 'data', None)
+    if data is None:
+        return None, None
+
+    sites = data[count_site.site_col].value_counts()
+    return len(data), {str(s): int(n) for s, n in sites.items() if n}
+
+
+class StageRecorder:
+    """
+    Records wall time, CPU time, memory and rows for each stage run, and
+    logs them. Resident memory is recorded at the start and end of each
+    stage, with the peak during it where that can be measured. One stage
+    can be profiled, with the profile of each run written to
+    profile_folder.
+    """
+    def __init__(self, profile_stage=None, profile_folder=None):
+        if profile_stage is not None and profile_folder is None:
+            raise ValueError('A folder is needed to write profiles to')
+
+        self.profile_stage = profile_stage
+        self.profile_folder = profile_folder
+        self.records = []
+
+    def stage(self, name, source=None, count_site=None):
+        return _StageRun(self, name, source, count_site)
+
+    def profile_path(self, name, source):
+        label = re.sub(r'[^\w\- .]', '_', str(source)) if source else 'run'
+        return os.path.join(self.profile_folder,
+                            '{} {}.prof'.format(name, label))
+
+
+class _StageRun:
+    # count_site may be set inside the with block, for stages that create it
+    def __init__(self, recorder, name, source, count_site):
+        self.recorder = recorder
+        self.name = name
+        self.source = source
+        self.count_site = count_site
+        self.profiler = None
+
+    def __enter__(self):
+        self.rows_in, _ = _row_counts(self.count_site)
+        logger.info('%s: %s', self.name, self.source or '')
+
+        if self.name == self.recorder.profile_stage:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+        self.rss_start = current_rss()
+        self.process_peak_start = process_peak_rss()
+        self.peak_reset = reset_peak_rss()
+
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        wall_time = time.perf_counter() - self.wall_start
+        cpu_time = time.process_time() - self.cpu_start
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            path = self.recorder.profile_path(self.name, self.source)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            self.profiler.dump_stats(path)
+
+        rss_end = current_rss()
+        peak = self._peak_rss()
+        rows_out, sites = _row_counts(self.count_site)
+        record = {
+            'stage': self.name,
+            'source': self.source,
+            'success': exc_type is None,
+            'wall_time': wall_time,
+            'cpu_time': cpu_time,
+            'rss_start': self.rss_start,
+            'rss_end': rss_end,
+            'peak_rss': peak,
+            'peak_rss_increase': None if None in (peak, self.rss_start)
+            else peak - self.rss_start,
+            'rows_in': self.rows_in,
+            'rows_out': rows_out,
+            'site_rows': sites,
+        }
+        self.recorder.records.append(record)
+
+        logger.info('%s finished in %.2fs (%.2fs CPU), %s rows',
+                    self.name, wall_time, cpu_time,
+                    '-' if rows_out is None else rows_out)
+
+        # Never suppress errors
+        return False
+
+    def _peak_rss(self):
+        if self.peak_reset:
+            return peak_rss_since_reset()
+
+        # Otherwise only known when the stage set a new peak for the process
+        peak = process_peak_rss()
+        if None not in (peak, self.process_peak_start) \
+                and peak > self.process_peak_start:
+            return peak
+        return None
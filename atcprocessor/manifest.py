@@ -0,0 +1,91 @@
+import os
+import json
+import hashlib
+
+import pandas as pd
+
+from .cache import file_digest
+from .utilities import atomic_write
+from .version import __version__
+
+MANIFEST_NAME = 'Build Manifest.json'
+
+
+def frame_digest(frame):
+    digest = hashlib.sha1()
+    digest.update(json.dumps([list(map(str, frame.columns)),
+                              list(map(str, frame.dtypes))]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(frame, index=False).values
+                  .tobytes())
+    return digest.hexdigest()
+
+
+def input_digest(data):
+    # Files are hashed as they are, so unchanged files needn't be parsed
+    if isinstance(data, pd.DataFrame):
+        return frame_digest(data)
+    return file_digest(data)
+
+
+def build_digest(*parts):
+    parts = [__version__] + list(parts)
+    return hashlib.sha1(
+        json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+class BuildManifest:
+    """
+    Record of what each stage last wrote for each input, and a digest of the
+    input and settings it was written from. A stage whose digest matches,
+    and whose outputs are all still there, needn't be run again.
+    """
+    def __init__(self, output_folder, force=False):
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, MANIFEST_NAME)
+        self.force = force
+        self.entries = dict()
+        self.updates = dict()
+
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                # An unreadable manifest just means everything is rebuilt
+                pass
+
+    @staticmethod
+    def key(source, stage):
+        return '{}|{}'.format(source, stage)
+
+    def is_current(self, key, digest):
+        if self.force:
+            return False
+
+        entry = self.entries.get(key)
+        if entry is None or entry['digest'] != digest:
+            return False
+
+        return all(os.path.isfile(os.path.join(self.output_folder, o))
+                   for o in entry['outputs'])
+
+    def record(self, key, digest, outputs):
+        entry = {
+            'digest': digest,
+            'outputs': sorted(os.path.relpath(o, self.output_folder)
+                              for o in outputs),
+        }
+        self.entries[key] = entry
+        self.updates[key] = entry
+
+    def update(self, updates):
+        self.entries.update(updates)
+        self.updates.update(updates)
+
+    def save(self):
+        def write(tmp_path):
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, indent=4, sort_keys=True)
+
+        atomic_write(self.path, write)
@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .siteindex import SiteIndex
+from .stats import group_index, time_order
+from .utilities import make_folder_if_necessary
+
+OUTAGE_TYPES = ('Zero counts', 'Missing records')
+
+# Times are compared as nanoseconds
+HOUR = 3600 * 10 ** 9
+
+
+def outage_path(output_folder, site):
+    return os.path.join(output_folder, site, '{} Outages.csv'.format(site))
+
+
+def _interval(series, times):
+    # The usual time between one record and the next of the same series
+    same = series[1:] == series[:-1]
+    steps = np.diff(times)[same]
+    steps = steps[steps > 0]
+    if not len(steps):
+        return HOUR
+
+    values, counts = np.unique(steps, return_counts=True)
+    return values[counts.argmax()]
+
+
+def find_outages(data, site_col, dir_col, count_col, min_hours,
+                 interval=None):
+    """
+    Runs of zero counts, and gaps without any records, lasting at least
+    min_hours in each site and direction. Runs are found in one pass over
+    every record, sorted by site, direction and time, so time taken grows
+    with the number of records rather than sites.
+
+    interval is the time between records, by default the most common one.
+    Returns a table of the outages, with their type, start, end (the time
+    of the next record expected after them) and length in hours, and
+    whether each record is part of a run of zero counts.
+    """
+    series, keys = group_index(data, [site_col, dir_col])
+    times = data['DateTime'].values.astype('datetime64[ns]').view(np.int64)
+    order = time_order(series, times)
+    series, times = series[order], times[order]
+    zero = data[count_col].values[order] == 0
+
+    if interval is None:
+        interval = _interval(series, times)
+    else:
+        interval = pd.Timedelta(interval).value
+    min_length = min_hours * HOUR
+
+    same = series[1:] == series[:-1]
+    steps = np.diff(times)
+
+    # Gaps, between records of the same series more than an interval apart
+    gaps = np.flatnonzero(same & (steps > interval))
+    gap_series = series[gaps]
+    gap_start = times[gaps] + interval
+    gap_end = times[gaps + 1]
+
+    # Runs of zeros, broken by a non-zero count, a gap or a new series
+    follows = np.r_[False, same & (steps == interval) & zero[:-1]]
+    starts = np.flatnonzero(zero & ~follows)
+    run_ids = np.cumsum(zero & ~follows) - 1
+    lengths = np.bincount(run_ids[zero], minlength=len(starts))
+    run_series = series[starts]
+    run_start = times[starts]
+    run_end = times[starts + lengths - 1] + interval
+
+    long_gaps = gap_end - gap_start >= min_length
+    long_runs = run_end - run_start >= min_length
+
+    flagged = np.zeros(len(data), dtype=bool)
+    flagged[zero] = long_runs[run_ids[zero]]
+    in_outage = np.zeros(len(data), dtype=bool)
+    in_outage[order] = flagged
+
+    outage_series = np.r_[run_series[long_runs], gap_series[long_gaps]]
+    table = keys.take(outage_series).reset_index(drop=True)
+    table['Type'] = pd.Categorical.from_codes(
+        np.r_[np.zeros(long_runs.sum(), dtype=np.int8),
+              np.ones(long_gaps.sum(), dtype=np.int8)],
+        categories=OUTAGE_TYPES
+    )
+    start = np.r_[run_start[long_runs], gap_start[long_gaps]]
+    end = np.r_[run_end[long_runs], gap_end[long_gaps]]
+    table['Start'] = pd.to_datetime(start)
+    table['End'] = pd.to_datetime(end)
+    table['Hours'] = (end - start) / HOUR
+    table[site_col] = table[site_col].astype(str)
+
+    table = table.sort_values([site_col, dir_col, 'Start'])\
+        .reset_index(drop=True)
+
+    return table, in_outage
+
+
+def write_outages(table, sites, output_folder, site_col, append_sites=()):
+    """
+    Save each site's outages to its folder, adding to those already saved
+    for sites in append_sites. Sites without any outages get an empty
+    table. Returns the files written.
+    """
+    index = SiteIndex(table, site_col)
+    written = []
+    for site in sites:
+        rows = index.rows(site) if site in index.positions \
+            else table.iloc[:0]
+        dest = outage_path(output_folder, site)
+        make_folder_if_necessary(dest)
+
+        append = site in append_sites and os.path.exists(dest)
+        rows.to_csv(dest, mode='a' if append else 'w', header=not append,
+                    index=False)
+        written.append(dest)
+
+    return written
@@ -1,12 +1,38 @@
 import os
-import calendar
-from itertools import chain, combinations
+import logging
 
+import numpy as np
 import pandas as pd
 from numpy import select
 
-from .utilities import make_folder_if_necessary
-from .graphs import yearly_scatter, calendar_plot, atc_facet_grid
+from .utilities import make_folder_if_necessary, observed_groups
+from .dates import parse_dates, calendar_fields, MONTHS
+from . import incremental as inc
+from .stats import GroupStats, group_index, rolling_bounds
+from . import dense
+from .siteindex import SiteIndex
+from .cubes import AggregateCubes, ALL_DIRECTIONS
+from .summary import rollup, SUMMARY_DIMS, SUMMARY_COLS, SUMMARY_NAME
+from .render import GraphJob, render_jobs
+from .outages import find_outages, write_outages
+from .store import CountStore
+from .writers import check_output_format, cleaned_path, write_sites
+# The graphs module is imported by the methods that draw graphs, as
+# matplotlib and seaborn are slow to import and aren't needed for cleaning
+
+logger = logging.getLogger(__name__)
+
+# Ways clean_data can run its checks, which give the same results
+CLEANING_ENGINES = ('long', 'dense')
+
+
+# Scatter plot statuses and their colours. Statuses are stored as int8 codes
+# into these, in alphabetical order so they are drawn in the same order as
+# when they were stored as strings.
+STATUS_LABELS = ('Above threshold', 'Below threshold', 'Full day missing',
+                 'Outage', 'Valid', 'Warning - Outside SD Range')
+STATUS_COLOURS = ('red', 'black', 'grey', 'purple', 'darkturquoise',
+                  'darkorange')
 
 
 class SiteList:
@@ -73,12 +99,121 @@ class Thresholds:
         # Use how='right' to ensure we get possible Hour/Month etc columns
         self.data = site_list.data.merge(thresholds, how='right')
 
+        self.compiled = dict()
+
+    def compile(self, site_col):
+        # Compiled tables are kept, so are sent along with the thresholds to
+        # any worker processes
+        if site_col not in self.compiled:
+            self.compiled[site_col] = CompiledThresholds(self.data, site_col)
+
+        return self.compiled[site_col]
+
+
+class CompiledThresholds:
+    """
+    Low and High thresholds held in a dense array indexed by site, hour and
+    month, so they can be looked up for every record without a merge. Hour
+    and month only have one position each if the thresholds don't vary by
+    them.
+    """
+    def __init__(self, thresholds, site_col):
+        thresholds = thresholds[thresholds[site_col].notnull()]
+
+        self.site_col = site_col
+        self.sites = pd.Index(thresholds[site_col].astype(str).unique())
+        self.by_hour = 'Hour' in thresholds.columns
+        self.by_month = 'Month' in thresholds.columns
+
+        # Category columns would also be joined on if present in the data
+        self.other_keys = set(thresholds.columns) - {
+            site_col, 'Hour', 'Month', 'Low', 'High'
+        }
+
+        site_codes = self.sites.get_indexer(
+            thresholds[site_col].astype(str)
+        )
+        hours = (thresholds['Hour'].astype(int).values if self.by_hour
+                 else np.zeros(len(thresholds), dtype=int))
+        months = (self.__month_codes(thresholds['Month']) if self.by_month
+                  else np.zeros(len(thresholds), dtype=int))
+
+        keys = pd.DataFrame({'site': site_codes, 'hour': hours,
+                             'month': months})
+        if keys.duplicated().any():
+            raise ValueError(
+                'Thresholds contain more than one Low/High pair for some '
+                'sites{}{}'.format(' and hours' if self.by_hour else '',
+                                   ' and months' if self.by_month else '')
+            )
+
+        # The extra site at the end is left empty, for sites not in the
+        # thresholds (which get the code -1)
+        self.table = np.full((len(self.sites) + 1,
+                              24 if self.by_hour else 1,
+                              12 if self.by_month else 1,
+                              2), np.nan)
+        self.table[site_codes, hours, months] = \
+            thresholds[['Low', 'High']].values
+
+    @staticmethod
+    def __month_codes(months):
+        if months.dtype.name == 'category':
+            if list(months.cat.categories) == MONTHS:
+                return months.cat.codes.values
+            months = months.astype(str)
+        if pd.api.types.is_numeric_dtype(months):
+            return months.astype(int).values - 1
+
+        codes = pd.Categorical(months, categories=MONTHS).codes
+        if (codes < 0).any():
+            raise ValueError('Threshold months must be full month names')
+        return codes
+
+    def can_lookup(self, data):
+        return not self.other_keys.intersection(data.columns)
+
+    def lookup(self, data):
+        # Match each distinct site once rather than every record
+        codes, uniques = pd.factorize(data[self.site_col])
+        site_codes = self.sites.get_indexer(pd.Index(uniques).astype(str))
+        site_codes = np.append(site_codes, -1)[codes]
+
+        hours = data['Hour'].values if self.by_hour else 0
+        months = self.__month_codes(data['Month']) if self.by_month else 0
+
+        low_high = self.table[site_codes, hours, months]
+
+        return low_high[:, 0], low_high[:, 1]
+
+    def lookup_grid(self, sites, hours, months):
+        """
+        Low and High thresholds for each of sites at each time, given the
+        hour and month of each time, as arrays of sites by times.
+        """
+        # Sites not in the thresholds get -1, the empty site at the end
+        site_codes = self.sites.get_indexer(pd.Index(sites).astype(str))
+
+        hours = np.asarray(hours) if self.by_hour \
+            else np.zeros(len(hours), dtype=int)
+        months = self.__month_codes(months) if self.by_month \
+            else np.zeros(len(months), dtype=int)
+
+        low_high = self.table[site_codes[:, None], hours[None, :],
+                              months[None, :]]
+
+        return low_high[..., 0], low_high[..., 1]
+
 
 class CountSite:
     def __init__(self, data, output_folder,
                  site_col, count_col, dir_col,
                  date_col, time_col=None,
-                 combined_datetime=False, hour_only=False, thresholds=None):
+                 combined_datetime=False, hour_only=False, thresholds=None,
+                 graph_format='png', chunksize=None, date_format=None,
+                 compact=False, cache=None, graph_workers=1,
+                 output_format='csv', write_workers=1, database=None,
+                 graph_pool=None):
 
         if thresholds:
             assert type(thresholds) == Thresholds
@@ -87,6 +222,22 @@ class CountSite:
         if not os.path.isdir(output_folder):
             os.mkdir(output_folder)
         self.output_folder = output_folder
+        self.graph_format = graph_format
+        self.graph_workers = graph_workers
+        # Shared by every stage that draws graphs, when given
+        self.graph_pool = graph_pool
+
+        check_output_format(output_format)
+        self.output_format = output_format
+        self.write_workers = write_workers
+
+        # Cleaned data is also added to this SQLite database, if given
+        self.database = database
+
+        # Every file written, in order
+        self.written = []
+        self.__site_index = None
+        self.__aggregates = None
 
         if not combined_datetime and not time_col:
             raise ValueError(
@@ -94,17 +245,17 @@ class CountSite:
             )
 
         if type(data) == pd.DataFrame:
-            self.data = data
+            columns = data.columns
         else:
             if not os.path.isfile(data):
                 raise FileNotFoundError('Data file does not seem to exist.')
-            self.data = pd.read_csv(data)
+            columns = pd.read_csv(data, nrows=0).columns
 
         # Check columns are present
         check_cols = [site_col, count_col, dir_col, date_col]
         if not combined_datetime:
             check_cols.append(time_col)
-        missing_cols = [c for c in check_cols if c not in self.data.columns]
+        missing_cols = [c for c in check_cols if c not in columns]
 
         if missing_cols:
             raise ValueError(
@@ -116,79 +267,219 @@ class CountSite:
         self.count_col = count_col
         self.dir_col = dir_col
 
-        self.data[self.site_col] = self.data[self.site_col].astype(str)
+        datetime_params = dict(combined_datetime=combined_datetime,
+                               date_col=date_col, time_col=time_col,
+                               hour_only=hour_only, date_format=date_format)
+
+        if type(data) == pd.DataFrame:
+            self.data = self.__prepare(data, **datetime_params)
+        else:
+            self.data = self.__load(data, chunksize, check_cols, cache,
+                                    datetime_params)
+
+        if compact:
+            self.compact()
+
+    def __load(self, path_to_csv, chunksize, columns, cache,
+               datetime_params):
+        # Everything that affects the parsed frame forms part of the cache key
+        cache_settings = dict(datetime_params, site_col=self.site_col,
+                              count_col=self.count_col, dir_col=self.dir_col,
+                              hourly_totals=bool(chunksize))
+        if cache:
+            data = cache.load(path_to_csv, cache_settings)
+            if data is not None:
+                return data
+
+        if chunksize:
+            data = self.__read_chunked(path_to_csv, chunksize, columns,
+                                       **datetime_params)
+        else:
+            data = self.__prepare(pd.read_csv(path_to_csv), **datetime_params)
+
+        if cache:
+            cache.store(path_to_csv, cache_settings, data)
+
+        return data
+
+    def __read_chunked(self, path_to_csv, chunksize, columns,
+                       **datetime_params):
+        # Only the hourly totals are kept from each chunk, so memory use
+        # depends on the chunk size rather than the size of the file
+        hourly = [
+            self.hourly_totals(self.__prepare(chunk, **datetime_params))
+            for chunk in pd.read_csv(path_to_csv, usecols=columns,
+                                     chunksize=chunksize)
+        ]
+
+        # An hour may be split across chunks, so total again
+        return self.hourly_totals(
+            pd.concat(hourly, ignore_index=True, sort=False)
+        )
+
+    def __prepare(self, data, combined_datetime, date_col, time_col,
+                  hour_only, date_format):
+        data[self.site_col] = data[self.site_col].astype(str)
+
+        data[self.dir_col].replace({'N_R': 'S',
+                                    'S_R': 'N',
+                                    'E_R': 'W',
+                                    'W_R': 'E'}, inplace=True)
 
-        self.data[self.dir_col].replace({'N_R': 'S',
-                                         'S_R': 'N',
-                                         'E_R': 'W',
-                                         'W_R': 'E'}, inplace=True)
+        self.__convert_datetimes(data, combined_datetime, date_col, time_col,
+                                 hour_only, date_format)
 
-        self.__convert_datetimes(combined_datetime, date_col, time_col,
-                                 hour_only)
+        return data
 
-    def __convert_datetimes(self, combined_datetime, date_col, time_col,
-                            hour_only):
+    @staticmethod
+    def __convert_datetimes(data, combined_datetime, date_col, time_col,
+                            hour_only, date_format):
+        # Dates repeat for every hour and direction, so each distinct value
+        # is only parsed once
         if combined_datetime:
-            self.data['DateTime'] = self.data[date_col]
-            self.data['Date'] = self.data['DateTime'].dt.date
+            data['DateTime'] = parse_dates(data[date_col], date_format)
+            data['Date'] = data['DateTime'].dt.normalize()
         else:
             if hour_only:
-                time_vals = pd.to_timedelta(self.data[time_col], unit='h')
+                time_vals = pd.to_timedelta(data[time_col], unit='h')
             else:
-                time_vals = pd.to_timedelta(self.data[time_col])
-            self.data['Date'] = pd.to_datetime(self.data[date_col])
-    
-            self.data['DateTime'] = self.data['Date'] + time_vals
-
-        self.data['Year'] = self.data['Date'].dt.year
-        self.data['Month'] = pd.Categorical(
-            self.data['Date'].dt.month_name(),
-            categories=calendar.month_name[1:], ordered=True
-        )
-        self.data['WeekNumber'] = self.data['Date'].dt.week
-        self.data['Day'] = pd.Categorical(
-            self.data['Date'].dt.weekday_name,
-            categories=calendar.day_name, ordered=True
-        )
-        self.data['Hour'] = self.data['DateTime'].dt.hour
+                time_vals = pd.to_timedelta(data[time_col])
+            data['Date'] = parse_dates(data[date_col], date_format)
+
+            data['DateTime'] = data['Date'] + time_vals
+
+        fields = calendar_fields(data['Date'])
+        for col in ('Year', 'Month', 'WeekNumber', 'Day'):
+            data[col] = fields[col]
+        data['Hour'] = data['DateTime'].dt.hour
+
+    def site_index(self):
+        """
+        Each site's rows, shared by every stage. Only rebuilt once self.data
+        has been replaced, which may leave it sorted by site.
+        """
+        if self.__site_index is None or \
+                self.__site_index.data is not self.data:
+            self.__site_index = SiteIndex(self.data, self.site_col)
+            self.data = self.__site_index.data
+
+        return self.__site_index
+
+    def aggregates(self):
+        """
+        Daily, hourly and weekly totals read by the summary and graphs, made
+        once for each version of the data.
+        """
+        data = self.site_index().data
+        if self.__aggregates is None or self.__aggregates[0] is not data:
+            self.__aggregates = (data, AggregateCubes.from_data(
+                data, self.site_col, self.dir_col, self.count_col
+            ))
+
+        return self.__aggregates[1]
+
+    def write_aggregates(self):
+        self.written.extend(self.aggregates().write(self.output_folder))
+
+    def memory_usage(self):
+        return self.data.memory_usage(deep=True).sum()
+
+    def compact(self):
+        before = self.memory_usage()
+
+        for col in (self.site_col, self.dir_col):
+            self.data[col] = self.data[col].astype('category')
+
+        int_cols = [self.count_col, 'Year', 'WeekNumber', 'Hour',
+                    'ThreshCheck', 'MissingDay', 'StdWarning']
+        for col in int_cols:
+            if col in self.data.columns:
+                self.data[col] = pd.to_numeric(self.data[col],
+                                               downcast='integer')
+
+        after = self.memory_usage()
+        logger.info('Compacted data from %.1fMB to %.1fMB',
+                    before / 1e6, after / 1e6)
+
+        return before, after
+
+    def hourly_totals(self, data):
+        # Compacted counts are summed as int64, as the totals of several
+        # lanes or intervals may not fit the type each count was given
+        counts = data[self.count_col]
+        compacted = pd.api.types.is_integer_dtype(counts) \
+            and counts.dtype.itemsize < 8
+        if compacted:
+            data = data.assign(**{self.count_col: counts.astype(np.int64)})
+
+        totals = data.groupby([self.site_col, 'DateTime',
+                               'Date', 'Year', 'Month', 'WeekNumber',
+                               'Day', 'Hour',
+                               self.dir_col], as_index=False) \
+            .agg({self.count_col: 'sum'})
 
-    def clean_data(self, std_range=2, outside_std_invalid=False):
-        print('Cleaning...')
-        if not self.thresholds:
-            raise ValueError(
-                'Thresholds required to clean data'
-            )
+        if compacted:
+            totals[self.count_col] = pd.to_numeric(totals[self.count_col],
+                                                   downcast='integer')
+        return totals
+
+    def __resume_cleaning(self, sd_group):
+        # Drop records already cleaned by a previous incremental run,
+        # returning the running statistics saved by that run
+        last_cleaned = dict()
+        previous_stats = []
+        for site in self.data[self.site_col].astype(str).unique():
+            cleaned = cleaned_path(self.output_folder, site,
+                                   self.output_format)
+            if not os.path.exists(cleaned):
+                continue
+
+            last_datetime, stats = inc.load_state(self.output_folder, site,
+                                                  self.site_col, sd_group)
+            if last_datetime is not None:
+                last_cleaned[site] = last_datetime
+                previous_stats.append(stats)
+
+        cutoff = pd.to_datetime(
+            self.data[self.site_col].astype(str).map(last_cleaned)
+        )
+        new_data = cutoff.isnull() | (self.data['DateTime'] > cutoff)
+        self.data = self.data[new_data].reset_index(drop=True)
 
-        if self.site_col not in self.thresholds.data.columns:
-            raise ValueError(
-                'Site identifying column "{}" must be the same in both ' +
-                'the data file and site list file'.format(self.site_col)
-            )
+        return set(last_cleaned), previous_stats
 
-        self.data = self.data.groupby([self.site_col, 'DateTime',
-                                       'Date', 'Year', 'Month', 'WeekNumber',
-                                       'Day', 'Hour',
-                                       self.dir_col], as_index=False) \
-            .agg({self.count_col: 'sum'})
+    def __flag_counts(self, sd_group, std_range, previous_stats):
+        # Threshold, missing day and standard deviation checks on the long
+        # records, dropping those without statistics. Returns the statistics.
 
         # Get the thresholds alongside the relevant counts
-        combined_thresh = self.data.merge(
-            self.thresholds.data, how='left'
-        )[[self.count_col, 'Low', 'High']]
+        compiled = self.thresholds.compile(self.site_col)
+        if compiled.can_lookup(self.data):
+            low, high = compiled.lookup(self.data)
+        else:
+            combined_thresh = self.data.merge(
+                self.thresholds.data, how='left'
+            )
+            low = combined_thresh['Low'].values
+            high = combined_thresh['High'].values
 
-        # Flag low or high counts
-        low_count = combined_thresh[self.count_col] < combined_thresh['Low']
-        high_count = combined_thresh[self.count_col] > combined_thresh['High']
+        # Flag low or high counts. Missing thresholds are never exceeded.
+        counts = self.data[self.count_col].values
+        with np.errstate(invalid='ignore'):
+            low_count = counts < low
+            high_count = counts > high
 
         # Add in column to report meeting or failing thresholds
         self.data['ThreshCheck'] = select([low_count, high_count], [-1, 1],
-                                          default=0)
+                                          default=0).astype(np.int8)
 
         # Work out instances where day total is 0 - probably a fault
         daily_total = self.data.groupby('Date', as_index=False)\
                                .agg({self.count_col: 'sum'})
 
-        daily_total['MissingDay'] = (daily_total[self.count_col] == 0)*1
+        daily_total['MissingDay'] = (
+            daily_total[self.count_col] == 0
+        ).astype(np.int8)
         daily_total = daily_total[['Date', 'MissingDay']]
 
         self.data = self.data.merge(daily_total)
@@ -197,231 +488,358 @@ class CountSite:
         # missing
         self.data['Valid'] = (self.data['ThreshCheck'].abs()
                               + self.data['MissingDay']) == 0
-
-        valid_data = self.data[self.data['Valid']]
+        if 'Outage' in self.data.columns:
+            self.data['Valid'] &= self.data['Outage'] == 0
 
         # Work out the average hourly flow in that direction at the site
-        hourly_avg = valid_data.groupby([self.site_col, 'Hour', 'Day',
-                                         self.dir_col])\
-                               .agg({self.count_col: ['mean', 'std']})
-        hourly_avg.columns = hourly_avg.columns.droplevel()
-        hourly_avg.reset_index(inplace=True)
+        # from the count, sum and sum of squares of valid records
+        index = group_index(self.data, sd_group)
+        stats = GroupStats.from_data(self.data, sd_group, self.count_col,
+                                     mask=self.data['Valid'], index=index)
+        positions = index[0]
+        if previous_stats:
+            # Fold the new records into the statistics from previous runs
+            stats = GroupStats.combine(previous_stats + [stats])
+            positions = stats.positions(self.data)
+
+        # Upper and lower stdev bounds for each record
+        std_min, std_max = stats.bounds(std_range)
+        std_min, std_max = std_min[positions], std_max[positions]
+
+        # Flag valid records with stdev warnings
+        counts = self.data[self.count_col].values
+        with np.errstate(invalid='ignore'):
+            outside_std = (counts < std_min) | (counts > std_max)
+        self.data['StdWarning'] = (
+            self.data['Valid'].values & outside_std
+        ).astype(np.int8)
+
+        # Records in groups without any valid data have no bounds, and are
+        # dropped as they always have been
+        has_stats = (positions >= 0) & (stats.n[positions] > 0)
+        self.data = self.data[has_stats]
+
+        return stats
+
+    def clean_data(self, std_range=2, outside_std_invalid=False,
+                   incremental=False, engine='long', outage_hours=0,
+                   rolling_baseline=False, baseline_weeks=8):
+        """
+        Flag each hourly total against its thresholds, days without any
+        traffic and counts outside std_range standard deviations of their
+        site, hour, day and direction. The "dense" engine runs the same
+        checks on a grid of site by direction by time rather than on the
+        long records, giving the same results.
+
+        With outage_hours, runs of zero counts lasting at least that many
+        hours in a site and direction are flagged in an Outage column and
+        are not valid. These, and gaps in the records of the same length,
+        are listed in each site's outage table.
+
+        With rolling_baseline, counts are instead compared with a baseline
+        of the same hour, day and direction in recent weeks, weighted
+        towards the most recent over about baseline_weeks weeks, so that
+        growth over time isn't flagged and local faults are.
+        """
+        logger.info('Cleaning...')
+        if engine not in CLEANING_ENGINES:
+            raise ValueError(
+                'engine must be one of: ' + ', '.join(CLEANING_ENGINES)
+            )
+        if not self.thresholds:
+            raise ValueError(
+                'Thresholds required to clean data'
+            )
 
-        # Upper and lower stdev bounds
-        hourly_avg['StdMax'] = hourly_avg['mean'] + hourly_avg['std']*std_range
-        hourly_avg['StdMin'] = hourly_avg['mean'] - hourly_avg['std']*std_range
+        if rolling_baseline and incremental:
+            raise ValueError(
+                'A rolling baseline is worked out from every record in '
+                'order, so can\'t be used with incremental cleaning'
+            )
 
-        hourly_avg.drop(['mean', 'std'], axis='columns', inplace=True)
+        if self.site_col not in self.thresholds.data.columns:
+            raise ValueError(
+                'Site identifying column "{}" must be the same in both ' +
+                'the data file and site list file'.format(self.site_col)
+            )
 
-        # Bring stdev values into the data frame,
-        # flag valid records with stdev warnings
-        self.data = self.data.merge(hourly_avg)
-        self.data['StdWarning'] = (
-            self.data['Valid'] &
-            ((self.data[self.count_col] < self.data['StdMin'])
-             | (self.data[self.count_col] > self.data['StdMax']))
-        ).astype(int)
-        self.data.drop(['StdMax', 'StdMin'], axis='columns', inplace=True)
+        self.data = self.hourly_totals(self.data)
+
+        # Groups for the standard deviation check
+        sd_group = [self.site_col, 'Hour', 'Day', self.dir_col]
+
+        # Only clean records newer than those from the last incremental run
+        resumed_sites, previous_stats = set(), []
+        if incremental:
+            resumed_sites, previous_stats = self.__resume_cleaning(sd_group)
+            if self.data.empty:
+                logger.info('No new data to clean')
+                return
+
+        # Outages are found in each site and direction's own records, so
+        # aren't hidden by traffic elsewhere
+        outages = None
+        if outage_hours:
+            outages, in_outage = find_outages(self.data, self.site_col,
+                                              self.dir_col, self.count_col,
+                                              outage_hours)
+            self.data['Outage'] = in_outage.astype(np.int8)
+
+        if engine == 'dense':
+            flags, has_stats, stats = dense.flag_counts(
+                self.data, self.thresholds, self.site_col, self.dir_col,
+                self.count_col, sd_group, std_range, previous_stats
+            )
+            for col, values in flags.items():
+                self.data[col] = values
+            self.data = self.data[has_stats]
+        else:
+            stats = self.__flag_counts(sd_group, std_range, previous_stats)
+
+        if rolling_baseline:
+            ids, _ = group_index(self.data, sd_group)
+            std_min, std_max = rolling_bounds(
+                ids, self.data['DateTime'].values.view(np.int64),
+                self.data[self.count_col].values, self.data['Valid'].values,
+                baseline_weeks, std_range
+            )
+            counts = self.data[self.count_col].values
+            with np.errstate(invalid='ignore'):
+                outside_std = (counts < std_min) | (counts > std_max)
+            self.data['StdWarning'] = (
+                self.data['Valid'].values & outside_std
+            ).astype(np.int8)
 
         # Allow the user to mark values outside std range as invalid
         if outside_std_invalid:
             self.data['Valid'] = self.data['Valid'] & \
                                  (self.data['StdWarning'] == 0)
 
-        # Sort values so they can be written out neatly
-        self.data = self.data.sort_values(by=['Date',
+        # Sort values so they can be written out neatly, with each site's
+        # rows together for the site index
+        self.data = self.data.sort_values(by=[self.site_col,
+                                              'Date',
                                               'Hour',
                                               self.dir_col])\
                              .reset_index(drop=True)
 
         # Save out cleaned data
-        for site, site_data in self.data.groupby(self.site_col):
-            dest = os.path.join(self.output_folder, site,
-                                '{} - Cleaned.csv'.format(site))
+        site_groups = list(self.site_index())
+        self.written.extend(write_sites(
+            site_groups, self.output_folder, self.output_format,
+            append_sites=resumed_sites, workers=self.write_workers
+        ))
+        if self.database:
+            CountStore(self.database).write(
+                self.data, self.site_col, self.dir_col, self.count_col,
+                append_sites=resumed_sites
+            )
+            self.written.append(self.database)
+
+        if outages is not None:
+            self.written.extend(write_outages(
+                outages, [site for site, _ in site_groups],
+                self.output_folder, self.site_col, append_sites=resumed_sites
+            ))
+
+        if incremental:
+            for site, site_data in site_groups:
+                inc.save_state(
+                    self.output_folder, site, site_data['DateTime'].max(),
+                    stats.subset(stats.keys[self.site_col].astype(str)
+                                 == site)
+                )
+
+    def summarise_cleaned_data(self, consolidated=False, write=True):
+        # Totals for each direction hold the number of records, valid or not
+        daily = self.aggregates().cubes['daily']
+        daily = daily[daily[self.dir_col] != ALL_DIRECTIONS]
+        self.summary = rollup(daily, [self.site_col],
+                              flag_col='ValidRecords', count_col='Records')
+        if not write:
+            return self.summary
+
+        if consolidated:
+            dest = os.path.join(self.output_folder, SUMMARY_NAME)
             make_folder_if_necessary(dest)
-            site_data.to_csv(dest, index=False)
-
-    def summarise_cleaned_data(self):
-        # Columns to summarise over
-        sum_cats = ['Year', 'Month', 'Day']
-
-        # Get all possible combinations of the columns
-        summary_options = chain(
-            *map(lambda x: list(combinations(sum_cats, x)),
-                 range(1, len(sum_cats)+1))
-        )
-
-        for site, site_data in self.data.groupby(self.site_col):
-            # Get value counts for all combinations
-            all_counts = []
-            for grp in summary_options:
-                df = site_data.groupby(by=list(grp), observed=True)['Valid']\
-                              .value_counts()\
-                              .reset_index(name='Freq')\
-                              .pivot_table(index=grp, columns='Valid',
-                                           values='Freq')\
-                              .reset_index()
-                all_counts.append(df)
-
-            summaries = pd.concat(all_counts, ignore_index=True, sort=False)\
-                          .rename({True: 'Valid', False: 'Not Valid'},
-                                  axis='columns')
-
-            # First fill category NAs, then fill actual value NAs
-            summaries[sum_cats] = summaries[sum_cats].fillna('All')
-            summaries.fillna(0, inplace=True)
-
-            summaries['Valid_%'] = summaries['Valid'] / (summaries['Valid']
-                                                         + summaries['Not Valid'])
+            self.summary.to_csv(dest, index=False)
+            self.written.append(dest)
+            return self.summary
 
+        for site, summary in observed_groups(
+                self.summary.groupby(self.site_col, sort=False)):
             # TODO improve the output name and location
             dest = os.path.join(self.output_folder, site,
                                 '{} Cleaning Summary.csv'.format(site))
             make_folder_if_necessary(dest)
 
-            summaries[sum_cats + ['Valid', 'Not Valid', 'Valid_%']].to_csv(
-                dest, index=False
-            )
+            summary[SUMMARY_DIMS + SUMMARY_COLS].to_csv(dest, index=False)
+            self.written.append(dest)
+
+        return self.summary
+
+    def cleaned_scatter(self, mode='points'):
+        from .graphs import yearly_scatter
 
-    def cleaned_scatter(self):
-        print('Scattering...')
+        logger.info('Scattering...')
         # Flag statuses and colours
         sd_warn = self.data['StdWarning'] != 0
         missing_day = self.data['MissingDay'] == 1
         too_low = self.data['ThreshCheck'] == -1
         too_high = self.data['ThreshCheck'] == 1
-
-        self.data['Status'] = select(
-            [sd_warn, missing_day, too_low, too_high],
-            ['Warning - Outside SD Range',
-             'Full day missing',
-             'Below threshold',
-             'Above threshold'],
-            default='Valid'
+        outage = self.data['Outage'] == 1 if 'Outage' in self.data.columns \
+            else np.zeros(len(self.data), dtype=bool)
+
+        status_codes = select(
+            [sd_warn, missing_day, outage, too_low, too_high],
+            [STATUS_LABELS.index(s) for s in ('Warning - Outside SD Range',
+                                              'Full day missing',
+                                              'Outage',
+                                              'Below threshold',
+                                              'Above threshold')],
+            default=STATUS_LABELS.index('Valid')
+        ).astype(np.int8)
+
+        # Both columns share the codes, only the lookups differ
+        self.data['Status'] = pd.Categorical.from_codes(
+            status_codes, categories=STATUS_LABELS
+        )
+        self.data['ScatterColour'] = pd.Categorical.from_codes(
+            status_codes, categories=STATUS_COLOURS
         )
 
-        issue_colours = {
-            'Warning - Outside SD Range': 'darkorange',
-            'Full day missing': 'grey',
-            'Below threshold': 'black',
-            'Above threshold': 'red',
-            'Valid': 'darkturquoise'
-        }
-
-        self.data['ScatterColour'] = self.data['Status'].map(issue_colours)
-
-        # For each site, generate and save the scatter plots
-        for site_name, site_data in self.data.groupby(self.site_col):
-            dest = os.path.join(self.output_folder, site_name, 'Graphs',
-                                'Cleaned Scatter.png')
-            yearly_scatter(site_data, datetime_col='DateTime',
-                           value_col=self.count_col,
-                           category_col='Status',
-                           colour_col='ScatterColour',
-                           dir_col=self.dir_col,
-                           destination_path=dest)
+        # One figure for each site and year, with only the columns drawn
+        scatter_cols = ['DateTime', self.count_col, 'Status',
+                        'ScatterColour', self.dir_col]
+        jobs = []
+        for site_name, site_data in self.site_index():
+            for _, year_data in observed_groups(
+                    site_data[scatter_cols].groupby(
+                        site_data['DateTime'].dt.year)):
+                dest = os.path.join(self.output_folder, site_name,
+                                    'Graphs', 'Cleaned Scatter.{}'.format(
+                                        self.graph_format))
+                jobs.append(GraphJob(yearly_scatter, dict(
+                    data=year_data, datetime_col='DateTime',
+                    value_col=self.count_col,
+                    category_col='Status',
+                    colour_col='ScatterColour',
+                    dir_col=self.dir_col,
+                    destination_path=dest,
+                    mode=mode
+                )))
+
+        self.written.extend(render_jobs(jobs, self.graph_workers,
+                                        self.graph_pool))
 
     def produce_cal_plots(self, valid_only=True, by_direction=True,
                           min_hours=1):
-        print('Calendaring...')
+        from .graphs import calendar_plot
+
+        logger.info('Calendaring...')
         # Choose data and output folder depending on restricting to valid
         if valid_only:
             if 'Valid' not in self.data.columns:
                 raise ValueError('Data does not contain a "Valid" column - does'
                                  ' it need to be cleaned?')
             save_suffix = 'Cleaned'
-            plot_data = self.data[self.data['Valid']]
         else:
             save_suffix = 'Uncleaned'
-            plot_data = self.data
 
-        grouping = [self.site_col]
+        # For each site and direction, generate and save the calendar plot
+        aggregates = self.aggregates()
+        jobs = []
+        for site_name in aggregates.sites:
+            daily = aggregates.select('daily', site_name, valid_only,
+                                      by_direction)
+            daily = daily.set_index('Date')\
+                         .rename(columns={'Sum': self.count_col})
+            if by_direction:
+                daily = observed_groups(daily.groupby(self.dir_col))
+            elif not daily.empty:
+                daily = [('Total', daily)]
+            else:
+                daily = []
 
-        if by_direction:
-            grouping.append(self.dir_col)
+            for direction, dir_data in daily:
+                dir_data = dir_data[dir_data['Records'] >= min_hours]
 
-        plot_data = plot_data.groupby(grouping + ['Date'],
-                                      as_index=False)\
-                             .agg({self.count_col: ('sum', 'count')})\
-                             .set_index('Date') \
-                             .groupby(grouping)
+                jobs.append(GraphJob(calendar_plot, dict(
+                    data=dir_data[[self.count_col]],
+                    count_column=self.count_col,
+                    destination_path=os.path.join(
+                        self.output_folder, site_name, 'Graphs',
+                        '{} {} Calendar Plot.{}'.format(
+                            direction, save_suffix, self.graph_format
+                        )
+                    )
+                )))
 
-        # For each site and direction, generate and save the calendar plot
-        for grp, site_data in plot_data:
-            if type(grp) == str:
-                grp = [grp]
-            site_data = site_data[
-                site_data[(self.count_col, 'count')] >= min_hours
-            ]
-
-            calendar_plot(site_data,
-                          count_column=(self.count_col, 'sum'),
-                          destination_path=os.path.join(
-                              self.output_folder, grp[0], 'Graphs',
-                              '{} {} Calendar Plot.png'.format(
-                                  grp[-1] if by_direction else 'Total', save_suffix
-                              )
-                          )
-                          )
+        self.written.extend(render_jobs(jobs, self.graph_workers,
+                                        self.graph_pool))
 
     def facet_grids(self, valid_only=True, by_direction=True):
-        print('Faceting...')
+        from .graphs import atc_facet_grid
+
+        logger.info('Faceting...')
 
         if valid_only:
             if 'Valid' not in self.data.columns:
                 raise ValueError('Data does not contain a "Valid" column - does'
                                  ' it need to be cleaned?')
-            plot_data = self.data[self.data['Valid']]
             suffix = '_Cleaned'
         else:
-            plot_data = self.data
             suffix = '_Uncleaned'
 
-        hour_group = [self.site_col, 'Year', 'Day', 'Hour']
-        week_group = [self.site_col, 'Year', 'Day', 'WeekNumber']
         hour_params = dict()
         week_params = dict()
         if by_direction:
             suffix += '_By Direction'
-            hour_group.append(self.dir_col)
             hour_params['hue'] = self.dir_col
-            week_group.append(self.dir_col)
             week_params['separate_cols'] = self.dir_col
         if valid_only:
             suffix += '_Valid Only'
 
-        if not by_direction:
-            cols = [c for c in plot_data.columns
-                    if c not in (self.dir_col, self.count_col)]
-            plot_data = plot_data.groupby(cols, as_index=False) \
-                                 .agg({self.count_col: 'sum'})
-        hour_data = plot_data.groupby(hour_group, as_index=False) \
-                             .agg({self.count_col: 'mean'})
+        # Without directions, totals are of each hour across directions
+        aggregates = self.aggregates()
+        hour_jobs = []
+        week_jobs = []
+        for site_name in aggregates.sites:
+            hour_data = aggregates.select('hourly', site_name, valid_only,
+                                          by_direction)
+            if hour_data.empty:
+                continue
+            hour_data = hour_data.assign(
+                **{self.count_col: hour_data['Sum'] / hour_data['Records']}
+            ).drop(['Sum', 'Records'], axis='columns')
 
-        for site_name, site_data in hour_data.groupby(self.site_col):
             file_name = os.path.join(
                 self.output_folder, site_name, 'Graphs',
-                'Hourly Average by Day{}.png'.format(suffix)
+                'Hourly Average by Day{}.{}'.format(suffix, self.graph_format)
             )
-
-            atc_facet_grid(site_data, separate_rows='Day',
-                           separate_cols='Year',
-                           x='Hour', y=self.count_col,
-                           destination_path=file_name,
-                           **hour_params)
-
-        week_data = plot_data.groupby(week_group, as_index=False) \
-                             .agg({self.count_col: 'sum'})
-
-        for site_name, site_data in week_data.groupby(self.site_col):
+            hour_jobs.append(GraphJob(atc_facet_grid, dict(
+                data=hour_data, separate_rows='Day',
+                separate_cols='Year',
+                x='Hour', y=self.count_col,
+                destination_path=file_name,
+                **hour_params
+            )))
+
+            week_data = aggregates.select('weekly', site_name, valid_only,
+                                          by_direction)\
+                .rename(columns={'Sum': self.count_col})\
+                .drop('Records', axis='columns')
             file_name = os.path.join(
                 self.output_folder, site_name, 'Graphs',
-                'Week Total by Day{}.png'.format(suffix)
+                'Week Total by Day{}.{}'.format(suffix, self.graph_format)
             )
-            atc_facet_grid(site_data, separate_rows='Day',
-                           x='WeekNumber', y=self.count_col,
-                           hue='Year',
-                           destination_path=file_name,
-                           **week_params
-                           )
-
+            week_jobs.append(GraphJob(atc_facet_grid, dict(
+                data=week_data, separate_rows='Day',
+                x='WeekNumber', y=self.count_col,
+                hue='Year',
+                destination_path=file_name,
+                **week_params
+            )))
+
+        self.written.extend(render_jobs(hour_jobs + week_jobs,
+                                        self.graph_workers, self.graph_pool))
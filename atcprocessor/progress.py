@@ -0,0 +1,113 @@
+import sys
+import multiprocessing
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Progress:
+    """
+    Passes how far a run has got to a callback, and lets the run be
+    cancelled between stages.
+
+    callback is called as callback(file, site, stage, fraction), where
+    fraction is the share of the whole run done so far. stage is the stage
+    about to start, or None once a file is finished. site is None when all
+    of a file's sites are processed together.
+
+    Callbacks are only made from the process that created the Progress, so
+    need not be thread safe, but may be called from a worker thread. A GUI
+    should pass updates on to its own thread.
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        # Shared with worker processes, which check it between stages
+        self._cancel_event = multiprocessing.Event()
+
+    def __getstate__(self):
+        # Worker processes can't call back to the caller
+        state = dict(self.__dict__)
+        state['callback'] = None
+        return state
+
+    def update(self, file, site, stage, fraction):
+        if self.callback is not None:
+            self.callback(file, site, stage, fraction)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled('Processing was cancelled')
+
+    def span(self, start, end, file=None, site=None):
+        """
+        Progress for one part of the run, from start to end of the whole.
+        file and site, where given, replace those reported by the part.
+        """
+        return _Span(self, start, end, file, site)
+
+
+class _Span:
+    def __init__(self, parent, start, end, file, site):
+        self.parent = parent
+        self.start = start
+        self.end = end
+        self.file = file
+        self.site = site
+
+    def update(self, file, site, stage, fraction):
+        self.parent.update(
+            file if self.file is None else self.file,
+            site if self.site is None else self.site,
+            stage, self.start + fraction * (self.end - self.start)
+        )
+
+    def cancel(self):
+        self.parent.cancel()
+
+    @property
+    def cancelled(self):
+        return self.parent.cancelled
+
+    def check(self):
+        self.parent.check()
+
+    def span(self, start, end, file=None, site=None):
+        return _Span(self, start, end, file, site)
+
+
+class TextProgress:
+    """
+    Callback showing progress on one line of a terminal, or one line per
+    update where the stream isn't a terminal.
+    """
+    def __init__(self, stream=None, width=30):
+        self.stream = sys.stderr if stream is None else stream
+        self.width = width
+        self.interactive = getattr(self.stream, 'isatty', lambda: False)()
+        self.last_length = 0
+
+    def __call__(self, file, site, stage, fraction):
+        filled = int(round(fraction * self.width))
+        line = '[{}{}] {:3.0f}% {}{}{}'.format(
+            '#' * filled, '-' * (self.width - filled), fraction * 100,
+            file or '', ' [{}]'.format(site) if site else '',
+            ': {}'.format(stage) if stage else ''
+        )
+
+        if self.interactive:
+            # Pad to clear what's left of a longer line
+            self.stream.write('\r' + line.ljust(self.last_length))
+            self.last_length = len(line)
+            if fraction >= 1:
+                self.stream.write('\n')
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
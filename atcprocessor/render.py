@@ -0,0 +1,50 @@
+from collections import namedtuple
+from multiprocessing import Pool
+
+# A single figure to draw: the graphs function and the keyword arguments to
+# call it with. The data passed should be only what that figure needs, as it
+# is pickled and sent to a worker process.
+GraphJob = namedtuple('GraphJob', ['function', 'kwargs'])
+
+# Binned scatters draw each status as an image rather than a marker per
+# point. 'points' keeps the marker per point.
+SCATTER_MODES = ('points', 'binned')
+
+
+def _render(job):
+    # Functions that write more than one file return their destinations
+    written = job.function(**job.kwargs)
+    if written is None:
+        written = [job.kwargs.get('destination_path')]
+    return written
+
+
+def render_jobs(jobs, workers=1, pool=None):
+    """
+    Draw each job's figure, spread across a pool of worker processes when
+    workers is more than 1. Returns the files written. An existing pool can
+    be given to use, so one pool serves every stage of a run rather than
+    each starting its own.
+    """
+    jobs = list(jobs)
+    if workers < 1:
+        raise ValueError('workers must be at least 1')
+    if (workers == 1 and pool is None) or len(jobs) < 2:
+        return [w for j in jobs for w in _render(j)]
+
+    if pool is not None:
+        return _render_in(pool, jobs)
+
+    pool = Pool(min(workers, len(jobs)))
+    try:
+        return _render_in(pool, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _render_in(pool, jobs):
+    # Unordered as the figures are independent; an error in any job is
+    # raised here
+    return [w for written in pool.imap_unordered(_render, jobs)
+            for w in written]
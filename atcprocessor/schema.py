@@ -0,0 +1,259 @@
+import os
+import csv
+import json
+from collections import Counter, namedtuple
+from multiprocessing.pool import ThreadPool
+
+import pandas as pd
+
+from .dates import sniff_date_format
+from .utilities import atomic_write, make_folder_if_necessary
+from .version import __version__
+
+SCHEMA_CACHE_NAME = 'Schema Cache.json'
+SCHEMA_REPORT_NAME = 'Schema Report.csv'
+
+# Rows read from each file to work out column types and the date format
+SAMPLE_ROWS = 200
+
+# Reading a sample is mostly waiting on the disk, so more threads than CPUs
+# still helps
+DEFAULT_WORKERS = 16
+
+# Values read as missing, as by pandas
+MISSING_VALUES = {'', 'NA', 'N/A', 'NaN', 'nan', 'null', 'NULL', '#N/A'}
+
+FileSchema = namedtuple('FileSchema', ['path', 'columns', 'kinds',
+                                       'date_format', 'error'])
+
+
+def _kind(values):
+    values = {v for v in values if v not in MISSING_VALUES}
+    # Columns empty in the sample could be anything, so aren't compared
+    if not values:
+        return None
+    if values <= {'True', 'False'}:
+        return 'boolean'
+    try:
+        for v in values:
+            float(v)
+    except ValueError:
+        return 'text'
+    return 'number'
+
+
+def inspect_file(path, date_col=None, sample_rows=SAMPLE_ROWS):
+    """
+    Columns of a CSV file, the kind of values in each (number, text or
+    boolean) and the format of date_col, from its first sample_rows rows.
+    Files that can't be read are returned with the error instead.
+
+    The sample is read with the csv module, as building a DataFrame of a
+    few rows takes longer than reading them.
+    """
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            columns = next(reader, [])
+            rows = [row for _, row in zip(range(sample_rows), reader)]
+    except (IOError, OSError, ValueError, csv.Error) as e:
+        return FileSchema(path, [], dict(), None, str(e))
+
+    values = dict()
+    for i, col in enumerate(columns):
+        values[col] = [row[i] for row in rows if i < len(row)]
+
+    date_format = None
+    if date_col in values:
+        dates = [v for v in values[date_col] if v not in MISSING_VALUES]
+        try:
+            date_format = sniff_date_format(dates)
+        except ValueError:
+            pass
+
+    return FileSchema(path, columns,
+                      {col: _kind(v) for col, v in values.items()},
+                      date_format, None)
+
+
+class SchemaCache:
+    """
+    Schemas of files already inspected, keyed on the file's path, size and
+    modification time and the settings used to inspect it. Saved as JSON to
+    path if one is given, otherwise only kept in memory.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = dict()
+        if path is not None and os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (IOError, OSError, ValueError):
+                # Left unreadable by an interrupted save
+                self.entries = dict()
+
+    @staticmethod
+    def _key(path, date_col, sample_rows):
+        stat = os.stat(path)
+        return {'version': __version__, 'size': stat.st_size,
+                'mtime': stat.st_mtime, 'date_col': date_col,
+                'sample_rows': sample_rows}
+
+    def get(self, path, date_col, sample_rows):
+        entry = self.entries.get(os.path.abspath(path))
+        try:
+            key = self._key(path, date_col, sample_rows)
+        except OSError:
+            return None
+        if entry is None or entry['key'] != key:
+            return None
+
+        return FileSchema(path, entry['columns'], entry['kinds'],
+                          entry['date_format'], None)
+
+    def put(self, schema, date_col, sample_rows):
+        # Errors aren't kept, so the file is tried again next time
+        if schema.error is not None:
+            return
+
+        self.entries[os.path.abspath(schema.path)] = {
+            'key': self._key(schema.path, date_col, sample_rows),
+            'columns': schema.columns,
+            'kinds': schema.kinds,
+            'date_format': schema.date_format,
+        }
+
+    def save(self):
+        if self.path is None:
+            return
+
+        def write(tmp_path):
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f)
+
+        atomic_write(self.path, write)
+
+
+def required_columns(settings):
+    """
+    The columns chosen in a settings dictionary, which every input file
+    must have.
+    """
+    keys = ['site_col', 'count_col', 'dir_col', 'date_col']
+    if not settings.get('combined_datetime'):
+        keys.append('time_col')
+
+    return [settings[k] for k in keys if settings.get(k)]
+
+
+def inspect_files(paths, date_col=None, required=(), workers=DEFAULT_WORKERS,
+                  cache=None, sample_rows=SAMPLE_ROWS):
+    """
+    Inspect every file, reading those not in cache (a SchemaCache) on
+    workers threads, and return a SchemaReport comparing them. required
+    columns must be in every file.
+    """
+    paths = list(paths)
+    schemas = dict()
+    if cache is not None:
+        for path in paths:
+            schema = cache.get(path, date_col, sample_rows)
+            if schema is not None:
+                schemas[path] = schema
+
+    to_read = [p for p in paths if p not in schemas]
+    if len(to_read) > 1 and workers > 1:
+        with ThreadPool(min(workers, len(to_read))) as pool:
+            read = pool.map(
+                lambda p: inspect_file(p, date_col, sample_rows), to_read
+            )
+    else:
+        read = [inspect_file(p, date_col, sample_rows) for p in to_read]
+
+    for schema in read:
+        schemas[schema.path] = schema
+        if cache is not None:
+            cache.put(schema, date_col, sample_rows)
+    if cache is not None and read:
+        cache.save()
+
+    return SchemaReport([schemas[p] for p in paths], required=required)
+
+
+def _most_common(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return Counter(values).most_common(1)[0][0]
+
+
+class SchemaReport:
+    """
+    How each file's schema differs from most of the others. The columns,
+    their kinds and the date format found in most files are taken as
+    expected, so a single odd file stands out however the files are
+    ordered.
+    """
+    def __init__(self, schemas, required=()):
+        self.schemas = schemas
+        self.required = [c for c in required if c]
+
+        readable = [s for s in schemas if s.error is None]
+        self.columns = list(_most_common(tuple(s.columns) for s in readable)
+                            or ())
+        self.kinds = {
+            c: _most_common(s.kinds.get(c) for s in readable)
+            for c in self.columns
+        }
+        self.date_format = _most_common(s.date_format for s in readable)
+
+        self.problems = [self._problems(s) for s in schemas]
+
+    def _problems(self, schema):
+        if schema.error is not None:
+            return ['Could not be read: {}'.format(schema.error)]
+
+        problems = []
+        expected = list(self.columns)
+        expected += [c for c in self.required if c not in expected]
+        missing = [c for c in expected if c not in schema.columns]
+        extra = [c for c in schema.columns if c not in expected]
+        if missing:
+            problems.append('Missing columns: ' + ', '.join(missing))
+        if extra:
+            problems.append('Extra columns: ' + ', '.join(extra))
+
+        for col, kind in self.kinds.items():
+            found = schema.kinds.get(col)
+            if None not in (kind, found) and found != kind:
+                problems.append('{} is {} rather than {}'.format(col, found,
+                                                                 kind))
+
+        if self.date_format is not None \
+                and schema.date_format != self.date_format:
+            problems.append('Date format {} rather than {}'.format(
+                schema.date_format or 'not recognised', self.date_format
+            ))
+
+        return problems
+
+    @property
+    def mismatched(self):
+        return [s.path for s, p in zip(self.schemas, self.problems) if p]
+
+    @property
+    def consistent(self):
+        return not self.mismatched
+
+    def to_frame(self):
+        return pd.DataFrame({
+            'File': [s.path for s in self.schemas],
+            'Columns': [', '.join(s.columns) for s in self.schemas],
+            'DateFormat': [s.date_format for s in self.schemas],
+            'Problems': ['; '.join(p) for p in self.problems],
+        }, columns=['File', 'Columns', 'DateFormat', 'Problems'])
+
+    def write(self, destination_path):
+        make_folder_if_necessary(destination_path)
+        self.to_frame().to_csv(destination_path, index=False)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+
+class SiteIndex:
+    """
+    Where each site's rows are in a frame. The frame is sorted by site, so
+    each site's rows are a contiguous slice and can be taken as a view
+    rather than a copy. Built once and shared by every stage in place of
+    grouping the whole frame by site again.
+    """
+    def __init__(self, data, site_col):
+        codes, sites = pd.factorize(data[site_col], sort=True)
+
+        # A stable sort keeps each site's rows in their existing order
+        if len(codes) and (np.diff(codes) < 0).any():
+            order = np.argsort(codes, kind='mergesort')
+            data = data.iloc[order].reset_index(drop=True)
+            codes = codes[order]
+
+        self.data = data
+        self.site_col = site_col
+        self.sites = list(sites)
+        self.positions = {site: i for i, site in enumerate(self.sites)}
+
+        # Rows without a site sort first and are left out of every slice
+        self.bounds = np.searchsorted(codes, np.arange(len(self.sites) + 1))
+
+    def __len__(self):
+        return len(self.sites)
+
+    def __iter__(self):
+        return self.groups()
+
+    def rows(self, site):
+        i = self.positions[site]
+        return self.data.iloc[self.bounds[i]:self.bounds[i + 1]]
+
+    def groups(self, valid_only=False):
+        """
+        (site, rows) for each site, in site order. With valid_only, only
+        records flagged Valid are included, and sites without any are left
+        out.
+        """
+        for i, site in enumerate(self.sites):
+            rows = self.data.iloc[self.bounds[i]:self.bounds[i + 1]]
+            if valid_only:
+                rows = rows[rows['Valid'].values]
+                if rows.empty:
+                    continue
+            yield site, rows
@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+
+STATS_COLS = ['n', 'sum', 'sumsq']
+
+
+def group_index(data, group_cols):
+    """
+    Number each record by its group in a single pass. Returns the group
+    number of every record (-1 where any key is missing) and a frame of the
+    distinct keys, in order of group number.
+    """
+    combined = np.zeros(len(data), dtype=np.int64)
+    missing = np.zeros(len(data), dtype=bool)
+    levels = []
+    for col in group_cols:
+        codes, uniques = pd.factorize(data[col])
+        missing |= codes < 0
+        combined = combined * max(len(uniques), 1) + codes
+        levels.append(uniques)
+
+    combined[missing] = -1
+    ids, distinct = pd.factorize(combined)
+    if missing.any():
+        # -1 was counted as a group of its own
+        missing_id = ids[missing][0]
+        distinct = np.delete(distinct, missing_id)
+        ids = np.where(ids > missing_id, ids - 1, ids)
+        ids[missing] = -1
+
+    # Unpick the combined codes into the codes for each column
+    keys = dict()
+    remaining = np.asarray(distinct, dtype=np.int64)
+    for col, uniques in reversed(list(zip(group_cols, levels))):
+        remaining, codes = np.divmod(remaining, max(len(uniques), 1))
+        taken = uniques.take(codes)
+        # Frames are much slower to build from indexes, dates especially,
+        # than from the arrays behind them
+        if isinstance(taken, pd.Index) and getattr(taken, 'tz', None) is None:
+            taken = taken.values
+        keys[col] = taken
+
+    return ids, pd.DataFrame(keys, columns=group_cols)
+
+
+class GroupStats:
+    """
+    Count, sum and sum of squares of a value for each group. These are
+    sufficient to give the mean and standard deviation, and unlike them can
+    be combined across chunks, processes or runs by adding.
+    """
+    def __init__(self, keys, n, total, total_sq):
+        self.keys = keys.reset_index(drop=True)
+        self.group_cols = list(keys.columns)
+        self.n = np.asarray(n, dtype=np.int64)
+        self.total = np.asarray(total, dtype=np.float64)
+        self.total_sq = np.asarray(total_sq, dtype=np.float64)
+
+    @classmethod
+    def from_data(cls, data, group_cols, value_col, mask=None, index=None):
+        # index may be passed if group_index has already been run on data
+        ids, keys = group_index(data, group_cols) if index is None else index
+
+        values = data[value_col].values.astype(np.float64)
+        use = ids >= 0
+        if mask is not None:
+            use &= np.asarray(mask, dtype=bool)
+        ids, values = ids[use], values[use]
+
+        return cls(keys,
+                   np.bincount(ids, minlength=len(keys)),
+                   np.bincount(ids, weights=values, minlength=len(keys)),
+                   np.bincount(ids, weights=values ** 2,
+                               minlength=len(keys)))
+
+    @classmethod
+    def from_frame(cls, frame, group_cols):
+        return cls(frame[group_cols], frame['n'], frame['sum'],
+                   frame['sumsq'])
+
+    def to_frame(self):
+        frame = self.keys.copy()
+        frame['n'] = self.n
+        frame['sum'] = self.total
+        frame['sumsq'] = self.total_sq
+        return frame
+
+    @classmethod
+    def combine(cls, all_stats):
+        all_stats = list(all_stats)
+        group_cols = all_stats[0].group_cols
+        frame = pd.concat([s.to_frame() for s in all_stats],
+                          ignore_index=True, sort=False)
+
+        ids, keys = group_index(frame, group_cols)
+        return cls(keys,
+                   np.bincount(ids, weights=frame['n'], minlength=len(keys)),
+                   np.bincount(ids, weights=frame['sum'],
+                               minlength=len(keys)),
+                   np.bincount(ids, weights=frame['sumsq'],
+                               minlength=len(keys)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def subset(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        return GroupStats(self.keys[mask], self.n[mask], self.total[mask],
+                          self.total_sq[mask])
+
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.total / self.n
+
+    def std(self):
+        # Sample standard deviation, as pandas. Rounding can take the
+        # variance just below 0.
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (self.total_sq - self.total * self.mean()) / (self.n - 1)
+        var = np.where(self.n > 1, np.clip(var, 0, None), np.nan)
+        return np.sqrt(var)
+
+    def bounds(self, std_range):
+        mean, std = self.mean(), self.std()
+        return mean - std * std_range, mean + std * std_range
+
+    def positions(self, data):
+        """
+        The position of each record's group in these statistics, or -1
+        where the group isn't present.
+        """
+        both = pd.concat([self.keys, data[self.group_cols]],
+                         ignore_index=True, sort=False)
+        ids, _ = group_index(both, self.group_cols)
+
+        lookup = np.full(len(both) + 1, -1, dtype=np.int64)
+        lookup[ids[:len(self.keys)]] = np.arange(len(self.keys))
+
+        # Missing keys have the id -1, which picks up the -1 at the end
+        return lookup[ids[len(self.keys):]]
+
+
+def time_order(ids, times):
+    """
+    Positions of records sorted by group, then by time within each group.
+    Records usually arrive in time order, in which case a stable sort by
+    group alone is enough.
+    """
+    order = np.argsort(ids, kind='mergesort')
+    sorted_ids, sorted_times = ids[order], times[order]
+    if (np.diff(sorted_times)[sorted_ids[1:] == sorted_ids[:-1]] < 0).any():
+        # Sorting by time then stably by group is much faster than lexsort
+        order = np.argsort(times, kind='mergesort')
+        order = order[np.argsort(ids[order], kind='mergesort')]
+
+    return order
+
+
+# Nanoseconds in a week, the time between a group's records in hourly data
+WEEK = 7 * 24 * 3600 * 10 ** 9
+
+# Valid records a group needs before its rolling baseline is used
+MIN_HISTORY = 4
+
+# Standard deviations from the rolling baseline that a count is limited to
+# before being added to it. Much closer than this and the baseline's
+# standard deviation shrinks as each count is added.
+CLIP_RANGE = 3
+
+
+def rolling_bounds(ids, times, values, use, weeks, std_range,
+                   min_history=MIN_HISTORY):
+    """
+    Bounds std_range standard deviations either side of each record's
+    rolling baseline: the exponentially weighted mean and standard
+    deviation of the earlier records of its group with use set, each
+    limited to CLIP_RANGE standard deviations of the baseline when it was
+    added. A record's
+    weight falls by a factor of 1 - 2 / (weeks + 1) for each week since
+    it, so gaps and sub-hourly records are weighted by how old they are.
+    Bounds are NaN until a group has min_history earlier records.
+
+    Each group's baseline is updated a record at a time, every group
+    together, so time taken is linear in the number of records.
+    """
+    alpha = 2 / (weeks + 1)
+    values = np.asarray(values, dtype=np.float64)
+    use = np.asarray(use, dtype=bool) & (ids >= 0)
+
+    # Where each group starts in time order, longest groups first, so the
+    # groups with an nth record are always the first few
+    order = time_order(ids, times)
+    sorted_ids = ids[order]
+    group_start = np.r_[0, np.flatnonzero(np.diff(sorted_ids)) + 1]
+    run_lengths = np.diff(np.r_[group_start, len(order)])
+    longest = np.argsort(-run_lengths, kind='mergesort')
+    group_start, run_lengths = group_start[longest], run_lengths[longest]
+
+    n_groups = ids.max() + 1 if len(ids) else 0
+    mean = np.zeros(n_groups)
+    var = np.zeros(n_groups)
+    # Sum of the squared weights, to correct the variance for the few
+    # records that effectively make it up, as pandas' ewm(bias=False)
+    sq_weights = np.ones(n_groups)
+    n = np.zeros(n_groups, dtype=np.int64)
+    last = np.zeros(n_groups, dtype=np.int64)
+
+    lower = np.full(len(values), np.nan)
+    upper = np.full(len(values), np.nan)
+    for rank in range(run_lengths[0] if len(run_lengths) else 0):
+        # The next record of every group with one left
+        with_rank = np.searchsorted(-run_lengths, -rank, side='left')
+        records = order[group_start[:with_rank] + rank]
+        records = records[ids[records] >= 0]
+        groups = ids[records]
+
+        known = n[groups] >= min_history
+        centre = mean[groups[known]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(var[groups[known]]
+                          / (1 - sq_weights[groups[known]]))
+        lower[records[known]] = centre - std_range * std
+        upper[records[known]] = centre + std_range * std
+
+        # Counts far from the baseline are brought back towards it before
+        # being added, so one spike doesn't widen the bounds for weeks after
+        # but a lasting change still moves the baseline
+        x = values[records]
+        x[known] = np.clip(x[known], centre - CLIP_RANGE * std,
+                           centre + CLIP_RANGE * std)
+
+        used = use[records]
+        records, groups, x = records[used], groups[used], x[used]
+        first = n[groups] == 0
+        weight = 1 - (1 - alpha) ** ((times[records] - last[groups]) / WEEK)
+        weight[first] = 1
+
+        diff = x - mean[groups]
+        step = weight * diff
+        mean[groups] += step
+        var[groups] = np.where(first, 0,
+                               (1 - weight) * (var[groups] + diff * step))
+        sq_weights[groups] = (1 - weight) ** 2 * sq_weights[groups] \
+            + weight ** 2
+        n[groups] += 1
+        last[groups] = times[records]
+
+    return lower, upper
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Rows inserted in each statement, to bound the memory used converting
+BATCH_SIZE = 50000
+
+# Most parameters SQLite allows in one statement in older versions
+MAX_PARAMETERS = 900
+
+COLUMNS = ['Site', 'Direction', 'DateTime', 'Count', 'ThreshCheck',
+           'MissingDay', 'StdWarning', 'Valid', 'Outage']
+FLAG_DTYPES = {
+    'ThreshCheck': np.int8,
+    'MissingDay': np.int8,
+    'StdWarning': np.int8,
+    'Valid': bool,
+    'Outage': np.int8,
+}
+
+# Flags only added by some cleaning options, stored as 0 when not there
+OPTIONAL_FLAGS = ('Outage',)
+
+# Dates are stored as ISO 8601 text, which sorts and compares in date order
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS counts ('
+    'Site TEXT NOT NULL, Direction TEXT NOT NULL, DateTime TEXT NOT NULL, '
+    'Count NUMERIC, ThreshCheck INTEGER, MissingDay INTEGER, '
+    'StdWarning INTEGER, Valid INTEGER, Outage INTEGER NOT NULL DEFAULT 0)',
+    # In the order records are written and read, so inserts add to the end
+    # of each site's part of the index rather than throughout it
+    'CREATE INDEX IF NOT EXISTS counts_site '
+    'ON counts (Site, DateTime, Direction)',
+]
+
+
+def _datetime_text(value):
+    return pd.Timestamp(value).strftime(DATETIME_FORMAT)
+
+
+class CountStore:
+    """
+    Cleaned counts of every site in one indexed SQLite database, so slices
+    across many sites can be read without opening each site's files.
+    Several processes can write to the same database, each waiting for the
+    others' transactions to finish.
+    """
+    def __init__(self, path, timeout=60):
+        folder = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.path = path
+        self.timeout = timeout
+
+        conn = self.connect()
+        try:
+            # Readers aren't blocked while another process writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                # Stores made before a column was added are given it
+                stored = [r[1] for r in
+                          conn.execute('PRAGMA table_info(counts)')]
+                for col in COLUMNS:
+                    if col not in stored:
+                        conn.execute('ALTER TABLE counts ADD COLUMN {} '
+                                     'INTEGER NOT NULL DEFAULT 0'.format(col))
+        finally:
+            conn.close()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def write(self, data, site_col, dir_col, count_col, append_sites=()):
+        """
+        Add cleaned data to the store, replacing any records already stored
+        for its sites other than those in append_sites. Each site is written
+        in its own transaction.
+        """
+        sites = data[site_col].astype(str).values
+        columns = [
+            sites,
+            data[dir_col].astype(str).values,
+            data['DateTime'].values.astype('datetime64[s]'),
+            data[count_col].values,
+        ]
+        for col in COLUMNS[4:]:
+            if col in OPTIONAL_FLAGS and col not in data.columns:
+                columns.append(np.zeros(len(data), dtype=FLAG_DTYPES[col]))
+            else:
+                columns.append(data[col].values)
+
+        # Data is sorted by site after cleaning, but needn't be
+        order = np.argsort(sites, kind='mergesort')
+        sorted_sites = sites[order]
+        bounds = np.flatnonzero(np.r_[True,
+                                      sorted_sites[1:] != sorted_sites[:-1],
+                                      True])
+
+        insert = 'INSERT INTO counts ({}) VALUES ({})'.format(
+            ', '.join(COLUMNS), ', '.join('?' * len(COLUMNS))
+        )
+        conn = self.connect()
+        try:
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                site = sorted_sites[start]
+                with conn:
+                    if site not in append_sites:
+                        conn.execute('DELETE FROM counts WHERE Site = ?',
+                                     (site,))
+                    for batch in range(start, end, BATCH_SIZE):
+                        conn.executemany(insert, self._rows(
+                            columns, order[batch:min(batch + BATCH_SIZE, end)]
+                        ))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _rows(columns, index):
+        # Python values are only made for a batch at a time, as a tuple per
+        # record takes many times the memory of the arrays
+        sites, directions, dates, counts = (c[index] for c in columns[:4])
+        return zip(sites.tolist(), directions.tolist(),
+                   dates.astype(str).tolist(), counts.tolist(),
+                   *(c[index].astype(np.int64).tolist()
+                     for c in columns[4:]))
+
+    def sites(self):
+        conn = self.connect()
+        try:
+            return [r[0] for r in conn.execute(
+                'SELECT DISTINCT Site FROM counts ORDER BY Site'
+            )]
+        finally:
+            conn.close()
+
+    def query(self, sites=None, start=None, end=None, directions=None,
+              valid_only=False):
+        """
+        Stored records, optionally only those of the given sites and
+        directions, from start up to but not including end, and flagged
+        Valid. Records are in order of site, date and time, and direction.
+        """
+        conditions, params = [], []
+        if start is not None:
+            conditions.append('DateTime >= ?')
+            params.append(_datetime_text(start))
+        if end is not None:
+            conditions.append('DateTime < ?')
+            params.append(_datetime_text(end))
+        if directions is not None:
+            directions = [str(d) for d in directions]
+            conditions.append('Direction IN ({})'.format(
+                ', '.join('?' * len(directions))
+            ))
+            params.extend(directions)
+        if valid_only:
+            conditions.append('Valid = 1')
+
+        # Long lists of sites are queried a part at a time, in site order
+        if sites is None:
+            site_parts = [None]
+        else:
+            sites = sorted(set(str(s) for s in sites))
+            size = max(MAX_PARAMETERS - len(params), 1)
+            site_parts = [sites[i:i + size]
+                          for i in range(0, len(sites), size)]
+
+        conn = self.connect()
+        try:
+            frames = []
+            for part in site_parts:
+                where, part_params = list(conditions), list(params)
+                if part is not None:
+                    where.insert(0, 'Site IN ({})'.format(
+                        ', '.join('?' * len(part))
+                    ))
+                    part_params[:0] = part
+
+                sql = 'SELECT {} FROM counts'.format(', '.join(COLUMNS))
+                if where:
+                    sql += ' WHERE ' + ' AND '.join(where)
+                sql += ' ORDER BY Site, DateTime, Direction'
+                frames.append(pd.read_sql_query(sql, conn,
+                                                params=part_params))
+        finally:
+            conn.close()
+
+        data = pd.concat(frames, ignore_index=True) if frames \
+            else pd.DataFrame(columns=COLUMNS)
+        data['DateTime'] = pd.to_datetime(data['DateTime'],
+                                          format=DATETIME_FORMAT)
+        for col, dtype in FLAG_DTYPES.items():
+            data[col] = data[col].astype(dtype)
+
+        return data
@@ -0,0 +1,73 @@
+from itertools import chain, combinations
+
+import numpy as np
+import pandas as pd
+
+from .stats import group_index
+
+SUMMARY_DIMS = ['Year', 'Month', 'Day']
+SUMMARY_COLS = ['Valid', 'Not Valid', 'Valid_%']
+
+# File name of the summary of all sites together
+SUMMARY_NAME = 'Cleaning Summary.csv'
+
+
+def dimension_combinations(dims=SUMMARY_DIMS):
+    return list(chain(*(combinations(dims, i)
+                        for i in range(1, len(dims) + 1))))
+
+
+def rollup(data, by, dims=SUMMARY_DIMS, flag_col='Valid', count_col=None):
+    """
+    Valid and Not Valid counts for each combination of dims within each
+    group of the by columns. Counts are taken once at the finest grain and
+    each coarser level is then summed from those, rather than going back to
+    the records. Levels that are summed over are filled with 'All'.
+
+    Each row of data is one record, flagged valid by flag_col, unless
+    count_col is given. Then each row stands for count_col records, of which
+    flag_col are valid.
+    """
+    ids, finest = group_index(data, by + dims)
+    use = ids >= 0
+    flags = np.asarray(data[flag_col], dtype=np.float64)[use]
+    if count_col is None:
+        totals = np.bincount(ids[use], minlength=len(finest))
+    else:
+        totals = np.bincount(ids[use], weights=data[count_col].values[use],
+                             minlength=len(finest))
+    finest['Valid'] = np.bincount(ids[use], weights=flags,
+                                  minlength=len(finest))
+    finest['Not Valid'] = totals - finest['Valid']
+
+    levels = []
+    for combo in dimension_combinations(dims):
+        cols = by + list(combo)
+        level_ids, level = group_index(finest, cols)
+        for col in ('Valid', 'Not Valid'):
+            level[col] = np.bincount(level_ids, weights=finest[col],
+                                     minlength=len(level))
+        levels.append(level.sort_values(cols))
+
+    summary = pd.concat(levels, ignore_index=True, sort=False)
+    summary[dims] = summary[dims].fillna('All')
+    summary['Valid_%'] = summary['Valid'] / (summary['Valid']
+                                             + summary['Not Valid'])
+
+    return summary[by + dims + SUMMARY_COLS]
+
+
+def combine_summaries(summaries, by, dims=SUMMARY_DIMS):
+    """
+    Add together summaries of the same groups, such as one site split
+    across several input files.
+    """
+    summary = pd.concat(summaries, ignore_index=True, sort=False)
+    ids, combined = group_index(summary, by + dims)
+    for col in ('Valid', 'Not Valid'):
+        combined[col] = np.bincount(ids, weights=summary[col],
+                                    minlength=len(combined))
+    combined['Valid_%'] = combined['Valid'] / (combined['Valid']
+                                               + combined['Not Valid'])
+
+    return combined[by + dims + SUMMARY_COLS]
@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .utilities import make_folder_if_necessary
+
+# Share of each hour's daily traffic, with morning and evening peaks
+_HOURLY_PROFILE = np.array([
+    0.4, 0.25, 0.2, 0.2, 0.35, 1.0, 3.0, 6.5, 7.5, 5.5, 4.8, 5.0,
+    5.2, 5.2, 5.4, 6.0, 7.2, 7.8, 6.0, 4.2, 3.0, 2.2, 1.5, 0.9,
+])
+_HOURLY_PROFILE = _HOURLY_PROFILE / _HOURLY_PROFILE.sum()
+
+# Traffic on each day of the week relative to the average, Monday first
+_DAY_FACTORS = np.array([1.02, 1.03, 1.04, 1.05, 1.1, 0.9, 0.86])
+
+INTERVALS = (60, 15)
+
+
+def generate_counts(sites=1, years=1, directions=('N', 'S'),
+                    start_year=2016, interval=60, zero_days=0.01,
+                    spikes=0.001, low_counts=0.005, seed=0):
+    """
+    Traffic counts for each site, direction and interval, in the same layout
+    as NTDS exports. Daily, weekly and seasonal patterns are applied to a
+    random daily flow for each site, and faults are then added: whole days
+    of zeros, spikes of ten times the usual count, and counts of 0-4. The
+    fault arguments are the share of site days, and of records, affected.
+
+    Hourly data has an integer Hour column. Data at shorter intervals has a
+    Time column instead.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(
+            'interval must be one of: ' + ', '.join(map(str, INTERVALS))
+        )
+
+    rng = np.random.RandomState(seed)
+    dates = pd.date_range('{}-01-01'.format(start_year),
+                          '{}-12-31'.format(start_year + years - 1))
+    times = pd.timedelta_range(0, periods=24 * 60 // interval,
+                               freq='{}min'.format(interval))
+    periods = len(times)
+
+    # One value along each axis: site, date, time, direction
+    n_sites, n_dates, n_dirs = sites, len(dates), len(directions)
+    daily_flow = rng.lognormal(np.log(8000), 0.6, n_sites)
+    seasonal = 1 + 0.15 * np.sin(
+        2 * np.pi * (np.asarray(dates.dayofyear) - 80) / 365
+    )
+    day_factor = _DAY_FACTORS[np.asarray(dates.dayofweek)]
+    time_share = np.repeat(_HOURLY_PROFILE, periods // 24) / (periods // 24)
+
+    # Directions swap peaks, as commuters go one way in the morning and
+    # come back in the evening
+    dir_share = np.ones((n_dirs, periods)) / n_dirs
+    if n_dirs > 1:
+        am = np.asarray(times < pd.Timedelta(hours=12))
+        dir_share[0, am], dir_share[0, ~am] = 0.6, 0.4
+        dir_share[1, am], dir_share[1, ~am] = 0.4, 0.6
+
+    mean = (daily_flow[:, None, None, None]
+            * (seasonal * day_factor)[None, :, None, None]
+            * time_share[None, None, :, None]
+            * dir_share.T[None, None, :, :])
+    counts = rng.poisson(mean)
+
+    # Faults
+    zero = rng.rand(n_sites, n_dates) < zero_days
+    counts[zero] = 0
+    spike = rng.rand(*counts.shape) < spikes
+    counts[spike] *= 10
+    low = rng.rand(*counts.shape) < low_counts
+    counts[low] = rng.randint(0, 5, low.sum())
+
+    site_idx, date_idx, time_idx, dir_idx = np.indices(counts.shape)
+    data = pd.DataFrame({
+        'Site': np.array(site_names(sites))[site_idx.ravel()],
+        'Direction': np.array(directions)[dir_idx.ravel()],
+        'Date': dates.strftime('%d/%m/%Y')[date_idx.ravel()],
+        'Count': counts.ravel(),
+    }, columns=['Site', 'Direction', 'Date', 'Count'])
+
+    if interval == 60:
+        data.insert(3, 'Hour', time_idx.ravel())
+    else:
+        time_labels = np.array(['{:02d}:{:02d}:00'.format(
+            t.components.hours, t.components.minutes) for t in times])
+        data.insert(3, 'Time', time_labels[time_idx.ravel()])
+
+    return data
+
+
+def site_names(sites):
+    return ['Site {}'.format(i + 1) for i in range(sites)]
+
+
+def write_dataset(folder, sites=1, files_per_site=True, categories=3,
+                  **kwargs):
+    """
+    Write generated counts, with a site list and thresholds to match, under
+    folder. Counts are written one file per site to the 'input' folder, or
+    to a single file. Returns the settings needed to process them.
+    """
+    data = generate_counts(sites=sites, **kwargs)
+    input_folder = os.path.join(folder, 'input')
+
+    if files_per_site:
+        for site, site_data in data.groupby('Site'):
+            dest = os.path.join(input_folder, '{}.csv'.format(site))
+            make_folder_if_necessary(dest)
+            site_data.to_csv(dest, index=False)
+    else:
+        dest = os.path.join(input_folder, 'All Sites.csv')
+        make_folder_if_necessary(dest)
+        data.to_csv(dest, index=False)
+
+    site_list = os.path.join(folder, 'site list.csv')
+    pd.DataFrame({
+        'Site': site_names(sites),
+        'Category': [i % categories + 1 for i in range(sites)],
+    }, columns=['Site', 'Category']).to_csv(site_list, index=False)
+
+    # Low counts added as faults fall below every category's low limit.
+    # Busier categories have higher high limits.
+    thresholds = os.path.join(folder, 'thresholds.csv')
+    pd.DataFrame({
+        'Category': range(1, categories + 1),
+        'Low': [5] * categories,
+        'High': [5000 * (c + 1) for c in range(categories)],
+    }, columns=['Category', 'Low', 'High']).to_csv(thresholds, index=False)
+
+    hourly = 'Hour' in data.columns
+    return {
+        'input_folder': input_folder,
+        'site_list': site_list,
+        'path_to_csv': thresholds,
+        'output_folder': os.path.join(folder, 'output'),
+        'site_col': 'Site',
+        'count_col': 'Count',
+        'dir_col': 'Direction',
+        'date_col': 'Date',
+        'time_col': 'Hour' if hourly else 'Time',
+        'hour_only': hourly,
+    }
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+import pandas as pd
+
+from .. import processor
+
+DATADIR = os.path.join(os.path.dirname(__file__), 'test files')
+
+
+@pytest.fixture
+def thresholds():
+    return processor.Thresholds(
+        path_to_csv=os.path.join(DATADIR, 'thresholds.csv'),
+        site_list=os.path.join(DATADIR, 'site list.csv')
+    )
+
+
+@pytest.fixture
+def raw_counts():
+    return pd.read_csv(os.path.join(DATADIR, 'sites', 'Site 1 Dummy Data.csv'))
+
+
+@pytest.fixture
+def clean_counts(thresholds):
+    """
+    Clean a copy of data with the test files' columns and thresholds, or
+    others given, returning the CountSite. site_options are passed to the
+    CountSite, anything else to clean_data.
+    """
+    default_thresholds = thresholds
+
+    def clean(data, output_folder, thresholds=None, site_options=None,
+              **kwargs):
+        c = processor.CountSite(data=data.copy(),
+                                output_folder=output_folder,
+                                thresholds=thresholds or default_thresholds,
+                                site_col='Site', count_col='Count',
+                                dir_col='Direction', date_col='Date',
+                                time_col='Hour', hour_only=True,
+                                **(site_options or {}))
+        c.clean_data(**kwargs)
+        return c
+
+    return clean
@@ -0,0 +1,314 @@
+import os
+import json
+from multiprocessing import Pool
+
+import pytest
+import pandas as pd
+
+from .. import batch, render
+from ..progress import Progress
+
+
+class TestBatch:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+        self.input_folder = str(tmpdir_factory.mktemp('Inputs'))
+        self.datadir = os.path.join(os.path.dirname(__file__), 'test files')
+
+        self.settings = dict(
+            input_folder=self.input_folder,
+            site_list=os.path.join(self.datadir, 'site list.csv'),
+            path_to_csv=os.path.join(self.datadir, 'thresholds.csv'),
+            output_folder=self.output_folder,
+            site_col='Site',
+            count_col='Count',
+            dir_col='Direction',
+            date_col='Date',
+            time_col='Hour'
+        )
+
+        # Two files missing the count column - both should be reported
+        data = pd.read_csv(os.path.join(self.datadir, 'sites',
+                                        'Site 1 Dummy Data.csv'),
+                           nrows=48)
+        for i in range(2):
+            data.drop('Count', axis='columns').to_csv(
+                os.path.join(self.input_folder, 'Bad {}.csv'.format(i)),
+                index=False
+            )
+
+    def test_load_settings_unknown(self):
+        path = os.path.join(self.output_folder, 'bad settings.json')
+        with open(path, 'w') as f:
+            json.dump(dict(self.settings, not_a_setting=1), f)
+
+        with pytest.raises(ValueError):
+            batch.load_settings(path)
+
+    def test_load_settings_defaults(self):
+        settings = batch.load_settings(
+            os.path.join(self.datadir, 'outputs', 'settings.json')
+        )
+        assert set(settings) == set(batch.DEFAULT_SETTINGS)
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_errors_reported(self, workers):
+        report = batch.BatchRunner(self.settings, workers=workers).run()
+
+        assert not report.succeeded
+        assert len(report.failures) == 2
+        assert all(r.error_type == 'ValueError' for r in report.failures)
+        assert os.path.isfile(os.path.join(self.output_folder,
+                                           batch.REPORT_NAME))
+        assert os.path.isfile(os.path.join(self.output_folder,
+                                           'settings.json'))
+
+    def test_no_input_files(self):
+        settings = dict(self.settings, input_folder=self.output_folder)
+        with pytest.raises(ValueError):
+            batch.BatchRunner(settings, workers=1).run()
+
+    def test_consolidated_summary(self):
+        # One site split across two files
+        data = pd.read_csv(os.path.join(self.datadir, 'sites',
+                                        'Site 1 Dummy Data.csv'))
+        half = len(data) // 2
+        for i, part in enumerate((data[:half], data[half:])):
+            part.to_csv(os.path.join(self.input_folder,
+                                     'Good {}.csv'.format(i)), index=False)
+
+        batch.BatchRunner(self.settings, workers=1,
+                          stages=('clean', 'summary'),
+                          consolidated_summary=True).run()
+
+        summary = pd.read_csv(os.path.join(self.output_folder,
+                                           'Cleaning Summary.csv'))
+        overall = summary[(summary[['Month', 'Day']] == 'All')
+                          .all(axis='columns')]
+        assert len(overall) == summary['Year'].nunique() - 1
+        assert not os.path.isfile(os.path.join(
+            self.output_folder, 'Site 1', 'Site 1 Cleaning Summary.csv'
+        ))
+
+    def test_consolidated_summary_unchanged(self):
+        os.remove(os.path.join(self.input_folder, 'Bad 0.csv'))
+        os.remove(os.path.join(self.input_folder, 'Bad 1.csv'))
+        data = pd.read_csv(os.path.join(self.datadir, 'sites',
+                                        'Site 1 Dummy Data.csv'))
+        half = len(data) // 2
+        for i, part in enumerate((data[:half], data[half:])):
+            part.to_csv(os.path.join(self.input_folder,
+                                     'Good {}.csv'.format(i)), index=False)
+        dest = os.path.join(self.output_folder, 'Cleaning Summary.csv')
+        cleaned = os.path.join(self.output_folder, 'Site 1',
+                               'Site 1 - Cleaned.csv')
+
+        def run():
+            assert batch.BatchRunner(self.settings, workers=1,
+                                     stages=('clean', 'summary'),
+                                     consolidated_summary=True)\
+                .run().succeeded
+            with open(dest) as f:
+                return f.read()
+
+        first = run()
+        with open(cleaned, 'w') as f:
+            f.write('marker')
+        os.remove(dest)
+        second = run()
+
+        # Neither input is cleaned again, but both are summarised
+        with open(cleaned) as f:
+            assert f.read() == 'marker'
+        same = first == second
+        assert same
+
+    def test_nested_graph_workers(self):
+        with pytest.raises(ValueError):
+            batch.BatchRunner(self.settings, workers=2, graph_workers=2)
+
+    def test_graph_pool_per_run(self, monkeypatch):
+        os.remove(os.path.join(self.input_folder, 'Bad 0.csv'))
+        os.remove(os.path.join(self.input_folder, 'Bad 1.csv'))
+        data = pd.read_csv(os.path.join(self.datadir, 'sites',
+                                        'Site 1 Dummy Data.csv'))
+        half = len(data) // 2
+        for i, part in enumerate((data[:half], data[half:])):
+            part.to_csv(os.path.join(self.input_folder,
+                                     'Good {}.csv'.format(i)), index=False)
+
+        # Only the run's own pool may be started
+        pools = []
+
+        def counted_pool(*args, **kwargs):
+            pools.append(args)
+            return Pool(*args, **kwargs)
+
+        monkeypatch.setattr(render, 'Pool', None)
+        monkeypatch.setattr(batch, 'Pool', counted_pool)
+        report = batch.BatchRunner(self.settings, workers=1, graph_workers=2,
+                                   stages=('clean', 'scatter', 'facets'))\
+            .run()
+
+        assert report.succeeded
+        assert len(pools) == 1
+        assert os.listdir(os.path.join(self.output_folder, 'Site 1',
+                                       'Graphs'))
+
+    def test_unchanged_inputs_skipped(self):
+        os.remove(os.path.join(self.input_folder, 'Bad 0.csv'))
+        os.remove(os.path.join(self.input_folder, 'Bad 1.csv'))
+        data = pd.read_csv(os.path.join(self.datadir, 'sites',
+                                        'Site 1 Dummy Data.csv'))
+        data.to_csv(os.path.join(self.input_folder, 'Site 1.csv'),
+                    index=False)
+        cleaned = os.path.join(self.output_folder, 'Site 1',
+                               'Site 1 - Cleaned.csv')
+
+        def run(**kwargs):
+            assert batch.BatchRunner(self.settings, workers=1,
+                                     stages=('clean',),
+                                     **kwargs).run().succeeded
+
+        def mark_cleaned():
+            with open(cleaned, 'w') as f:
+                f.write('marker')
+
+        def cleaned_marked():
+            with open(cleaned) as f:
+                return f.read() == 'marker'
+
+        run()
+        mark_cleaned()
+        run()
+        assert cleaned_marked()
+
+        run(force=True)
+        assert not cleaned_marked()
+
+        # Changing a setting or the input cleans again
+        mark_cleaned()
+        self.settings['std_range'] = 3
+        run()
+        assert not cleaned_marked()
+
+        mark_cleaned()
+        data.loc[0, 'Count'] += 1
+        data.to_csv(os.path.join(self.input_folder, 'Site 1.csv'),
+                    index=False)
+        run()
+        assert not cleaned_marked()
+
+    def test_rerender_matches_full_run(self):
+        os.remove(os.path.join(self.input_folder, 'Bad 0.csv'))
+        os.remove(os.path.join(self.input_folder, 'Bad 1.csv'))
+        # Each hour split across two lanes, which cleaning totals
+        data = pd.read_csv(os.path.join(self.datadir, 'sites',
+                                        'Site 1 Dummy Data.csv'))
+        lanes = pd.concat([data.assign(Count=data['Count'] // 2),
+                           data.assign(Count=data['Count']
+                                       - data['Count'] // 2)],
+                          ignore_index=True)
+        lanes.to_csv(os.path.join(self.input_folder, 'Site 1.csv'),
+                     index=False)
+        self.settings['valid_only'] = False
+        graphs = os.path.join(self.output_folder, 'Site 1', 'Graphs')
+
+        def run(**kwargs):
+            assert batch.BatchRunner(self.settings, workers=1,
+                                     stages=('clean', 'facets'),
+                                     **kwargs).run().succeeded
+            drawn = dict()
+            for name in sorted(os.listdir(graphs)):
+                with open(os.path.join(graphs, name), 'rb') as f:
+                    drawn[name] = f.read()
+            return drawn
+
+        run()
+        # Only the facets are out of date
+        for name in os.listdir(graphs):
+            os.remove(os.path.join(graphs, name))
+        rerendered = run()
+        full = run(force=True)
+
+        assert sorted(rerendered) == sorted(full)
+        assert [n for n in full if rerendered[n] != full[n]] == []
+
+    def test_run_report(self):
+        batch.BatchRunner(self.settings, workers=1).run()
+
+        with open(os.path.join(self.output_folder,
+                               'Run Report.json')) as f:
+            report = json.load(f)
+
+        assert len(report['inputs']) == 2
+        for i in report['inputs']:
+            assert not i['success']
+            # Loading fails, as the count column is missing
+            assert [s['stage'] for s in i['stages']] == ['load']
+            assert not i['stages'][0]['success']
+
+    def test_bad_profile_stage(self):
+        with pytest.raises(ValueError):
+            batch.BatchRunner(self.settings, workers=1,
+                              profile_stage='nope')
+
+    def write_good_inputs(self):
+        data = pd.read_csv(os.path.join(self.datadir, 'sites',
+                                        'Site 1 Dummy Data.csv'))
+        for i in range(2):
+            data.to_csv(os.path.join(self.input_folder,
+                                     'Good {}.csv'.format(i)), index=False)
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_progress(self, workers):
+        updates = []
+        progress = Progress(lambda *update: updates.append(update))
+        batch.BatchRunner(self.settings, workers=workers,
+                          stages=('clean',)).run(progress=progress)
+
+        fractions = [u[3] for u in updates]
+        assert fractions == sorted(fractions)
+        assert fractions[-1] == pytest.approx(1)
+        assert {u[0] for u in updates} == {'Bad 0.csv', 'Bad 1.csv'}
+
+    def test_cancel_between_stages(self):
+        os.remove(os.path.join(self.input_folder, 'Bad 0.csv'))
+        os.remove(os.path.join(self.input_folder, 'Bad 1.csv'))
+        self.write_good_inputs()
+
+        # Cancelled while cleaning, so stops before summarising
+        def cancel_when_cleaning(file, site, stage, fraction):
+            if stage == 'clean':
+                progress.cancel()
+
+        progress = Progress(cancel_when_cleaning)
+        report = batch.BatchRunner(
+            self.settings, workers=1, stages=('clean', 'summary')
+        ).run(progress=progress)
+
+        # The first file is cleaned but not summarised, the second skipped
+        result, = report.results
+        assert result.error_type == 'Cancelled'
+        assert os.path.isfile(os.path.join(self.output_folder, 'Site 1',
+                                           'Site 1 - Cleaned.csv'))
+        assert not os.path.isfile(os.path.join(
+            self.output_folder, 'Site 1', 'Site 1 Cleaning Summary.csv'
+        ))
+
+    def test_aggregates_stage(self):
+        os.remove(os.path.join(self.input_folder, 'Bad 0.csv'))
+        os.remove(os.path.join(self.input_folder, 'Bad 1.csv'))
+        self.write_good_inputs()
+
+        with pytest.raises(ValueError):
+            batch.BatchRunner(self.settings, workers=1,
+                              stages=('aggregates',))
+
+        assert batch.BatchRunner(self.settings, workers=1,
+                                 stages=('clean', 'aggregates'),
+                                 use_manifest=False).run().succeeded
+        files = os.listdir(os.path.join(self.output_folder, 'Site 1'))
+        assert 'Site 1 Daily Totals.csv' in files
+        assert 'Site 1 Cleaning Summary.csv' not in files
@@ -0,0 +1,96 @@
+import os
+import shutil
+
+import pytest
+import pandas as pd
+
+from .. import processor
+
+pytest.importorskip('pyarrow')
+from ..cache import ParseCache  # noqa: E402
+
+
+class TestCache:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+        self.cache_folder = str(tmpdir_factory.mktemp('Cache'))
+        self.datadir = os.path.join(os.path.dirname(__file__), 'test files')
+
+        # Copy the input so its modification time can be changed
+        self.input_file = os.path.join(str(tmpdir_factory.mktemp('Inputs')),
+                                       'Site 1 Dummy Data.csv')
+        shutil.copy(os.path.join(self.datadir, 'sites',
+                                 'Site 1 Dummy Data.csv'), self.input_file)
+
+        self.thresholds = processor.Thresholds(
+            path_to_csv=os.path.join(self.datadir, 'thresholds.csv'),
+            site_list=os.path.join(self.datadir, 'site list.csv')
+        )
+
+        self.cs_params = dict(
+            output_folder=self.output_folder,
+            thresholds=self.thresholds,
+            site_col='Site',
+            count_col='Count',
+            dir_col='Direction',
+            date_col='Date',
+            time_col='Hour',
+            hour_only=True
+        )
+
+        self.cache = ParseCache(self.cache_folder)
+
+    def count_site(self, **kwargs):
+        return processor.CountSite(data=self.input_file, cache=self.cache,
+                                   **dict(self.cs_params, **kwargs))
+
+    def test_cache_hit(self):
+        first = self.count_site()
+        assert len(self.cache.entries()) == 1
+
+        second = self.count_site()
+        assert len(self.cache.entries()) == 1
+        pd.testing.assert_frame_equal(first.data, second.data,
+                                      check_index_type=False)
+
+        second.clean_data()
+        cleaning_result = pd.read_csv(
+            os.path.join(self.output_folder, 'Site 1', 'Site 1 - Cleaned.csv')
+        )
+        known_clean = pd.read_csv(
+            os.path.join(self.datadir, 'outputs', 'Site 1',
+                         'Site 1 - Cleaned.csv')
+        )
+        assert cleaning_result.equals(known_clean)
+
+    def test_settings_in_key(self):
+        self.count_site()
+        self.count_site(chunksize=10000)
+        assert len(self.cache.entries()) == 2
+
+    def test_modified_input(self):
+        self.count_site()
+        stat = os.stat(self.input_file)
+        os.utime(self.input_file, (stat.st_atime, stat.st_mtime + 10))
+
+        self.count_site()
+        assert len(self.cache.entries()) == 2
+
+    def test_invalidate(self):
+        self.count_site()
+        assert self.cache.invalidate([self.datadir]) == 0
+        assert self.cache.invalidate([self.input_file]) == 1
+        assert not self.cache.entries()
+
+    def test_eviction(self):
+        self.count_site()
+        first_entry = self.cache.entries()[0][2]
+        self.cache.max_size = self.cache.size()
+
+        # Adding a second entry takes the cache over its limit, so the
+        # older one is removed
+        self.count_site(chunksize=10000)
+        entries = self.cache.entries()
+        assert len(entries) == 1
+        assert entries[0][2] != first_entry
@@ -0,0 +1,81 @@
+import os
+import json
+import shutil
+
+import pytest
+import pandas as pd
+
+from .. import cli
+
+
+class TestCLI:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+        self.input_folder = str(tmpdir_factory.mktemp('Inputs'))
+        self.datadir = os.path.join(os.path.dirname(__file__), 'test files')
+
+        shutil.copy(os.path.join(self.datadir, 'sites',
+                                 'Site 1 Dummy Data.csv'),
+                    self.input_folder)
+
+        self.settings_path = os.path.join(self.input_folder, 'settings.json')
+        with open(self.settings_path, 'w') as f:
+            json.dump(dict(
+                input_folder=self.input_folder,
+                site_list=os.path.join(self.datadir, 'site list.csv'),
+                path_to_csv=os.path.join(self.datadir, 'thresholds.csv'),
+                output_folder=self.output_folder,
+                site_col='Site',
+                count_col='Count',
+                dir_col='Direction',
+                date_col='Date',
+                time_col='Hour'
+            ), f)
+
+    def test_run_cleaning_only(self):
+        res = cli.main(['run', self.settings_path, '--workers', '1',
+                        '--stages', 'clean', 'summary'])
+        assert res == 0
+
+        cleaning_result = pd.read_csv(
+            os.path.join(self.output_folder, 'Site 1', 'Site 1 - Cleaned.csv')
+        )
+        known_clean = pd.read_csv(
+            os.path.join(self.datadir, 'outputs', 'Site 1',
+                         'Site 1 - Cleaned.csv')
+        )
+        assert cleaning_result.equals(known_clean)
+        assert not os.path.isdir(os.path.join(self.output_folder, 'Site 1',
+                                              'Graphs'))
+
+    def test_stage_needs_cleaning(self):
+        assert cli.main(['run', self.settings_path, '--workers', '1',
+                         '--stages', 'summary']) == 2
+
+    def test_bad_stage(self):
+        with pytest.raises(SystemExit):
+            cli.main(['run', self.settings_path, '--stages', 'nope'])
+
+    def test_progress(self, capsys):
+        assert cli.main(['run', self.settings_path, '--workers', '1',
+                         '--stages', 'clean', '--progress']) == 0
+
+        lines = capsys.readouterr().err.splitlines()
+        assert any('Site 1 Dummy Data.csv: clean' in l for l in lines)
+        assert '100%' in lines[-1]
+
+    def test_check(self, capsys):
+        report_path = os.path.join(self.output_folder, 'schemas.csv')
+        assert cli.main(['check', self.settings_path, '--report',
+                         report_path]) == 0
+        assert '1 of 1 input files match' in capsys.readouterr().out
+
+        pd.read_csv(os.path.join(self.input_folder, 'Site 1 Dummy Data.csv'))\
+            .rename(columns={'Count': 'Flow'})\
+            .to_csv(os.path.join(self.input_folder, 'Renamed.csv'),
+                    index=False)
+        assert cli.main(['check', self.settings_path, '--report',
+                         report_path]) == 1
+        assert 'Missing columns: Count' in capsys.readouterr().err
+        assert len(pd.read_csv(report_path)) == 2
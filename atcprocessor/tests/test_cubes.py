@@ -0,0 +1,70 @@
+import pytest
+import pandas as pd
+
+from ..cubes import AggregateCubes, ALL_DIRECTIONS
+from ..dates import calendar_fields
+from ..summary import rollup
+
+
+class TestCubes:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+
+        # Two hours on one day in both directions at site A, one at B
+        datetimes = pd.to_datetime(['2017-03-06 08:00', '2017-03-06 08:00',
+                                    '2017-03-06 09:00', '2017-03-06 09:00',
+                                    '2017-03-06 08:00'])
+        self.data = pd.DataFrame({
+            'Site': ['A', 'A', 'A', 'A', 'B'],
+            'Direction': ['N', 'S', 'N', 'S', 'N'],
+            'DateTime': datetimes,
+            'Count': [10, 20, 30, 40, 5],
+            'Valid': [True, False, True, True, False],
+        })
+        self.data['Date'] = self.data['DateTime'].dt.normalize()
+        self.data['Hour'] = self.data['DateTime'].dt.hour
+        for col, values in calendar_fields(self.data['Date']).items():
+            self.data[col] = values
+
+        self.cubes = AggregateCubes.from_data(self.data, 'Site', 'Direction',
+                                              'Count')
+
+    def test_daily(self):
+        daily = self.cubes.select('daily', 'A')
+        assert list(daily['Direction']) == ['N', 'S']
+        assert list(daily['Sum']) == [40, 60]
+        assert list(daily['Records']) == [2, 2]
+
+        valid = self.cubes.select('daily', 'A', valid_only=True,
+                                  by_direction=False)
+        assert list(valid['Sum']) == [80]
+        assert list(valid['Records']) == [2]
+
+    def test_hours_across_directions_counted_once(self):
+        hourly = self.cubes.select('hourly', 'A', by_direction=False)
+        assert list(hourly['Hour']) == [8, 9]
+        assert list(hourly['Sum']) == [30, 70]
+        assert list(hourly['Records']) == [1, 1]
+
+    def test_valid_only_leaves_out_invalid_keys(self):
+        assert self.cubes.select('weekly', 'B', valid_only=True).empty
+        assert list(self.cubes.select('weekly', 'B')['Sum']) == [5]
+
+    def test_summary_matches_records(self):
+        daily = self.cubes.cubes['daily']
+        daily = daily[daily['Direction'] != ALL_DIRECTIONS]
+        from_cube = rollup(daily, ['Site'], flag_col='ValidRecords',
+                           count_col='Records')
+
+        assert from_cube.equals(rollup(self.data, ['Site']))
+
+    def test_write_read(self):
+        written = self.cubes.write(self.output_folder)
+        assert len(written) == 6
+
+        read = AggregateCubes.read(self.output_folder, ['A', 'B'], 'Site',
+                                   'Direction')
+        for name, cube in self.cubes.cubes.items():
+            pd.testing.assert_frame_equal(read.cubes[name], cube,
+                                          check_categorical=False)
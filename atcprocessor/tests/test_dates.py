@@ -0,0 +1,51 @@
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from .. import dates
+
+
+class TestDates:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.datadir = os.path.join(os.path.dirname(__file__), 'test files')
+        self.raw = pd.read_csv(
+            os.path.join(self.datadir, 'sites', 'Site 1 Dummy Data.csv')
+        )['Date']
+
+    def test_sniff_day_first(self):
+        assert dates.sniff_date_format(self.raw) == '%d/%m/%Y'
+
+    def test_sniff_iso_datetime(self):
+        values = ['2017-03-01 13:00:00', '2017-03-01 14:00:00']
+        assert dates.sniff_date_format(values) == '%Y-%m-%d %H:%M:%S'
+
+    def test_sniff_failure(self):
+        with pytest.raises(ValueError):
+            dates.sniff_date_format(['not a date'])
+
+    @pytest.mark.parametrize('date_format', [None, '%d/%m/%Y'])
+    def test_parse_matches_pandas(self, date_format):
+        parsed = dates.parse_dates(self.raw, date_format)
+        expected = pd.to_datetime(self.raw, format=date_format)
+
+        assert parsed.equals(expected)
+
+    def test_parse_missing(self):
+        parsed = dates.parse_dates(pd.Series(['01/02/2017', np.nan]),
+                                   date_format=dates.SNIFF)
+
+        assert parsed[0] == pd.Timestamp('2017-02-01')
+        assert pd.isnull(parsed[1])
+
+    def test_calendar_fields(self):
+        parsed = pd.to_datetime(self.raw)
+        fields = dates.calendar_fields(parsed)
+
+        assert fields['Year'].equals(parsed.dt.year)
+        assert fields['WeekNumber'].equals(parsed.dt.week)
+        assert (fields['Month'].astype(str) == parsed.dt.month_name()).all()
+        assert (fields['Day'].astype(str) == parsed.dt.weekday_name).all()
+        assert list(fields['Day'].cat.categories) == dates.DAYS
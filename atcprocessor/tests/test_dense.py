@@ -0,0 +1,103 @@
+import os
+from io import StringIO
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from .. import processor, synthetic
+
+
+class TestDenseEngine:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory, raw_counts, clean_counts):
+        self.tmpdir_factory = tmpdir_factory
+        self.datadir = os.path.join(os.path.dirname(__file__), 'test files')
+        self.raw = raw_counts
+        self.clean_counts = clean_counts
+
+        # Several sites, with thresholds by hour and month
+        self.generated = synthetic.generate_counts(sites=3, seed=1)
+        site_list = StringIO('Site,Category\nSite 1,1\nSite 2,2\n')
+        thresholds = StringIO(
+            'Category,Hour,Month,Low,High\n' +
+            ''.join('{},{},{},{},{}\n'.format(c, h, m, 5 * c, 300 + 100 * h)
+                    for c in (1, 2) for h in range(24)
+                    for m in processor.MONTHS)
+        )
+        self.hourly_thresholds = processor.Thresholds(
+            path_to_csv=thresholds, site_list=processor.SiteList(site_list)
+        )
+
+    def clean(self, data, engine, output_folder=None, **kwargs):
+        if output_folder is None:
+            output_folder = str(self.tmpdir_factory.mktemp('Outputs'))
+        return self.clean_counts(data, output_folder, engine=engine, **kwargs)
+
+    def test_known_output(self):
+        c = self.clean(self.raw, 'dense')
+        cleaning_result = pd.read_csv(
+            os.path.join(c.output_folder, 'Site 1', 'Site 1 - Cleaned.csv')
+        )
+        known_clean = pd.read_csv(
+            os.path.join(self.datadir, 'outputs', 'Site 1',
+                         'Site 1 - Cleaned.csv')
+        )
+
+        assert cleaning_result.equals(known_clean)
+
+    @pytest.mark.parametrize('outside_std_invalid', [False, True])
+    def test_matches_long(self, outside_std_invalid):
+        long = self.clean(self.generated, 'long',
+                          thresholds=self.hourly_thresholds,
+                          outside_std_invalid=outside_std_invalid)
+        dense = self.clean(self.generated, 'dense',
+                           thresholds=self.hourly_thresholds,
+                           outside_std_invalid=outside_std_invalid)
+
+        assert long.data['ThreshCheck'].any()
+        pd.testing.assert_frame_equal(dense.data, long.data)
+
+    def test_merged_thresholds(self):
+        # Thresholds keyed on a column of the data can't be compiled
+        data = self.raw.assign(Category=1)
+        long = self.clean(data, 'long')
+        dense = self.clean(data, 'dense')
+
+        pd.testing.assert_frame_equal(dense.data, long.data)
+
+    def test_incremental(self):
+        is_2016 = self.raw['Date'].str.endswith('2016')
+        results = dict()
+        for engine in processor.CLEANING_ENGINES:
+            output_folder = str(self.tmpdir_factory.mktemp(engine))
+            self.clean(self.raw[is_2016], engine,
+                       output_folder=output_folder, incremental=True)
+            results[engine] = self.clean(self.raw, engine,
+                                         output_folder=output_folder,
+                                         incremental=True)
+
+        pd.testing.assert_frame_equal(results['dense'].data,
+                                      results['long'].data)
+
+    def test_lookup_grid(self):
+        data = self.generated.iloc[::997].copy()
+        data['Month'] = pd.Categorical(
+            pd.to_datetime(data['Date'], format='%d/%m/%Y').dt.strftime('%B'),
+            categories=processor.MONTHS, ordered=True
+        )
+        compiled = self.hourly_thresholds.compile('Site')
+        low, high = compiled.lookup(data)
+
+        sites = ['Site 3', 'Site 2', 'Site 1']
+        grid_low, grid_high = compiled.lookup_grid(sites, data['Hour'].values,
+                                                   data['Month'])
+        rows = [sites.index(s) for s in data['Site']]
+        times = np.arange(len(data))
+
+        assert np.allclose(grid_low[rows, times], low, equal_nan=True)
+        assert np.allclose(grid_high[rows, times], high, equal_nan=True)
+
+    def test_bad_engine(self):
+        with pytest.raises(ValueError):
+            self.clean(self.raw, 'sparse')
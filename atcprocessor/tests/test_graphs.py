@@ -1,6 +1,7 @@
 import os
 
 import pytest
+import pandas as pd
 
 from .. import graphs
 
@@ -8,4 +9,29 @@ from .. import graphs
 class TestGraphs:
     @pytest.fixture(autouse=True)
     def setup(self, tmpdir_factory):
-        pass
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+
+        datetimes = pd.date_range('2016-12-31', periods=48, freq='H')
+        self.data = pd.DataFrame({
+            'DateTime': datetimes,
+            'Count': range(48),
+            'Direction': ['N', 'S'] * 24,
+            'Status': ['Valid'] * 40 + ['Below threshold'] * 8,
+            'Colour': ['darkturquoise'] * 40 + ['black'] * 8,
+        })
+
+    def scatter(self, mode):
+        dest = os.path.join(self.output_folder, mode, 'Scatter.png')
+        graphs.yearly_scatter(self.data, datetime_col='DateTime',
+                              value_col='Count', category_col='Status',
+                              colour_col='Colour', dir_col='Direction',
+                              destination_path=dest, mode=mode)
+        return sorted(os.listdir(os.path.dirname(dest)))
+
+    @pytest.mark.parametrize('mode', graphs.SCATTER_MODES)
+    def test_yearly_scatter(self, mode):
+        assert self.scatter(mode) == ['Scatter_2016.png', 'Scatter_2017.png']
+
+    def test_yearly_scatter_bad_mode(self):
+        with pytest.raises(ValueError):
+            self.scatter('lines')
@@ -0,0 +1,58 @@
+import os
+from functools import partial
+
+import pytest
+import pandas as pd
+
+from .. import incremental
+
+
+class TestIncremental:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory, raw_counts, clean_counts):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+        self.datadir = os.path.join(os.path.dirname(__file__), 'test files')
+        self.raw = raw_counts
+        self.clean = partial(clean_counts, output_folder=self.output_folder,
+                             incremental=True)
+
+        self.known_clean = pd.read_csv(
+            os.path.join(self.datadir, 'outputs', 'Site 1',
+                         'Site 1 - Cleaned.csv')
+        )
+        self.cleaned_path = os.path.join(self.output_folder, 'Site 1',
+                                         'Site 1 - Cleaned.csv')
+
+    def test_first_run_matches_full_clean(self):
+        self.clean(self.raw)
+
+        assert pd.read_csv(self.cleaned_path).equals(self.known_clean)
+        assert os.path.isfile(incremental.state_path(self.output_folder,
+                                                     'Site 1'))
+
+    def test_append_new_year(self):
+        is_2016 = self.raw['Date'].str.endswith('2016')
+        self.clean(self.raw[is_2016])
+        history = pd.read_csv(self.cleaned_path)
+
+        # Records already cleaned are skipped
+        c = self.clean(self.raw)
+        assert len(c.data) == (~is_2016).sum()
+
+        result = pd.read_csv(self.cleaned_path)
+        assert len(result) == len(self.known_clean)
+        assert result.iloc[:len(history)].equals(history)
+
+        # The new records are flagged using statistics for the full history,
+        # so match a clean of everything at once
+        new_result = result.iloc[len(history):].reset_index(drop=True)
+        known_new = self.known_clean[self.known_clean['Year'] == 2017]\
+                        .reset_index(drop=True)
+        assert new_result.equals(known_new)
+
+    def test_nothing_new(self):
+        self.clean(self.raw)
+        c = self.clean(self.raw)
+
+        assert c.data.empty
+        assert pd.read_csv(self.cleaned_path).equals(self.known_clean)
@@ -0,0 +1,82 @@
+import os
+import pstats
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from .. import instrument
+
+
+class FakeCountSite:
+    site_col = 'Site'
+
+    def __init__(self, rows):
+        self.data = pd.DataFrame({'Site': ['A'] * rows + ['B']})
+
+
+class TestInstrument:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+
+    def test_records(self):
+        recorder = instrument.StageRecorder()
+        count_site = FakeCountSite(3)
+        with recorder.stage('clean', 'input.csv', count_site):
+            count_site.data = count_site.data.iloc[1:]
+
+        record, = recorder.records
+        assert record['stage'] == 'clean'
+        assert record['success']
+        assert record['rows_in'] == 4
+        assert record['rows_out'] == 3
+        assert record['site_rows'] == {'A': 2, 'B': 1}
+        assert record['wall_time'] >= 0
+        assert record['cpu_time'] >= 0
+
+    def test_stage_memory(self):
+        recorder = instrument.StageRecorder()
+        with recorder.stage('clean', 'input.csv'):
+            np.ones(50 * 2 ** 20, dtype=np.int8)
+        with recorder.stage('summary', 'input.csv'):
+            pass
+
+        first, second = recorder.records
+        if first['rss_start'] is None or not instrument.reset_peak_rss():
+            pytest.skip('Memory can only be measured on Linux')
+        # The peak is the stage's own, not carried over from the last stage
+        assert first['peak_rss_increase'] >= 40 * 2 ** 20
+        assert second['peak_rss_increase'] < 40 * 2 ** 20
+        assert first['rss_end'] < first['peak_rss']
+
+    def test_count_site_set_in_block(self):
+        recorder = instrument.StageRecorder()
+        with recorder.stage('load', 'input.csv') as run:
+            run.count_site = FakeCountSite(1)
+
+        assert recorder.records[0]['rows_in'] is None
+        assert recorder.records[0]['rows_out'] == 2
+
+    def test_error_recorded(self):
+        recorder = instrument.StageRecorder()
+        with pytest.raises(ValueError):
+            with recorder.stage('clean', 'input.csv'):
+                raise ValueError('Bad data')
+
+        assert not recorder.records[0]['success']
+
+    def test_profile(self):
+        recorder = instrument.StageRecorder('clean', self.output_folder)
+        with recorder.stage('load', 'input.csv'):
+            pass
+        with recorder.stage('clean', 'sites/input.csv|Site 1'):
+            sum(range(1000))
+
+        profiles = os.listdir(self.output_folder)
+        assert profiles == ['clean sites_input.csv_Site 1.prof']
+        pstats.Stats(os.path.join(self.output_folder, profiles[0]))
+
+    def test_profile_needs_folder(self):
+        with pytest.raises(ValueError):
+            instrument.StageRecorder('clean')
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+import pandas as pd
+
+from .. import manifest
+
+
+class TestManifest:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+        self.output = os.path.join(self.output_folder, 'Site 1', 'out.csv')
+        os.makedirs(os.path.dirname(self.output))
+        with open(self.output, 'w') as f:
+            f.write('a,b\n')
+
+        self.key = manifest.BuildManifest.key('input.csv', 'clean')
+
+    def test_record_and_reload(self):
+        m = manifest.BuildManifest(self.output_folder)
+        assert not m.is_current(self.key, 'abc')
+
+        m.record(self.key, 'abc', [self.output])
+        m.save()
+
+        reloaded = manifest.BuildManifest(self.output_folder)
+        assert reloaded.is_current(self.key, 'abc')
+        assert not reloaded.is_current(self.key, 'def')
+        assert reloaded.entries[self.key]['outputs'] == [
+            os.path.join('Site 1', 'out.csv')
+        ]
+
+    def test_missing_output(self):
+        m = manifest.BuildManifest(self.output_folder)
+        m.record(self.key, 'abc', [self.output])
+        os.remove(self.output)
+
+        assert not m.is_current(self.key, 'abc')
+
+    def test_force(self):
+        m = manifest.BuildManifest(self.output_folder)
+        m.record(self.key, 'abc', [self.output])
+        m.save()
+
+        assert not manifest.BuildManifest(self.output_folder,
+                                          force=True).is_current(self.key,
+                                                                 'abc')
+
+    def test_frame_digest(self):
+        frame = pd.DataFrame({'Site': ['A', 'B'], 'Count': [1, 2]})
+        digest = manifest.frame_digest(frame)
+
+        assert manifest.frame_digest(frame.copy()) == digest
+        assert manifest.frame_digest(frame.assign(Count=[1, 3])) != digest
+        assert manifest.frame_digest(
+            frame.astype({'Count': float})) != digest
@@ -0,0 +1,110 @@
+import os
+from functools import partial
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from .. import processor
+from .. import outages
+
+
+class TestOutages:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory, raw_counts, clean_counts):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+        self.raw = raw_counts
+        self.clean = partial(clean_counts, output_folder=self.output_folder)
+
+        # 30 hours of zeros northbound at A, and 25 missing hours
+        # southbound at B, in shuffled order
+        times = pd.date_range('2017-01-01', periods=72, freq='H')
+        parts = []
+        for site in ('A', 'B'):
+            for direction in ('N', 'S'):
+                counts = np.full(len(times), 10)
+                counts[0:3] = 0
+                if (site, direction) == ('A', 'N'):
+                    counts[5:35] = 0
+                part = pd.DataFrame({'Site': site, 'Direction': direction,
+                                     'DateTime': times, 'Count': counts})
+                if (site, direction) == ('B', 'S'):
+                    part = part.drop(range(40, 65))
+                parts.append(part)
+        self.data = pd.concat(parts, ignore_index=True)\
+            .sample(frac=1, random_state=0).reset_index(drop=True)
+
+    def test_find_outages(self):
+        table, in_outage = outages.find_outages(self.data, 'Site',
+                                                'Direction', 'Count', 24)
+
+        assert list(table['Site']) == ['A', 'B']
+        assert list(table['Direction']) == ['N', 'S']
+        assert list(table['Type']) == list(outages.OUTAGE_TYPES)
+        assert list(table['Start']) == [pd.Timestamp('2017-01-01 05:00'),
+                                        pd.Timestamp('2017-01-02 16:00')]
+        assert list(table['End']) == [pd.Timestamp('2017-01-02 11:00'),
+                                      pd.Timestamp('2017-01-03 17:00')]
+        assert list(table['Hours']) == [30, 25]
+
+        # Only the long run of zeros is flagged
+        flagged = self.data[in_outage]
+        assert len(flagged) == 30
+        assert (flagged['Site'] == 'A').all()
+        assert (flagged['Direction'] == 'N').all()
+
+    def test_interval(self):
+        quarter_hours = self.data.assign(
+            DateTime=pd.Timestamp('2017-01-01')
+            + (self.data['DateTime'] - pd.Timestamp('2017-01-01')) / 4
+        )
+        table, in_outage = outages.find_outages(quarter_hours, 'Site',
+                                                'Direction', 'Count', 6)
+
+        assert list(table['Hours']) == [7.5, 6.25]
+        assert in_outage.sum() == 30
+
+    def test_clean_with_outages(self):
+        # A day and a half of zeros in one direction only isn't a missing
+        # day, as there is traffic in the other
+        data = self.raw.copy()
+        zeros = (data['Direction'] == 'N') & (
+            (data['Date'] == '03/01/2016')
+            | ((data['Date'] == '03/02/2016') & (data['Hour'] < 12))
+        )
+        data.loc[zeros, 'Count'] = 0
+
+        before = self.clean(self.raw, outage_hours=24)
+        before_table = pd.read_csv(outages.outage_path(self.output_folder,
+                                                       'Site 1'))
+        for engine in processor.CLEANING_ENGINES:
+            c = self.clean(data, outage_hours=24, engine=engine)
+            added = c.data[(c.data['Outage'] == 1)
+                           & ~c.data['DateTime'].isin(
+                               before.data.loc[before.data['Outage'] == 1,
+                                               'DateTime'])]
+
+            assert len(added) == 36
+            assert not added['Valid'].any()
+            assert not added['MissingDay'].any()
+
+        table = pd.read_csv(outages.outage_path(self.output_folder,
+                                                'Site 1'))
+        assert len(table) == len(before_table) + 1
+        assert 36 in list(table['Hours'])
+
+    def test_engines_match(self):
+        data = self.raw.copy()
+        data.loc[(data['Direction'] == 'S') & (data.index < 200),
+                 'Count'] = 0
+
+        long = self.clean(data, outage_hours=24, engine='long')
+        dense = self.clean(data, outage_hours=24, engine='dense')
+        pd.testing.assert_frame_equal(dense.data, long.data)
+
+    def test_off_by_default(self):
+        c = self.clean(self.raw)
+
+        assert 'Outage' not in c.data.columns
+        assert not os.path.exists(outages.outage_path(self.output_folder,
+                                                      'Site 1'))
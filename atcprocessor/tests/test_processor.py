@@ -1,8 +1,12 @@
 import os
+import sys
+import pickle
+import subprocess
 from copy import deepcopy
 from io import StringIO
 
 import pytest
+import numpy as np
 import pandas as pd
 
 from .. import processor
@@ -103,3 +107,194 @@ class TestProcessor:
 
         assert cleaning_result.equals(known_clean)
 
+    def test_summary(self):
+        self.count_site.clean_data()
+        self.count_site.summarise_cleaned_data()
+
+        name = os.path.join('Site 1', 'Site 1 Cleaning Summary.csv')
+        with open(os.path.join(self.output_folder, name)) as f:
+            result = f.read()
+        with open(os.path.join(self.datadir, 'outputs', name)) as f:
+            known = f.read()
+
+        assert result == known
+
+    def test_consolidated_summary(self):
+        self.count_site.clean_data()
+        summary = self.count_site.summarise_cleaned_data(consolidated=True)
+
+        written = pd.read_csv(os.path.join(self.output_folder,
+                                           'Cleaning Summary.csv'))
+        assert len(written) == len(summary)
+        assert (written['Site'] == 'Site 1').all()
+        assert not os.path.isfile(os.path.join(
+            self.output_folder, 'Site 1', 'Site 1 Cleaning Summary.csv'
+        ))
+
+    def test_parallel_scatter(self):
+        self.count_site.clean_data()
+        self.count_site.graph_workers = 2
+        self.count_site.cleaned_scatter()
+
+        graphs = os.listdir(os.path.join(self.output_folder, 'Site 1',
+                                         'Graphs'))
+        years = self.count_site.data['Year'].unique()
+        assert sorted(graphs) == sorted('Cleaned Scatter_{}.png'.format(y)
+                                        for y in years)
+
+    def test_site_index_shared(self):
+        self.count_site.clean_data()
+        index = self.count_site.site_index()
+        self.count_site.cleaned_scatter()
+        self.count_site.facet_grids()
+
+        assert self.count_site.site_index() is index
+        assert index.sites == ['Site 1']
+
+    def test_plotting_not_imported(self):
+        # Run in a new interpreter as other tests will have drawn graphs
+        code = ('import sys\n'
+                'import atcprocessor.processor\n'
+                'print(\'seaborn\' in sys.modules, '
+                '\'matplotlib.pyplot\' in sys.modules)')
+        root = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         cwd=root)
+
+        assert output.decode().split() == ['False', 'False']
+
+    def test_chunked_cleaning(self):
+        p = processor.CountSite(
+            data=os.path.join(self.datadir, 'sites', 'Site 1 Dummy Data.csv'),
+            output_folder=self.output_folder,
+            thresholds=self.thresholds,
+            hour_only=True,
+            chunksize=5000,
+            **self.cs_param_cols
+        )
+        p.clean_data()
+        cleaning_result = pd.read_csv(
+            os.path.join(self.output_folder, 'Site 1', 'Site 1 - Cleaned.csv')
+        )
+
+        known_clean = pd.read_csv(
+            os.path.join(self.datadir, 'outputs', 'Site 1',
+                         'Site 1 - Cleaned.csv')
+        )
+
+        assert cleaning_result.equals(known_clean)
+
+    def test_compact_cleaning(self):
+        p = processor.CountSite(
+            data=os.path.join(self.datadir, 'sites', 'Site 1 Dummy Data.csv'),
+            output_folder=self.output_folder,
+            thresholds=self.thresholds,
+            hour_only=True,
+            compact=True,
+            **self.cs_param_cols
+        )
+        assert p.data['Site'].dtype.name == 'category'
+        assert p.data['Hour'].dtype == 'int8'
+
+        p.clean_data()
+        before, after = p.compact()
+        assert after <= before
+
+        cleaning_result = pd.read_csv(
+            os.path.join(self.output_folder, 'Site 1', 'Site 1 - Cleaned.csv')
+        )
+
+        known_clean = pd.read_csv(
+            os.path.join(self.datadir, 'outputs', 'Site 1',
+                         'Site 1 - Cleaned.csv')
+        )
+
+        assert cleaning_result.equals(known_clean)
+
+    def test_compact_lane_totals(self):
+        # Two lanes of 100, which total more than an int8 can hold
+        data = pd.read_csv(os.path.join(self.datadir, 'sites',
+                                        'Site 1 Dummy Data.csv'),
+                           nrows=24 * 2 * 40)
+        data['Count'] = 100
+        lanes = pd.concat([data, data], ignore_index=True)
+
+        cleaned = []
+        for compact in (False, True):
+            folder = os.path.join(self.output_folder, str(compact))
+            p = processor.CountSite(data=lanes.copy(), output_folder=folder,
+                                    thresholds=self.thresholds,
+                                    hour_only=True, compact=compact,
+                                    **self.cs_param_cols)
+            assert (p.data['Count'].dtype == 'int8') == compact
+
+            p.clean_data()
+            assert pd.api.types.is_integer_dtype(p.data['Count'])
+            assert (p.data['Count'] == 200).all()
+            with open(os.path.join(folder, 'Site 1',
+                                   'Site 1 - Cleaned.csv')) as f:
+                cleaned.append(f.read())
+
+        # Compared outside the assert, as diffing files this size is slow
+        same = cleaned[0] == cleaned[1]
+        assert same
+
+    def test_rolling_baseline(self):
+        results = []
+        for engine in processor.CLEANING_ENGINES:
+            c = processor.CountSite(
+                data=os.path.join(self.datadir, 'sites',
+                                  'Site 1 Dummy Data.csv'),
+                output_folder=self.output_folder,
+                thresholds=self.thresholds,
+                hour_only=True,
+                **self.cs_param_cols
+            )
+            c.clean_data(rolling_baseline=True, engine=engine)
+            results.append(c.data)
+
+        pd.testing.assert_frame_equal(results[0], results[1])
+        # Only valid counts are checked, and not before there is a baseline
+        warned = results[0][results[0]['StdWarning'] == 1]
+        assert warned['Valid'].all()
+        assert 0 < len(warned) < len(results[0]) // 8
+
+    def test_rolling_baseline_incremental(self):
+        with pytest.raises(ValueError):
+            self.count_site.clean_data(rolling_baseline=True,
+                                       incremental=True)
+
+    def test_compiled_thresholds(self):
+        site_list = StringIO('Site,Category\nA,1\nB,2\nC,1\n')
+        thresholds = StringIO(
+            'Category,Hour,Month,Low,High\n' +
+            ''.join('{},{},{},{},{}\n'.format(c, h, m, h + c, 1000 + c)
+                    for c in (1, 2) for h in range(24)
+                    for m in ('January', 'February'))
+        )
+        t = processor.Thresholds(path_to_csv=thresholds,
+                                 site_list=processor.SiteList(site_list))
+
+        data = pd.DataFrame({
+            'Site': ['A', 'B', 'C', 'D', 'B'],
+            'Hour': [0, 5, 23, 3, 7],
+            'Month': pd.Categorical(
+                ['January', 'February', 'January', 'January', 'March'],
+                categories=processor.MONTHS, ordered=True
+            )
+        })
+        low, high = pickle.loads(pickle.dumps(t.compile('Site'))).lookup(data)
+        merged = data.merge(t.data, how='left')
+
+        assert np.allclose(low, merged['Low'], equal_nan=True)
+        assert np.allclose(high, merged['High'], equal_nan=True)
+        assert np.isnan(low[3]) and np.isnan(low[4])
+
+    def test_compiled_thresholds_duplicates(self):
+        site_list = StringIO('Site,Category\nA,1\n')
+        thresholds = StringIO('Category,Low,High\n1,30,5000\n1,20,4000\n')
+        t = processor.Thresholds(path_to_csv=thresholds,
+                                 site_list=processor.SiteList(site_list))
+
+        with pytest.raises(ValueError):
+            t.compile('Site')
@@ -0,0 +1,46 @@
+import io
+
+import pytest
+
+from .. import progress
+
+
+class TestProgress:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.updates = []
+        self.progress = progress.Progress(
+            lambda *update: self.updates.append(update)
+        )
+
+    def test_span(self):
+        span = self.progress.span(0.5, 1, file='a.csv')
+        span.update('ignored.csv', None, 'clean', 0.5)
+        span.span(0, 0.5, site='Site 1').update(None, None, 'summary', 1)
+
+        assert self.updates == [('a.csv', None, 'clean', 0.75),
+                                ('a.csv', 'Site 1', 'summary', 0.75)]
+
+    def test_cancel(self):
+        span = self.progress.span(0, 0.5)
+        span.check()
+        span.cancel()
+
+        assert self.progress.cancelled
+        with pytest.raises(progress.Cancelled):
+            self.progress.check()
+
+    def test_callback_not_sent_to_workers(self):
+        assert self.progress.__getstate__()['callback'] is None
+        assert self.progress.callback is not None
+
+    def test_text_progress(self):
+        stream = io.StringIO()
+        show = progress.TextProgress(stream, width=4)
+        show('a.csv', 'Site 1', 'clean', 0.5)
+        show('a.csv', None, None, 1)
+
+        assert stream.getvalue().splitlines() == [
+            '[##--]  50% a.csv [Site 1]: clean',
+            '[####] 100% a.csv',
+        ]
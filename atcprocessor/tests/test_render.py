@@ -0,0 +1,56 @@
+import os
+from multiprocessing import Pool
+
+import pytest
+
+from .. import render
+
+
+def touch(destination_path):
+    with open(destination_path, 'w'):
+        pass
+
+
+def fail(destination_path):
+    raise ValueError(destination_path)
+
+
+class TestRender:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+        self.destinations = [os.path.join(self.output_folder,
+                                          '{}.png'.format(i))
+                             for i in range(4)]
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_render_jobs(self, workers):
+        jobs = [render.GraphJob(touch, dict(destination_path=d))
+                for d in self.destinations]
+        drawn = render.render_jobs(jobs, workers)
+
+        assert sorted(drawn) == sorted(self.destinations)
+        assert all(os.path.isfile(d) for d in self.destinations)
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_render_error(self, workers):
+        jobs = [render.GraphJob(fail, dict(destination_path=d))
+                for d in self.destinations]
+        with pytest.raises(ValueError):
+            render.render_jobs(jobs, workers)
+
+    def test_shared_pool(self, monkeypatch):
+        def no_pool(*args):
+            raise AssertionError('A pool was started')
+
+        jobs = [render.GraphJob(touch, dict(destination_path=d))
+                for d in self.destinations]
+        with Pool(2) as pool:
+            monkeypatch.setattr(render, 'Pool', no_pool)
+            for _ in range(2):
+                drawn = render.render_jobs(jobs, pool=pool)
+                assert sorted(drawn) == sorted(self.destinations)
+
+    def test_bad_workers(self):
+        with pytest.raises(ValueError):
+            render.render_jobs([], 0)
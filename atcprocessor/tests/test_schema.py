@@ -0,0 +1,118 @@
+import os
+import shutil
+
+import pytest
+import pandas as pd
+
+from .. import schema
+
+
+class TestSchema:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory):
+        self.input_folder = str(tmpdir_factory.mktemp('Inputs'))
+        self.datadir = os.path.join(os.path.dirname(__file__), 'test files')
+        self.source = os.path.join(self.datadir, 'sites',
+                                   'Site 1 Dummy Data.csv')
+
+        self.data = pd.read_csv(self.source, nrows=500)
+        self.paths = []
+        for i in range(5):
+            path = os.path.join(self.input_folder, 'Site {}.csv'.format(i))
+            self.data.to_csv(path, index=False)
+            self.paths.append(path)
+
+    def test_inspect_file(self):
+        result = schema.inspect_file(self.source, date_col='Date')
+
+        assert result.columns == ['Site', 'Direction', 'Date', 'Hour',
+                                  'Count']
+        assert result.kinds['Count'] == 'number'
+        assert result.kinds['Site'] == 'text'
+        assert result.date_format == '%d/%m/%Y'
+        assert result.error is None
+
+    def test_consistent(self):
+        report = schema.inspect_files(self.paths, date_col='Date',
+                                      required=['Site', 'Count'])
+
+        assert report.consistent
+        assert report.columns == list(self.data.columns)
+        assert report.date_format == '%d/%m/%Y'
+
+    def test_mismatches(self):
+        self.data.rename(columns={'Count': 'Flow'})\
+            .to_csv(self.paths[1], index=False)
+        self.data.assign(Count='lots').to_csv(self.paths[2], index=False)
+        self.data.assign(
+            Date=pd.to_datetime(self.data['Date'], format='%d/%m/%Y')
+            .dt.strftime('%Y-%m-%d')
+        ).to_csv(self.paths[3], index=False)
+        with open(self.paths[4], 'wb') as f:
+            f.write(b'\xff\xfe\x00garbage')
+
+        report = schema.inspect_files(self.paths, date_col='Date')
+        problems = report.problems
+
+        assert report.mismatched == self.paths[1:]
+        assert problems[1] == ['Missing columns: Count',
+                               'Extra columns: Flow']
+        assert problems[2] == ['Count is text rather than number']
+        assert len(problems[3]) == 1
+        assert problems[3][0].startswith('Date format %Y-%m-%d')
+        assert problems[3][0].endswith('rather than %d/%m/%Y')
+        assert problems[4][0].startswith('Could not be read')
+
+        frame = report.to_frame()
+        assert list(frame['File']) == self.paths
+        assert (frame['Problems'] == '').sum() == 1
+
+    def test_required_columns(self):
+        settings = dict(site_col='Site', count_col='Count',
+                        dir_col='Direction', date_col='Date',
+                        time_col='Hour', combined_datetime=False)
+        assert schema.required_columns(settings) == [
+            'Site', 'Count', 'Direction', 'Date', 'Hour'
+        ]
+
+        report = schema.inspect_files(self.paths, required=['Lane'])
+        assert report.problems[0] == ['Missing columns: Lane']
+
+        settings['combined_datetime'] = True
+        assert 'Hour' not in schema.required_columns(settings)
+
+    def test_cache(self, monkeypatch):
+        cache_path = os.path.join(self.input_folder, 'cache',
+                                  schema.SCHEMA_CACHE_NAME)
+        first = schema.inspect_files(self.paths, date_col='Date',
+                                     cache=schema.SchemaCache(cache_path))
+
+        # Only the changed file is read again
+        self.data.drop('Hour', axis='columns')\
+            .to_csv(self.paths[0], index=False)
+        os.utime(self.paths[0], (0, 0))
+        read = []
+        inspect_file = schema.inspect_file
+        monkeypatch.setattr(schema, 'inspect_file',
+                            lambda p, *args: read.append(p)
+                            or inspect_file(p, *args))
+
+        second = schema.inspect_files(self.paths, date_col='Date',
+                                      cache=schema.SchemaCache(cache_path))
+
+        assert first.consistent
+        assert read == [self.paths[0]]
+        assert second.mismatched == [self.paths[0]]
+
+        # A different date column needs every file read
+        schema.inspect_files(self.paths, date_col='Hour',
+                             cache=schema.SchemaCache(cache_path))
+        assert len(read) == 1 + len(self.paths)
+
+    def test_serial_matches_parallel(self):
+        shutil.copy(self.source, self.paths[0])
+        serial = schema.inspect_files(self.paths, date_col='Date', workers=1)
+        parallel = schema.inspect_files(self.paths, date_col='Date',
+                                        workers=4)
+
+        assert serial.schemas == parallel.schemas
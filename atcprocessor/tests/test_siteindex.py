@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+import pandas as pd
+
+from ..siteindex import SiteIndex
+
+
+class TestSiteIndex:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.data = pd.DataFrame({
+            'Site': ['B', 'A', 'B', 'C', 'A', None],
+            'Count': [1, 2, 3, 4, 5, 6],
+            'Valid': [True, False, False, True, False, True],
+        })
+        self.index = SiteIndex(self.data, 'Site')
+
+    def test_groups(self):
+        groups = {site: list(rows['Count'])
+                  for site, rows in self.index}
+
+        assert list(self.index.sites) == ['A', 'B', 'C']
+        # Rows keep their order within each site, rows without one are left
+        # out
+        assert groups == {'A': [2, 5], 'B': [1, 3], 'C': [4]}
+
+    def test_valid_only(self):
+        groups = {site: list(rows['Count'])
+                  for site, rows in self.index.groups(valid_only=True)}
+
+        assert groups == {'B': [1], 'C': [4]}
+
+    def test_rows_are_views(self):
+        rows = self.index.rows('B')
+
+        assert list(rows['Count']) == [1, 3]
+        assert np.shares_memory(rows['Count'].values,
+                                self.index.data['Count'].values)
+
+    def test_sorted_data_not_copied(self):
+        data = self.index.data
+        assert SiteIndex(data, 'Site').data is data
@@ -0,0 +1,143 @@
+import pickle
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from .. import stats
+
+
+class TestStats:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        rng = np.random.RandomState(1)
+        self.data = pd.DataFrame({
+            'Site': rng.choice(['A', 'B', 'C'], 1000),
+            'Hour': rng.randint(0, 4, 1000),
+            'Day': pd.Categorical(rng.choice(['Monday', 'Tuesday'], 1000)),
+            'Count': rng.randint(0, 500, 1000),
+        })
+        self.data['Valid'] = self.data['Count'] > 20
+        self.group_cols = ['Site', 'Hour', 'Day']
+
+    def expected(self, data):
+        return data[data['Valid']].groupby(self.group_cols)['Count']\
+                                  .agg(['count', 'mean', 'std'])
+
+    def check(self, result, expected):
+        result = result.to_frame().set_index(self.group_cols)\
+                       .reindex(expected.index)
+
+        mean = result['sum'] / result['n']
+        assert (result['n'] == expected['count']).all()
+        assert np.allclose(mean, expected['mean'])
+
+    def test_group_index(self):
+        data = self.data.copy()
+        data.loc[3, 'Site'] = np.nan
+        ids, keys = stats.group_index(data, self.group_cols)
+
+        assert ids[3] == -1
+        assert len(keys) == len(data.dropna().groupby(self.group_cols))
+        matched = keys.iloc[ids[ids >= 0]].reset_index(drop=True)
+        original = data[self.group_cols].dropna().reset_index(drop=True)
+        assert (matched.astype(str) == original.astype(str)).all().all()
+
+    def test_matches_pandas(self):
+        result = stats.GroupStats.from_data(self.data, self.group_cols,
+                                            'Count', mask=self.data['Valid'])
+        expected = self.expected(self.data)
+
+        self.check(result, expected)
+        positions = result.positions(expected.reset_index())
+        assert np.allclose(result.std()[positions], expected['std'])
+
+    def test_combine_chunks(self):
+        chunks = [stats.GroupStats.from_data(chunk, self.group_cols, 'Count',
+                                             mask=chunk['Valid'])
+                  for chunk in np.array_split(self.data, 3)]
+
+        # Statistics should survive being sent between processes
+        chunks = [pickle.loads(pickle.dumps(c)) for c in chunks]
+
+        self.check(stats.GroupStats.combine(chunks), self.expected(self.data))
+
+    def test_single_value_std(self):
+        data = pd.DataFrame({'g': [1, 2, 2], 'v': [5, 3, 3]})
+        result = stats.GroupStats.from_data(data, ['g'], 'v')
+
+        assert np.isnan(result.std()[0])
+        assert result.std()[1] == 0
+
+    def test_positions_missing_group(self):
+        result = stats.GroupStats.from_data(self.data, self.group_cols,
+                                            'Count')
+        new = pd.DataFrame({'Site': ['A', 'Z'], 'Hour': [0, 0],
+                            'Day': ['Monday', 'Monday']})
+        positions = result.positions(new)
+
+        assert positions[1] == -1
+        assert tuple(result.keys.iloc[positions[0]]) == ('A', 0, 'Monday')
+
+
+class TestRollingBounds:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        # Two groups of weekly counts, one growing steadily
+        rng = np.random.RandomState(0)
+        weeks = 40
+        self.times = np.tile(np.arange(weeks) * stats.WEEK, 2)
+        self.ids = np.repeat([0, 1], weeks)
+        self.values = np.r_[100 + rng.normal(0, 5, weeks),
+                            np.linspace(100, 300, weeks)
+                            + rng.normal(0, 5, weeks)]
+        self.values[20] = 400
+        self.use = np.ones(len(self.values), dtype=bool)
+
+    def bounds(self, order=None):
+        if order is None:
+            order = np.arange(len(self.values))
+        return stats.rolling_bounds(self.ids[order], self.times[order],
+                                    self.values[order], self.use[order],
+                                    weeks=8, std_range=3)
+
+    def test_spike_flagged(self):
+        lower, upper = self.bounds()
+        with np.errstate(invalid='ignore'):
+            outside = (self.values < lower) | (self.values > upper)
+
+        assert outside[20]
+        # The spike doesn't widen the bounds after it
+        assert not outside[21:40].any()
+        assert upper[21] < 150
+
+    def test_growth_not_flagged(self):
+        lower, upper = self.bounds()
+        grown = self.values[40:]
+
+        with np.errstate(invalid='ignore'):
+            assert not ((grown < lower[40:]) | (grown > upper[40:])).any()
+
+    def test_min_history(self):
+        lower, upper = self.bounds()
+
+        for group_start in (0, 40):
+            first = slice(group_start, group_start + stats.MIN_HISTORY)
+            assert np.isnan(lower[first]).all()
+            assert np.isnan(upper[first]).all()
+        assert not np.isnan(lower[stats.MIN_HISTORY:40]).any()
+
+    def test_unused_records(self):
+        self.use[20] = False
+        self.values[20] = 1e9
+        lower, upper = self.bounds()
+
+        assert upper[21] < 150
+
+    def test_order_independent(self):
+        order = np.random.RandomState(1).permutation(len(self.values))
+        lower, upper = self.bounds(order)
+        expected_lower, expected_upper = self.bounds()
+
+        assert np.allclose(lower, expected_lower[order], equal_nan=True)
+        assert np.allclose(upper, expected_upper[order], equal_nan=True)
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+from functools import partial
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from .. import store
+
+
+class TestCountStore:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory, raw_counts, clean_counts):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+        self.database = os.path.join(self.output_folder, 'Counts.sqlite')
+        self.raw = raw_counts
+        self.clean = partial(clean_counts, output_folder=self.output_folder,
+                             site_options=dict(database=self.database))
+
+    def expected(self, data):
+        if 'Outage' not in data.columns:
+            data = data.assign(Outage=np.int8(0))
+        return data[['Site', 'Direction', 'DateTime', 'Count', 'ThreshCheck',
+                     'MissingDay', 'StdWarning', 'Valid', 'Outage']]\
+            .sort_values(['Site', 'DateTime', 'Direction'])\
+            .reset_index(drop=True)
+
+    def test_clean_to_store(self):
+        c = self.clean(self.raw)
+        assert self.database in c.written
+
+        result = store.CountStore(self.database).query()
+        pd.testing.assert_frame_equal(result, self.expected(c.data))
+
+    def test_query(self):
+        c = self.clean(self.raw)
+        cleaned = c.data
+
+        result = store.CountStore(self.database).query(
+            sites=['Site 1', 'Site 2'], start='2016-03-01',
+            end='2016-04-01', directions=['N'], valid_only=True
+        )
+        expected = cleaned[
+            (cleaned['DateTime'] >= '2016-03-01')
+            & (cleaned['DateTime'] < '2016-04-01')
+            & (cleaned['Direction'] == 'N') & cleaned['Valid']
+        ]
+        assert len(result) > 0
+        pd.testing.assert_frame_equal(result, self.expected(expected))
+
+    def test_rewrite_replaces(self):
+        self.clean(self.raw)
+        c = self.clean(self.raw)
+
+        result = store.CountStore(self.database).query()
+        assert len(result) == len(c.data)
+
+    def test_incremental_append(self):
+        is_2016 = self.raw['Date'].str.endswith('2016')
+        first = self.clean(self.raw[is_2016], incremental=True)
+        second = self.clean(self.raw, incremental=True)
+
+        result = store.CountStore(self.database).query()
+        expected = pd.concat([first.data, second.data], ignore_index=True)
+        pd.testing.assert_frame_equal(result, self.expected(expected))
+
+    def test_many_sites(self):
+        sites = ['Site {:04d}'.format(i) for i in range(2000)]
+        data = pd.DataFrame({
+            'Site': sites, 'Direction': 'N',
+            'DateTime': pd.Timestamp('2017-03-01'),
+            'Count': np.arange(len(sites)),
+            'ThreshCheck': 0, 'MissingDay': 0, 'StdWarning': 0,
+            'Valid': True,
+        })
+        counts = store.CountStore(self.database)
+        counts.write(data, 'Site', 'Direction', 'Count')
+
+        assert counts.sites() == sites
+        result = counts.query(sites=sites[::2])
+        assert list(result['Site']) == sites[::2]
+
+    def test_outages_stored(self):
+        data = self.raw.copy()
+        data.loc[1000:1300, 'Count'] = 0
+        c = self.clean(data, outage_hours=24)
+        assert c.data['Outage'].any()
+
+        result = store.CountStore(self.database).query()
+        pd.testing.assert_frame_equal(result, self.expected(c.data))
+
+    def test_old_store_upgraded(self):
+        conn = sqlite3.connect(self.database)
+        with conn:
+            conn.execute(
+                'CREATE TABLE counts (Site TEXT NOT NULL, '
+                'Direction TEXT NOT NULL, DateTime TEXT NOT NULL, '
+                'Count NUMERIC, ThreshCheck INTEGER, MissingDay INTEGER, '
+                'StdWarning INTEGER, Valid INTEGER)'
+            )
+            conn.execute('INSERT INTO counts VALUES '
+                         '(\'Site 0\', \'N\', \'2017-03-01T00:00:00\', '
+                         '5, 0, 0, 0, 1)')
+        conn.close()
+
+        c = self.clean(self.raw)
+        result = store.CountStore(self.database).query()
+        assert list(result.columns) == store.COLUMNS
+        assert (result['Outage'] == 0).all()
+        assert len(result) == len(c.data) + 1
@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from .. import summary
+
+
+class TestSummary:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        rng = np.random.RandomState(1)
+        self.data = pd.DataFrame({
+            'Site': rng.choice(['A', 'B'], 1000),
+            'Year': rng.choice([2016, 2017], 1000),
+            'Month': pd.Categorical(rng.choice(['January', 'February'], 1000),
+                                    categories=['January', 'February'],
+                                    ordered=True),
+            'Day': pd.Categorical(rng.choice(['Monday', 'Tuesday'], 1000),
+                                  categories=['Monday', 'Tuesday'],
+                                  ordered=True),
+            'Valid': rng.rand(1000) > 0.2,
+        })
+
+    def test_combinations(self):
+        assert summary.dimension_combinations(['Year', 'Month']) == [
+            ('Year',), ('Month',), ('Year', 'Month')
+        ]
+
+    def test_rollup(self):
+        result = summary.rollup(self.data, ['Site'])
+
+        # Year, Month, Day, and each pair and all three of them
+        assert len(result) == 2 * (2 + 2 + 2 + 4 + 4 + 4 + 8)
+
+        for combo in summary.dimension_combinations():
+            expected = self.data.groupby(['Site'] + list(combo))['Valid']\
+                                .agg(['sum', 'count'])
+            others = [d for d in summary.SUMMARY_DIMS if d not in combo]
+            level = result[(result[others] == 'All').all(axis='columns')
+                           & (result[list(combo)] != 'All')
+                           .all(axis='columns')]
+            level = level.set_index(['Site'] + list(combo))
+
+            assert len(level) == len(expected)
+            assert (level['Valid'] == expected['sum']).all()
+            assert (level['Valid'] + level['Not Valid']
+                    == expected['count']).all()
+
+    def test_combine_summaries(self):
+        whole = summary.rollup(self.data, ['Site'])
+        parts = [summary.rollup(self.data[:400], ['Site']),
+                 summary.rollup(self.data[400:], ['Site'])]
+        combined = summary.combine_summaries(parts, ['Site'])
+
+        keys = ['Site'] + summary.SUMMARY_DIMS
+        whole = whole.astype({'Year': str}).set_index(keys).sort_index()
+        combined = combined.astype({'Year': str}).set_index(keys)\
+                           .reindex(whole.index)
+
+        assert np.allclose(combined['Valid'], whole['Valid'])
+        assert np.allclose(combined['Valid_%'], whole['Valid_%'])
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from .. import synthetic, processor
+
+
+class TestSynthetic:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+
+    def test_generate_hourly(self):
+        data = synthetic.generate_counts(sites=2, years=1)
+
+        assert list(data.columns) == ['Site', 'Direction', 'Date', 'Hour',
+                                      'Count']
+        # 2016 is a leap year
+        assert len(data) == 2 * 366 * 24 * 2
+        assert (data['Count'] >= 0).all()
+        assert data.equals(synthetic.generate_counts(sites=2, years=1))
+
+    def test_generate_15_minute(self):
+        data = synthetic.generate_counts(years=1, start_year=2017,
+                                         interval=15)
+
+        assert 'Time' in data.columns
+        assert len(data) == 365 * 96 * 2
+        assert data['Time'].iloc[2] == '00:15:00'
+
+    def test_bad_interval(self):
+        with pytest.raises(ValueError):
+            synthetic.generate_counts(interval=30)
+
+    def test_faults(self):
+        data = synthetic.generate_counts(sites=3, zero_days=0.05,
+                                         spikes=0, low_counts=0)
+        daily = data.groupby(['Site', 'Date'])['Count'].sum()
+        assert (daily == 0).mean() == pytest.approx(0.05, abs=0.02)
+
+        clean = synthetic.generate_counts(sites=3, zero_days=0, spikes=0,
+                                          low_counts=0)
+        assert (clean.groupby(['Site', 'Date'])['Count'].sum() > 0).all()
+
+    def test_write_dataset_cleans(self):
+        settings = synthetic.write_dataset(self.output_folder, sites=2)
+        thresholds = processor.Thresholds(
+            path_to_csv=settings['path_to_csv'],
+            site_list=settings['site_list']
+        )
+        c = processor.CountSite(
+            os.path.join(settings['input_folder'], 'Site 1.csv'),
+            settings['output_folder'], site_col=settings['site_col'],
+            count_col=settings['count_col'], dir_col=settings['dir_col'],
+            date_col=settings['date_col'], time_col=settings['time_col'],
+            hour_only=settings['hour_only'], thresholds=thresholds
+        )
+        c.clean_data()
+
+        # Faults are found
+        assert (c.data['ThreshCheck'] == -1).any()
+        assert (c.data['MissingDay'] == 1).any()
+        assert c.data['Valid'].mean() > 0.9
+        assert os.path.isfile(os.path.join(settings['input_folder'],
+                                           'Site 2.csv'))
@@ -17,3 +17,27 @@ class TestUtilities:
         )
 
         assert os.path.isdir(str(self.output_folder.join('Test')))
+
+    def test_atomic_write(self):
+        path = str(self.output_folder.join('Test').join('file.txt'))
+
+        def write(text):
+            def writer(tmp_path):
+                assert tmp_path != path
+                with open(tmp_path, 'w') as f:
+                    f.write(text)
+            return writer
+
+        utilities.atomic_write(path, write('first'))
+
+        def fail(tmp_path):
+            write('second')(tmp_path)
+            raise ValueError('Interrupted')
+
+        with pytest.raises(ValueError):
+            utilities.atomic_write(path, fail)
+
+        # The failed write leaves neither its file nor a temporary one
+        with open(path) as f:
+            assert f.read() == 'first'
+        assert os.listdir(os.path.dirname(path)) == ['file.txt']
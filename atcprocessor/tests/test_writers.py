@@ -0,0 +1,106 @@
+import os
+
+import pytest
+import pandas as pd
+
+from .. import writers
+
+
+class TestWriters:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir_factory, raw_counts, clean_counts):
+        self.output_folder = str(tmpdir_factory.mktemp('Outputs'))
+        self.raw = raw_counts
+        self.clean_counts = clean_counts
+
+    def clean(self, data, output_format):
+        options = dict(output_format=output_format)
+        return self.clean_counts(data, self.output_folder,
+                                 site_options=options, incremental=True)
+
+    @pytest.mark.parametrize('output_format', writers.OUTPUT_FORMATS)
+    def test_round_trip(self, output_format):
+        if output_format == 'parquet':
+            pytest.importorskip('pyarrow')
+
+        c = self.clean(self.raw, output_format=output_format)
+        assert writers.find_cleaned(self.output_folder,
+                                    'Site 1') == output_format
+
+        result = writers.read_cleaned(self.output_folder, 'Site')
+        pd.testing.assert_frame_equal(result, c.data)
+
+    @pytest.mark.parametrize('output_format', ['csv.gz', 'parquet'])
+    def test_incremental_append(self, output_format):
+        if output_format == 'parquet':
+            pytest.importorskip('pyarrow')
+
+        is_2016 = self.raw['Date'].str.endswith('2016')
+        first = self.clean(self.raw[is_2016], output_format=output_format)
+        second = self.clean(self.raw, output_format=output_format)
+
+        result = writers.read_cleaned(self.output_folder, 'Site')
+        expected = pd.concat([first.data, second.data], ignore_index=True)
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_switch_format(self):
+        pytest.importorskip('pyarrow')
+
+        self.clean(self.raw, output_format='csv')
+        changed = self.raw.assign(Count=self.raw['Count'] + 1)
+        c = self.clean(changed, output_format='parquet')
+
+        assert not os.path.exists(writers.cleaned_path(self.output_folder,
+                                                       'Site 1', 'csv'))
+        assert writers.find_cleaned(self.output_folder,
+                                    'Site 1') == 'parquet'
+        result = writers.read_cleaned(self.output_folder, 'Site')
+        pd.testing.assert_frame_equal(result, c.data)
+
+    def test_newest_format_read(self):
+        data = pd.DataFrame({'Site': ['A'], 'Year': 2017, 'Count': [1]})
+        writers.write_cleaned(data, writers.cleaned_path(self.output_folder,
+                                                         'A', 'csv.gz'),
+                              'csv.gz')
+        # Left by an older version, and older than the csv.gz
+        old = writers.cleaned_path(self.output_folder, 'A', 'csv')
+        writers.write_cleaned(data.assign(Count=0), old, 'csv')
+        os.utime(old, (0, 0))
+
+        assert writers.find_cleaned(self.output_folder, 'A') == 'csv.gz'
+        assert list(writers.read_cleaned(self.output_folder,
+                                         'Site')['Count']) == [1]
+
+    def test_many_parquet_parts(self):
+        pytest.importorskip('pyarrow')
+
+        # A month at a time, as monthly incremental runs add them
+        dest = writers.cleaned_path(self.output_folder, 'A', 'parquet')
+        for month in range(1, 13):
+            data = pd.DataFrame({
+                'Site': ['A'], 'Year': 2017, 'Count': [month],
+                'DateTime': [pd.Timestamp(2017, month, 1)],
+            })
+            writers.write_cleaned(data, dest, 'parquet', append=month > 1)
+            # A removed part isn't written over by the next
+            if month == 6:
+                os.remove(os.path.join(dest, '2017', 'part-00002.parquet'))
+
+        result = writers.read_cleaned(self.output_folder, 'Site')
+        assert list(result['Count']) == [1, 2, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        assert result['DateTime'].is_monotonic_increasing
+
+    def test_parallel_sites(self):
+        data = pd.DataFrame({'Site': ['A', 'B', 'C'], 'Year': 2017,
+                             'Count': [1, 2, 3]})
+        written = writers.write_sites(data.groupby('Site'),
+                                      self.output_folder, workers=3)
+
+        assert written == [writers.cleaned_path(self.output_folder, s)
+                           for s in 'ABC']
+        assert list(writers.read_cleaned(self.output_folder,
+                                         'Site')['Count']) == [1, 2, 3]
+
+    def test_bad_format(self):
+        with pytest.raises(ValueError):
+            writers.check_output_format('xlsx')
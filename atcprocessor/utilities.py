@@ -1,8 +1,40 @@
 import os
+import threading
 
 
 def make_folder_if_necessary(filepath):
     parent_dir = os.path.dirname(filepath)
 
     if not os.path.exists(parent_dir):
-        os.makedirs(parent_dir)
+        try:
+            os.makedirs(parent_dir)
+        except OSError:
+            # Another process may have made the folder in the meantime
+            if not os.path.isdir(parent_dir):
+                raise
+
+
+def atomic_write(path, writer):
+    """
+    Write path by calling writer with a temporary path beside it, then
+    renaming that into place, so readers never see a partial file. The
+    temporary name is unique to the process and thread, so writers never
+    share one.
+    """
+    path = os.path.abspath(path)
+    make_folder_if_necessary(path)
+    tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+    try:
+        writer(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Nothing is left behind by a failed or interrupted write
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def observed_groups(grouped):
+    # Grouping on a categorical column also gives empty groups for any
+    # categories not present, which are of no use when writing outputs
+    return ((name, group) for name, group in grouped if not group.empty)
@@ -0,0 +1,219 @@
+import os
+import gzip
+import shutil
+from glob import glob
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+import pandas as pd
+
+from .dates import MONTHS, DAYS
+from .utilities import make_folder_if_necessary
+
+OUTPUT_FORMATS = ('csv', 'csv.gz', 'parquet')
+
+# Columns whose types are lost in CSV files, restored when reading back
+DATE_COLS = ('DateTime', 'Date')
+FLAG_DTYPES = {
+    'ThreshCheck': np.int8,
+    'MissingDay': np.int8,
+    'StdWarning': np.int8,
+    'Outage': np.int8,
+    'Valid': bool,
+}
+CATEGORIES = {'Month': MONTHS, 'Day': DAYS}
+
+
+def check_output_format(output_format):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            'output_format must be one of: ' + ', '.join(OUTPUT_FORMATS)
+        )
+
+    if output_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                'pyarrow is required to write Parquet files. Install it '
+                'with: pip install pyarrow'
+            )
+
+
+def cleaned_path(output_folder, site, output_format='csv'):
+    """
+    Where a site's cleaned data is written. Parquet is written as a folder
+    holding a file for each year.
+    """
+    name = '{} - Cleaned'.format(site)
+    if output_format != 'parquet':
+        name += '.' + output_format
+
+    return os.path.join(output_folder, site, name)
+
+
+def _part_number(path):
+    # Parts are numbered in the order written, which older versions didn't
+    # zero-pad
+    name = os.path.splitext(os.path.basename(path))[0]
+    return int(name.rsplit('-', 1)[-1])
+
+
+def write_cleaned(data, dest, output_format='csv', append=False):
+    """
+    Write one site's cleaned data, or add it to what is already there.
+    Returns the files written.
+    """
+    if output_format == 'csv':
+        make_folder_if_necessary(dest)
+        data.to_csv(dest, mode='a' if append else 'w', header=not append,
+                    index=False)
+        return [dest]
+
+    if output_format == 'csv.gz':
+        make_folder_if_necessary(dest)
+        # Appending adds another gzip member, which reads back as one file.
+        # pandas reopens named file handles itself, so is given none.
+        with gzip.open(dest, 'at' if append else 'wt', newline='') as f:
+            f.write(data.to_csv(header=not append, index=False))
+        return [dest]
+
+    # Each year is a folder of Parquet files, and appending adds a file
+    if not append and os.path.isdir(dest):
+        shutil.rmtree(dest)
+
+    written = []
+    for year, year_data in data.groupby('Year'):
+        folder = os.path.join(dest, str(int(year)))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        parts = [_part_number(p)
+                 for p in glob(os.path.join(folder, '*.parquet'))]
+        path = os.path.join(folder, 'part-{:05d}.parquet'.format(
+            max(parts) + 1 if parts else 0
+        ))
+        year_data.reset_index(drop=True).to_parquet(path, engine='pyarrow')
+        written.append(path)
+
+    return written
+
+
+def remove_other_formats(output_folder, site, output_format):
+    """
+    Delete a site's cleaned data in formats other than output_format, so
+    data left from a run in another format is never read in its place.
+    """
+    for other in OUTPUT_FORMATS:
+        if other == output_format:
+            continue
+        path = cleaned_path(output_folder, site, other)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def write_sites(sites, output_folder, output_format='csv', append_sites=(),
+                workers=1):
+    """
+    Write the cleaned data of each (site, data) in sites, appending for
+    those in append_sites. Sites are written across workers threads, which
+    helps most with csv.gz and Parquet as compressing releases the GIL.
+    Returns the files written, in site order.
+    """
+    sites = list(sites)
+    for site, _ in sites:
+        if site not in append_sites:
+            remove_other_formats(output_folder, site, output_format)
+
+    jobs = [(data, cleaned_path(output_folder, site, output_format),
+             output_format, site in append_sites) for site, data in sites]
+
+    if workers > 1 and len(jobs) > 1:
+        pool = ThreadPool(min(workers, len(jobs)))
+        try:
+            results = pool.starmap(write_cleaned, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [write_cleaned(*job) for job in jobs]
+
+    return [path for written in results for path in written]
+
+
+def _modified(path):
+    # A Parquet folder changes when any of its files do
+    if os.path.isdir(path):
+        return max([os.path.getmtime(p)
+                    for p in glob(os.path.join(path, '*', '*.parquet'))]
+                   + [os.path.getmtime(path)])
+    return os.path.getmtime(path)
+
+
+def find_cleaned(output_folder, site):
+    """
+    Format of a site's cleaned data, or None if there isn't any. Writing
+    removes other formats, but where an older version left more than one
+    the most recently written is used.
+    """
+    found = [f for f in OUTPUT_FORMATS
+             if os.path.exists(cleaned_path(output_folder, site, f))]
+    if not found:
+        return None
+
+    return max(found, key=lambda f: _modified(
+        cleaned_path(output_folder, site, f)
+    ))
+
+
+def _read_site(output_folder, site, output_format):
+    path = cleaned_path(output_folder, site, output_format)
+    if output_format != 'parquet':
+        return pd.read_csv(path)
+
+    parts = sorted(glob(os.path.join(path, '*', '*.parquet')),
+                   key=lambda p: (int(os.path.basename(os.path.dirname(p))),
+                                  _part_number(p)))
+    return pd.concat([pd.read_parquet(p, engine='pyarrow') for p in parts],
+                     ignore_index=True, sort=False)
+
+
+def read_cleaned(output_folder, site_col, sites=None):
+    """
+    Cleaned data of the given sites, or of every site in output_folder, in
+    whichever format each was written, with the types it had when cleaned.
+    """
+    if sites is None:
+        sites = sorted(
+            s for s in os.listdir(output_folder)
+            if os.path.isdir(os.path.join(output_folder, s))
+            and find_cleaned(output_folder, s)
+        )
+
+    frames = []
+    for site in sites:
+        output_format = find_cleaned(output_folder, site)
+        if output_format is None:
+            raise ValueError('No cleaned data found for {}'.format(site))
+        frames.append(_read_site(output_folder, site, output_format))
+
+    if not frames:
+        raise ValueError(
+            'No cleaned data found in {}'.format(output_folder)
+        )
+    data = pd.concat(frames, ignore_index=True, sort=False)
+
+    data[site_col] = data[site_col].astype(str)
+    for col in DATE_COLS:
+        if col in data.columns:
+            data[col] = pd.to_datetime(data[col])
+    for col, dtype in FLAG_DTYPES.items():
+        if col in data.columns:
+            data[col] = data[col].astype(dtype)
+    for col, categories in CATEGORIES.items():
+        if col in data.columns:
+            data[col] = pd.Categorical(data[col], categories=categories,
+                                       ordered=True)
+
+    return data
@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+
+from atcprocessor.stats import WEEK, rolling_bounds
+
+
+class RollingBaseline:
+    """
+    rolling_bounds on two years of hourly counts in two directions, for
+    tens to hundreds of sites. Records are either in time order for each
+    site, as read from count files, or shuffled. Time per record should
+    stay level as sites are added to ordered records; shuffled records
+    need a full sort first.
+    """
+    params = ([10, 100, 400], ['ordered', 'shuffled'])
+    param_names = ['sites', 'order']
+    years = 2
+
+    def setup(self, sites, order):
+        hours = 24 * 7 * 52 * self.years
+        rng = np.random.RandomState(0)
+        # One group per site, direction, hour of the week
+        groups = sites * 2 * 24 * 7
+        records = hours * sites * 2
+        self.ids = np.repeat(np.arange(groups), records // groups)
+        self.times = np.tile(np.arange(records // groups) * WEEK, groups)
+        self.values = rng.poisson(100, records).astype(np.float64)
+        self.use = np.ones(records, dtype=bool)
+
+        if order == 'ordered':
+            positions = np.lexsort((self.times, self.ids // (2 * 24 * 7)))
+        else:
+            positions = rng.permutation(records)
+        self.ids, self.times = self.ids[positions], self.times[positions]
+        self.values = self.values[positions]
+
+    def time_rolling_bounds(self, sites, order):
+        rolling_bounds(self.ids, self.times, self.values, self.use, 8, 2)
+
+
+if __name__ == '__main__':
+    benchmark = RollingBaseline()
+    print('{:>8}{:>10}{:>12}{:>12}{:>14}'.format(
+        'sites', 'order', 'records', 'seconds', 'ns/record'))
+    for order in benchmark.params[1]:
+        for sites in benchmark.params[0]:
+            benchmark.setup(sites, order)
+            start = time.perf_counter()
+            benchmark.time_rolling_bounds(sites, order)
+            seconds = time.perf_counter() - start
+            print('{:>8}{:>10}{:>12}{:>12.3f}{:>14.0f}'.format(
+                sites, order, len(benchmark.values), seconds,
+                seconds / len(benchmark.values) * 1e9
+            ))
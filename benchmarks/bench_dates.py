@@ -0,0 +1,50 @@
+import calendar
+
+import pandas as pd
+
+from atcprocessor import dates
+
+from .common import scaled_test_data, compare
+
+
+def legacy_calendar_fields(values):
+    # Date handling as it was before atcprocessor.dates, parsing and naming
+    # every row
+    parsed = pd.to_datetime(values)
+    return {
+        'Year': parsed.dt.year,
+        'Month': pd.Categorical(parsed.dt.month_name(),
+                                categories=calendar.month_name[1:],
+                                ordered=True),
+        'WeekNumber': parsed.dt.week,
+        'Day': pd.Categorical(parsed.dt.weekday_name,
+                              categories=calendar.day_name, ordered=True),
+    }
+
+
+class DateDerivation:
+    # The 35k row test file scaled up 100 times
+    scale = 100
+    timeout = 600
+
+    def setup(self):
+        if not hasattr(self, 'values'):
+            self.values = scaled_test_data(self.scale)['Date']
+
+    def time_legacy(self):
+        legacy_calendar_fields(self.values)
+
+    def time_unique_dates(self):
+        dates.calendar_fields(dates.parse_dates(self.values))
+
+    def time_unique_dates_explicit_format(self):
+        dates.calendar_fields(dates.parse_dates(self.values, '%d/%m/%Y'))
+
+    def time_unique_dates_sniffed_format(self):
+        dates.calendar_fields(dates.parse_dates(self.values, dates.SNIFF))
+
+
+if __name__ == '__main__':
+    compare(DateDerivation(), 'time_legacy',
+            ['time_unique_dates', 'time_unique_dates_explicit_format',
+             'time_unique_dates_sniffed_format'], repeat=1)
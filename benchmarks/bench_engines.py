@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+
+import pandas as pd
+
+from atcprocessor import processor, synthetic
+
+from .common import compare, measure
+
+
+class CleaningEngines:
+    """
+    clean_data with the long and dense engines on generated hourly counts.
+    Cleaned data is written as Parquet where pyarrow is installed, as
+    writing CSV takes far longer than the checks themselves. The engines
+    must give the same cleaned data.
+    """
+    sites = 20
+    years = 2
+
+    def setup(self):
+        if not hasattr(self, 'raw'):
+            folder = tempfile.mkdtemp()
+            settings = synthetic.write_dataset(folder, sites=self.sites,
+                                               years=self.years,
+                                               files_per_site=False)
+            self.thresholds = processor.Thresholds(
+                path_to_csv=settings['path_to_csv'],
+                site_list=settings['site_list']
+            )
+            self.raw = synthetic.generate_counts(sites=self.sites,
+                                                 years=self.years)
+            shutil.rmtree(folder, ignore_errors=True)
+
+            try:
+                import pyarrow  # noqa: F401
+                self.output_format = 'parquet'
+            except ImportError:
+                self.output_format = 'csv'
+
+        self.output_folder = tempfile.mkdtemp()
+
+    def clean(self, engine):
+        c = processor.CountSite(self.raw.copy(), self.output_folder,
+                                site_col='Site', count_col='Count',
+                                dir_col='Direction', date_col='Date',
+                                time_col='Hour', hour_only=True,
+                                thresholds=self.thresholds,
+                                output_format=self.output_format)
+        c.clean_data(engine=engine)
+        shutil.rmtree(self.output_folder, ignore_errors=True)
+        return c
+
+    def time_long(self):
+        self.clean('long')
+
+    def time_dense(self):
+        self.clean('dense')
+
+    def peakmem_long(self):
+        self.clean('long')
+
+    def peakmem_dense(self):
+        self.clean('dense')
+
+
+if __name__ == '__main__':
+    benchmark = CleaningEngines()
+    benchmark.setup()
+    results = dict()
+    for engine in processor.CLEANING_ENGINES:
+        benchmark.setup()
+        seconds, peak = measure(
+            lambda: results.__setitem__(engine, benchmark.clean(engine))
+        )
+        print('{:<8}{:>10.3f}s{:>10.1f} MB peak'.format(
+            engine, seconds, peak / 1024 ** 2))
+
+    pd.testing.assert_frame_equal(results['dense'].data,
+                                  results['long'].data)
+    print('Cleaned data is identical')
+
+    compare(benchmark, 'time_long', ['time_dense'])
@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from atcprocessor.outages import find_outages
+
+
+class OutageDetection:
+    """
+    find_outages on 90 days of hourly counts in two directions, for
+    hundreds to thousands of sites. Time per record should stay level as
+    sites are added.
+    """
+    params = [100, 1000, 4000]
+    param_names = ['sites']
+    days = 90
+
+    def setup(self, sites):
+        hours = 24 * self.days
+        times = pd.date_range('2017-01-01', periods=hours, freq='H').values
+        names = np.array(['Site {}'.format(i) for i in range(sites)],
+                         dtype=object)
+        rng = np.random.RandomState(0)
+        self.data = pd.DataFrame({
+            'Site': np.repeat(names, 2 * hours),
+            'Direction': np.tile(np.repeat(['N', 'S'], hours), sites),
+            'DateTime': np.tile(times, 2 * sites),
+            'Count': rng.poisson(3, 2 * hours * sites),
+        })
+
+    def time_find_outages(self, sites):
+        find_outages(self.data, 'Site', 'Direction', 'Count', 4)
+
+
+if __name__ == '__main__':
+    benchmark = OutageDetection()
+    print('{:>8}{:>12}{:>12}{:>14}'.format('sites', 'records', 'seconds',
+                                            'ns/record'))
+    for sites in benchmark.params:
+        benchmark.setup(sites)
+        start = time.perf_counter()
+        benchmark.time_find_outages(sites)
+        seconds = time.perf_counter() - start
+        print('{:>8}{:>12}{:>12.3f}{:>14.0f}'.format(
+            sites, len(benchmark.data), seconds,
+            seconds / len(benchmark.data) * 1e9
+        ))
@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from atcprocessor import processor
+
+from .common import scaled_test_data, compare
+
+
+class ScatterRendering:
+    scale = 8
+    graph_workers = os.cpu_count() or 1
+
+    def setup(self):
+        if hasattr(self, 'count_site'):
+            return
+
+        self.output_folder = tempfile.mkdtemp()
+        data = scaled_test_data(self.scale)
+        site_list = StringIO('Site,Category\n' + ''.join(
+            '{},1\n'.format(s) for s in data['Site'].unique()
+        ))
+        thresholds = processor.Thresholds(StringIO('Category,Low,High\n'
+                                                   '1,30,5000\n'),
+                                          processor.SiteList(site_list))
+        self.count_site = processor.CountSite(
+            data, self.output_folder,
+            site_col='Site', count_col='Count', dir_col='Direction',
+            date_col='Date', time_col='Hour', hour_only=True,
+            thresholds=thresholds
+        )
+        self.count_site.clean_data()
+
+    def teardown(self):
+        shutil.rmtree(self.output_folder, ignore_errors=True)
+
+    def time_serial(self):
+        self.count_site.graph_workers = 1
+        self.count_site.cleaned_scatter()
+
+    def time_parallel(self):
+        self.count_site.graph_workers = self.graph_workers
+        self.count_site.cleaned_scatter()
+
+
+if __name__ == '__main__':
+    compare(ScatterRendering(), 'time_serial', ['time_parallel'])
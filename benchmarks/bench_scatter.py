@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from atcprocessor import processor
+
+from .common import TEST_SITE, compare
+
+
+class ScatterModes:
+    # Copies of each hour's records, standing in for 15 minute data
+    periods = 4
+
+    def setup(self):
+        if hasattr(self, 'data'):
+            return
+
+        self.output_folder = tempfile.mkdtemp()
+        data = pd.read_csv(TEST_SITE)
+        data = data[data['Date'].str.endswith('2016')]
+        dates = pd.to_datetime(data['Date'], format='%d/%m/%Y')
+        datetimes = dates + pd.to_timedelta(data['Hour'], unit='h')
+
+        rng = np.random.RandomState(1)
+        copies = []
+        for i in range(self.periods):
+            copies.append(pd.DataFrame({
+                'DateTime': datetimes + pd.Timedelta(minutes=15 * i),
+                'Count': data['Count'].values,
+                'Direction': data['Direction'].values,
+                'Status': pd.Categorical.from_codes(
+                    rng.choice(len(processor.STATUS_LABELS), len(data),
+                               p=[0.01, 0.02, 0.01, 0.9, 0.06]),
+                    categories=processor.STATUS_LABELS
+                ),
+            }))
+        data = pd.concat(copies, ignore_index=True)
+        data['ScatterColour'] = pd.Categorical.from_codes(
+            data['Status'].cat.codes, categories=processor.STATUS_COLOURS
+        )
+        self.data = data
+
+    def teardown(self):
+        shutil.rmtree(self.output_folder, ignore_errors=True)
+
+    def draw(self, mode):
+        from atcprocessor.graphs import yearly_scatter
+
+        dest = os.path.join(self.output_folder, '{}.png'.format(mode))
+        yearly_scatter(self.data, datetime_col='DateTime',
+                       value_col='Count', category_col='Status',
+                       colour_col='ScatterColour', dir_col='Direction',
+                       destination_path=dest, mode=mode)
+
+        # yearly_scatter adds the year to the file name
+        return os.path.getsize('_2016'.join(os.path.splitext(dest)))
+
+    def time_points(self):
+        self.draw('points')
+
+    def time_binned(self):
+        self.draw('binned')
+
+    def track_size_points(self):
+        return self.draw('points')
+
+    def track_size_binned(self):
+        return self.draw('binned')
+
+    track_size_points.unit = 'bytes'
+    track_size_binned.unit = 'bytes'
+
+
+if __name__ == '__main__':
+    benchmark = ScatterModes()
+    compare(benchmark, 'time_points', ['time_binned'])
+    for mode in ('points', 'binned'):
+        print('{:<36}{:>10.0f}kB'.format(
+            'size_' + mode, benchmark.draw(mode) / 1024))
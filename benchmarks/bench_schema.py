@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from atcprocessor import schema
+
+from .common import TEST_SITE, compare
+
+
+class SchemaInspection:
+    """
+    Inspecting 500 input files of a month of counts each: one file at a
+    time, on threads, and again with every file cached. Reading the first
+    line of one file, as the GUI used to, is the baseline.
+    """
+    files = 500
+
+    def setup(self):
+        if not hasattr(self, 'folder'):
+            self.folder = tempfile.mkdtemp()
+            data = pd.read_csv(TEST_SITE, nrows=24 * 31 * 2)
+            self.paths = []
+            for i in range(self.files):
+                path = os.path.join(self.folder, 'Site {}.csv'.format(i))
+                data.assign(Site='Site {}'.format(i))\
+                    .to_csv(path, index=False)
+                self.paths.append(path)
+
+            self.cache = schema.SchemaCache(
+                os.path.join(self.folder, schema.SCHEMA_CACHE_NAME)
+            )
+            schema.inspect_files(self.paths, date_col='Date',
+                                 cache=self.cache)
+
+    def teardown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def time_first_header(self):
+        with open(self.paths[0]) as f:
+            f.readline().split(',')
+
+    def time_serial(self):
+        schema.inspect_files(self.paths, date_col='Date', workers=1)
+
+    def time_threads(self):
+        schema.inspect_files(self.paths, date_col='Date')
+
+    def time_cached(self):
+        schema.inspect_files(self.paths, date_col='Date', cache=self.cache)
+
+
+if __name__ == '__main__':
+    benchmark = SchemaInspection()
+    compare(benchmark, 'time_serial', ['time_threads', 'time_cached',
+                                       'time_first_header'])
+    benchmark.teardown()
@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import itertools
+
+from atcprocessor import processor, synthetic
+
+from .common import measure
+
+
+class Stages:
+    """
+    Time and peak memory of each CountSite stage on generated data, from
+    one site up, for hourly and 15 minute counts.
+    """
+    params = [[1, 10], [60, 15]]
+    param_names = ['sites', 'interval']
+    years = 2
+    number = 1
+    repeat = 3
+    timeout = 1200
+
+    def setup_cache(self):
+        return self.make_datasets(tempfile.mkdtemp())
+
+    def make_datasets(self, folder):
+        datasets = dict()
+        for sites, interval in itertools.product(*self.params):
+            datasets[sites, interval] = synthetic.write_dataset(
+                os.path.join(folder, '{} sites {}'.format(sites, interval)),
+                sites=sites, years=self.years, interval=interval,
+                files_per_site=False
+            )
+        return datasets
+
+    def setup(self, datasets, sites, interval):
+        self.settings = datasets[sites, interval]
+        self.output_folder = tempfile.mkdtemp()
+        self.thresholds = processor.Thresholds(
+            path_to_csv=self.settings['path_to_csv'],
+            site_list=self.settings['site_list']
+        )
+
+        self.count_site = self.load()
+        self.raw = self.count_site.data.copy()
+        self.count_site.clean_data()
+        self.cleaned = self.count_site.data
+
+    def teardown(self, datasets, sites, interval):
+        shutil.rmtree(self.output_folder, ignore_errors=True)
+
+    def load(self):
+        return processor.CountSite(
+            os.path.join(self.settings['input_folder'], 'All Sites.csv'),
+            self.output_folder, site_col=self.settings['site_col'],
+            count_col=self.settings['count_col'],
+            dir_col=self.settings['dir_col'],
+            date_col=self.settings['date_col'],
+            time_col=self.settings['time_col'],
+            hour_only=self.settings['hour_only'], thresholds=self.thresholds
+        )
+
+    def clean(self):
+        self.count_site.data = self.raw.copy()
+        self.count_site.clean_data()
+
+    def with_cleaned(self, method, *args, **kwargs):
+        self.count_site.data = self.cleaned.copy()
+        getattr(self.count_site, method)(*args, **kwargs)
+
+    def time_init(self, *params):
+        self.load()
+
+    def peakmem_init(self, *params):
+        self.load()
+
+    def time_clean_data(self, *params):
+        self.clean()
+
+    def peakmem_clean_data(self, *params):
+        self.clean()
+
+    def time_summarise_cleaned_data(self, *params):
+        self.with_cleaned('summarise_cleaned_data')
+
+    def peakmem_summarise_cleaned_data(self, *params):
+        self.with_cleaned('summarise_cleaned_data')
+
+    def time_cleaned_scatter(self, *params):
+        self.with_cleaned('cleaned_scatter')
+
+    def time_cleaned_scatter_points(self, *params):
+        self.with_cleaned('cleaned_scatter', mode='points')
+
+    def time_facet_grids(self, *params):
+        self.with_cleaned('facet_grids')
+
+    def time_produce_cal_plots(self, *params):
+        self.with_cleaned('produce_cal_plots')
+
+
+if __name__ == '__main__':
+    benchmark = Stages()
+    folder = tempfile.mkdtemp()
+    datasets = benchmark.make_datasets(folder)
+    methods = sorted(m for m in dir(benchmark) if m.startswith('time_'))
+
+    print('{:<32}{:>8}{:>10}{:>12}{:>12}'.format(
+        'stage', 'sites', 'interval', 'seconds', 'peak MB'))
+    for params in itertools.product(*benchmark.params):
+        benchmark.setup(datasets, *params)
+        for method in methods:
+            try:
+                seconds, peak = measure(getattr(benchmark, method))
+            except Exception as e:
+                print('{:<32}{:>8}{:>10}  failed: {}'.format(
+                    method[5:], params[0], params[1], e))
+                continue
+            print('{:<32}{:>8}{:>10}{:>12.3f}{:>12.1f}'.format(
+                method[5:], params[0], params[1], seconds, peak / 1024 ** 2
+            ))
+        benchmark.teardown(datasets, *params)
+
+    shutil.rmtree(folder, ignore_errors=True)
@@ -0,0 +1,63 @@
+import os
+import sys
+import subprocess
+import timeit
+
+from .common import TEST_FILES
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+
+IMPORT = 'import atcprocessor.processor\n'
+
+CLEAN_ONLY = IMPORT + '''
+import os
+import tempfile
+from atcprocessor import processor
+
+test_files = {test_files!r}
+thresholds = processor.Thresholds(
+    path_to_csv=os.path.join(test_files, 'thresholds.csv'),
+    site_list=os.path.join(test_files, 'site list.csv')
+)
+processor.CountSite(
+    os.path.join(test_files, 'sites', 'Site 1 Dummy Data.csv'),
+    tempfile.mkdtemp(), site_col='Site', count_col='Count',
+    dir_col='Direction', date_col='Date', time_col='Hour', hour_only=True,
+    thresholds=thresholds
+).clean_data()
+'''.format(test_files=os.path.abspath(TEST_FILES))
+
+# Seconds allowed for each, in a new interpreter. Cleaning-only runs should
+# not need to import the plotting libraries.
+TIME_BUDGETS = {
+    'import': 2.0,
+    'clean_only': 10.0,
+}
+
+
+class Startup:
+    # asv runs timeraw benchmarks in a new interpreter each time
+    def timeraw_import(self):
+        return IMPORT
+
+    def timeraw_clean_only(self):
+        return CLEAN_ONLY
+
+
+def time_fresh(code, repeat=3):
+    def run():
+        subprocess.check_call([sys.executable, '-c', code], cwd=ROOT,
+                              stdout=subprocess.DEVNULL)
+
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+if __name__ == '__main__':
+    over_budget = False
+    for name, code in (('import', IMPORT), ('clean_only', CLEAN_ONLY)):
+        t = time_fresh(code)
+        budget = TIME_BUDGETS[name]
+        print('{:<36}{:>10.3f}s{:>10.1f}s budget'.format(name, t, budget))
+        over_budget |= t > budget
+
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,65 @@
+import numpy as np
+
+from atcprocessor import dates
+from atcprocessor.stats import GroupStats, group_index
+
+from .common import scaled_test_data, compare
+
+SD_GROUP = ['Site', 'Hour', 'Day', 'Direction']
+
+
+def legacy_std_warning(data, std_range=2):
+    # The standard deviation check as it was before atcprocessor.stats:
+    # filter, group, merge back and drop
+    valid_data = data[data['Valid']]
+    hourly_avg = valid_data.groupby(SD_GROUP).agg({'Count': ['mean', 'std']})
+    hourly_avg.columns = hourly_avg.columns.droplevel()
+    hourly_avg.reset_index(inplace=True)
+    hourly_avg['StdMax'] = hourly_avg['mean'] + hourly_avg['std']*std_range
+    hourly_avg['StdMin'] = hourly_avg['mean'] - hourly_avg['std']*std_range
+    hourly_avg.drop(['mean', 'std'], axis='columns', inplace=True)
+
+    data = data.merge(hourly_avg)
+    data['StdWarning'] = (
+        data['Valid'] &
+        ((data['Count'] < data['StdMin']) | (data['Count'] > data['StdMax']))
+    ).astype(int)
+    return data.drop(['StdMax', 'StdMin'], axis='columns')
+
+
+def std_warning(data, std_range=2):
+    index = group_index(data, SD_GROUP)
+    stats = GroupStats.from_data(data, SD_GROUP, 'Count',
+                                 mask=data['Valid'], index=index)
+    std_min, std_max = stats.bounds(std_range)
+    positions = index[0]
+    counts = data['Count'].values
+    with np.errstate(invalid='ignore'):
+        outside = ((counts < std_min[positions])
+                   | (counts > std_max[positions]))
+    return (data['Valid'].values & outside).astype(np.int8)
+
+
+class StdCheck:
+    scale = 100
+
+    def setup(self):
+        if hasattr(self, 'data'):
+            return
+
+        data = scaled_test_data(self.scale)
+        data['Day'] = dates.calendar_fields(
+            dates.parse_dates(data['Date'], '%d/%m/%Y')
+        )['Day']
+        data['Valid'] = data['Count'] >= 30
+        self.data = data
+
+    def time_legacy(self):
+        legacy_std_warning(self.data)
+
+    def time_sufficient_stats(self):
+        std_warning(self.data)
+
+
+if __name__ == '__main__':
+    compare(StdCheck(), 'time_legacy', ['time_sufficient_stats'])
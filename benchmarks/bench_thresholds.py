@@ -0,0 +1,49 @@
+from io import StringIO
+
+import numpy as np
+
+from atcprocessor import processor
+
+from .common import scaled_test_data, compare
+
+
+class ThresholdLookup:
+    scale = 100
+
+    def setup(self):
+        if hasattr(self, 'data'):
+            return
+
+        data = scaled_test_data(self.scale)
+        data['Hour'] = data['Hour'].astype(int)
+        self.data = data
+        self.compact_data = data.assign(Site=data['Site'].astype('category'))
+
+        sites = data['Site'].unique()
+        site_list = StringIO('Site,Category\n' + ''.join(
+            '{},{}\n'.format(s, i % 3) for i, s in enumerate(sites)
+        ))
+        thresholds = StringIO('Category,Hour,Low,High\n' + ''.join(
+            '{},{},{},{}\n'.format(c, h, 10 + h, 5000)
+            for c in range(3) for h in range(24)
+        ))
+        self.thresholds = processor.Thresholds(
+            thresholds, processor.SiteList(site_list)
+        )
+
+    def time_merge(self):
+        combined = self.data.merge(self.thresholds.data, how='left')
+        np.asarray(combined['Low']), np.asarray(combined['High'])
+
+    def time_compiled_lookup(self):
+        self.thresholds.compiled.clear()
+        self.thresholds.compile('Site').lookup(self.data)
+
+    def time_compiled_lookup_compact(self):
+        self.thresholds.compiled.clear()
+        self.thresholds.compile('Site').lookup(self.compact_data)
+
+
+if __name__ == '__main__':
+    compare(ThresholdLookup(), 'time_merge',
+            ['time_compiled_lookup', 'time_compiled_lookup_compact'])
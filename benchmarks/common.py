@@ -0,0 +1,60 @@
+import os
+import time
+import timeit
+import tracemalloc
+
+import pandas as pd
+
+TEST_FILES = os.path.join(os.path.dirname(__file__), os.pardir,
+                          'atcprocessor', 'tests', 'test files')
+TEST_SITE = os.path.join(TEST_FILES, 'sites', 'Site 1 Dummy Data.csv')
+
+
+def scaled_test_data(scale):
+    """
+    The test site repeated scale times, each copy as a separate site.
+    """
+    data = pd.read_csv(TEST_SITE)
+    copies = []
+    for i in range(scale):
+        copy = data.copy()
+        copy['Site'] = 'Site {}'.format(i + 1)
+        copies.append(copy)
+
+    return pd.concat(copies, ignore_index=True)
+
+
+def compare(benchmark, baseline, candidates, repeat=3):
+    """
+    Time the baseline and candidate methods of a benchmark instance without
+    needing asv, printing the speed-up of each candidate.
+    """
+    def best_time(method):
+        times = []
+        for _ in range(repeat):
+            benchmark.setup()
+            times.append(timeit.timeit(getattr(benchmark, method), number=1))
+        return min(times)
+
+    base_time = best_time(baseline)
+    print('{:<36}{:>10.3f}s'.format(baseline, base_time))
+    for c in candidates:
+        t = best_time(c)
+        print('{:<36}{:>10.3f}s{:>10.1f}x'.format(c, t, base_time / t))
+
+
+def measure(func):
+    """
+    Run func once, returning the seconds taken and the peak memory
+    allocated through Python while it ran, in bytes.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return elapsed, peak
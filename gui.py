@@ -2,16 +2,23 @@ import os
 from collections import defaultdict
 from glob import glob
 import json
+import logging
+import threading
+import traceback
+from multiprocessing import Pool
 try:
     import tkinter as tk
     from tkinter import filedialog, ttk, messagebox
+    import queue
 except ImportError:
     import Tkinter as tk
     import tkFileDialog as filedialog
     import ttk
     import tkMessageBox as messagebox
+    import Queue as queue
 
-from atcprocessor import processor
+from atcprocessor import processor, batch, schema
+from atcprocessor.progress import Progress, Cancelled
 from atcprocessor.utilities import make_folder_if_necessary
 from atcprocessor.version import VERSION_TITLE
 
@@ -46,6 +53,13 @@ class ATCProcessorGUI(tk.Frame):
                 'Mark values outside acceptable standard '
                 'deviation range as invalid?', tk.BooleanVar()
             ),
+            'outage_hours': ('Hours of zero counts marked as an outage '
+                             '(0 for none)', tk.DoubleVar()),
+            'rolling_baseline': (
+                'Compare counts with recent weeks rather than the whole '
+                'period?', tk.BooleanVar()
+            ),
+            'baseline_weeks': ('Weeks in rolling baseline', tk.DoubleVar()),
         }
 
         # Defaults for advanced settings
@@ -56,6 +70,9 @@ class ATCProcessorGUI(tk.Frame):
         self.variables['valid_only'][1].set(True)
         self.variables['clean_data'][1].set(True)
         self.variables['outside_std_invalid'][1].set(False)
+        self.variables['outage_hours'][1].set(0.0)
+        self.variables['rolling_baseline'][1].set(False)
+        self.variables['baseline_weeks'][1].set(8.0)
 
         self.store = dict()
         self.store['File Inputs'] = FileInputs(
@@ -74,7 +91,8 @@ class ATCProcessorGUI(tk.Frame):
                     self.variables['dir_col'],
                     self.variables['date_col'],
                     self.variables['time_col']),
-            folder_variable=self.variables['input_folder'][1]
+            folder_variable=self.variables['input_folder'][1],
+            date_variable=self.variables['date_col'][1]
         )
 
         self.store['Columns'].grid(row=1, column=0, sticky='WE')
@@ -91,6 +109,19 @@ class ATCProcessorGUI(tk.Frame):
                                     command=lambda: self.run())
         self.run_button.grid(row=3, column=0, columnspan=2)
 
+        self.progress_bar = ProgressBar(self)
+        self.progress_bar.grid(row=4, column=0, columnspan=2, sticky='WE')
+
+        # Processing runs on a worker thread, which passes its progress and
+        # outcome back through this queue
+        self.updates = queue.Queue()
+        self.worker = None
+
+        # Drawing graphs on every CPU leaves the computer slow to use, so is
+        # only done when asked for
+        self.parallel_graphs = tk.BooleanVar()
+        self.parallel_graphs.set(False)
+
         # Set up menu bar for advanced settings
         menu_bar = tk.Menu(parent)
         parent.config(menu=menu_bar)
@@ -101,6 +132,8 @@ class ATCProcessorGUI(tk.Frame):
         # Add options to menu bar.
         options.add_command(label='Advanced Settings',
                             command=lambda: self.show_advanced_settings())
+        options.add_checkbutton(label='Draw Graphs on Every CPU',
+                                variable=self.parallel_graphs)
         options.add_separator()
         options.add_command(label='Load Settings',
                             command=lambda: self.load_settings())
@@ -149,6 +182,9 @@ class ATCProcessorGUI(tk.Frame):
                     self.variables['hour_only'],
                     self.variables['std_range'],
                     self.variables['outside_std_invalid'],
+                    self.variables['rolling_baseline'],
+                    self.variables['baseline_weeks'],
+                    self.variables['outage_hours'],
                     self.variables['by_direction'],
                     self.variables['valid_only']),
             title='Advanced Settings'
@@ -156,7 +192,9 @@ class ATCProcessorGUI(tk.Frame):
 
     def run(self):
         # TODO work out why the GUI suddenly changes size. Is this consistent?
-        # TODO implement a progress bar
+        if self.worker is not None:
+            return
+
         params = {
             param: var.get() for param, (name, var) in self.variables.items()
         }
@@ -186,41 +224,24 @@ class ATCProcessorGUI(tk.Frame):
         self.save_settings(use_dialogs=False, file_path=settings_dest)
 
         input_files = glob(os.path.join(params['input_folder'], '*.csv'))
-        if input_files:
-            for f in input_files:
-                try:
-                    c = processor.CountSite(
-                        data=f, thresholds=thresh,
-                        output_folder=params['output_folder'],
-                        site_col=params['site_col'],
-                        count_col=params['count_col'],
-                        dir_col=params['dir_col'],
-                        date_col=params['date_col'],
-                        time_col=params['time_col'],
-                        hour_only=params['hour_only']
-                    )
-                    if params['clean_data']:
-                        c.clean_data(
-                            std_range=params['std_range'],
-                            outside_std_invalid=params['outside_std_invalid'])
-                        c.summarise_cleaned_data()
-                        c.cleaned_scatter()
-                    c.facet_grids(valid_only=params['valid_only'],
-                                  by_direction=params['by_direction'])
-                    c.produce_cal_plots(valid_only=params['valid_only'],
-                                        by_direction=params['by_direction'])
-
-                except ValueError as v:
-                    messagebox.showerror(
-                        title='Input Error',
-                        message='The following issue has been found with input '
-                                'file [{}]:\n\n{}\n\nProcessing will terminate '
-                                'here.'.format(f, v)
-                    )
-                    return
+        if input_files and not self.check_schemas(input_files, params):
+            return
 
-            messagebox.showinfo(title='Finished',
-                                message='Processing complete')
+        if input_files:
+            progress = Progress(
+                lambda *update: self.updates.put(('progress', update))
+            )
+            graph_workers = (os.cpu_count() or 1) \
+                if self.parallel_graphs.get() else 1
+            self.worker = threading.Thread(
+                target=self.process_files,
+                args=(input_files, thresh, params, progress, graph_workers)
+            )
+            self.worker.daemon = True
+            self.run_button.config(state=tk.DISABLED)
+            self.progress_bar.start(progress)
+            self.worker.start()
+            self.after(100, self.check_updates)
         else:
             messagebox.showerror(
                 title='No files found',
@@ -228,6 +249,153 @@ class ATCProcessorGUI(tk.Frame):
                         'the folder'.format(params['input_folder'])
             )
 
+    def check_schemas(self, input_files, params):
+        # Kept in the output folder, so only new or changed files are read
+        # on later runs
+        cache = schema.SchemaCache(
+            os.path.join(params['output_folder'], schema.SCHEMA_CACHE_NAME)
+        )
+        report = schema.inspect_files(
+            input_files, date_col=params['date_col'],
+            required=schema.required_columns(params), cache=cache
+        )
+        if report.consistent:
+            return True
+
+        report_path = os.path.join(params['output_folder'],
+                                   schema.SCHEMA_REPORT_NAME)
+        report.write(report_path)
+        return messagebox.askyesno(
+            title='Input files differ',
+            message='{}\nEvery file is listed in\n{}\n\nProcess the files '
+                    'anyway?'.format(describe_mismatches(report), report_path)
+        )
+
+    def process_files(self, input_files, thresh, params, progress,
+                      graph_workers=1):
+        # Runs on the worker thread, so mustn't touch any widgets. One pool
+        # draws the graphs of every file.
+        graph_pool = Pool(graph_workers) if graph_workers > 1 else None
+        try:
+            for i, f in enumerate(input_files):
+                span = progress.span(i / len(input_files),
+                                     (i + 1) / len(input_files),
+                                     file=os.path.basename(f))
+                try:
+                    batch.process_file(f, thresh, params,
+                                       graph_workers=graph_workers,
+                                       graph_pool=graph_pool,
+                                       progress=span)
+                except ValueError as v:
+                    self.updates.put(('error', (f, v, None)))
+                    return
+                except Cancelled:
+                    raise
+                except Exception as e:
+                    # Anything else is a bug rather than a problem with the
+                    # input, so the traceback is kept for reporting it
+                    self.updates.put(('error', (f, e,
+                                                traceback.format_exc())))
+                    return
+            self.updates.put(('finished', None))
+        except Cancelled:
+            self.updates.put(('cancelled', None))
+        finally:
+            if graph_pool is not None:
+                graph_pool.close()
+                graph_pool.join()
+            self.updates.put(('done', None))
+
+    def check_updates(self):
+        done = False
+        while True:
+            try:
+                kind, content = self.updates.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == 'progress':
+                self.progress_bar.update_progress(*content)
+            elif kind == 'error':
+                f, error, details = content
+                if details is None:
+                    messagebox.showerror(
+                        title='Input Error',
+                        message='The following issue has been found with '
+                                'input file [{}]:\n\n{}\n\nProcessing will '
+                                'terminate here.'.format(f, error)
+                    )
+                else:
+                    logging.error('Processing %s failed:\n%s', f, details)
+                    messagebox.showerror(
+                        title='Processing Error',
+                        message='An unexpected error occurred processing '
+                                'input file [{}]:\n\n{}: {}\n\n{}\n'
+                                'Processing will terminate here.'.format(
+                                    f, type(error).__name__, error, details)
+                    )
+            elif kind == 'finished':
+                messagebox.showinfo(title='Finished',
+                                    message='Processing complete')
+            elif kind == 'cancelled':
+                messagebox.showinfo(title='Cancelled',
+                                    message='Processing was cancelled')
+            elif kind == 'done':
+                done = True
+
+        if done:
+            self.worker = None
+            self.progress_bar.stop()
+            self.run_button.config(state=tk.NORMAL)
+        else:
+            self.after(100, self.check_updates)
+
+
+class ProgressBar(tk.Frame):
+    def __init__(self, parent, *args, **kwargs):
+        super(ProgressBar, self).__init__(parent, *args, **kwargs)
+        self.progress = None
+
+        self.fraction = tk.DoubleVar()
+        self.status = tk.StringVar()
+
+        bar = ttk.Progressbar(self, variable=self.fraction, maximum=1.0)
+        bar.grid(row=0, column=0, sticky='WE')
+        self.cancel_button = tk.Button(self, text='Cancel',
+                                       state=tk.DISABLED,
+                                       command=lambda: self.cancel())
+        self.cancel_button.grid(row=0, column=1)
+        tk.Label(self, textvariable=self.status, anchor='w')\
+            .grid(row=1, column=0, columnspan=2, sticky='WE')
+
+        self.grid_columnconfigure(0, weight=1)
+
+    def start(self, progress):
+        self.progress = progress
+        self.fraction.set(0)
+        self.status.set('Starting')
+        self.cancel_button.config(state=tk.NORMAL)
+
+    def stop(self):
+        self.progress = None
+        self.status.set('')
+        self.cancel_button.config(state=tk.DISABLED)
+
+    def cancel(self):
+        # Takes effect once the current stage has finished
+        if self.progress is not None:
+            self.progress.cancel()
+            self.status.set('Cancelling after the current stage')
+            self.cancel_button.config(state=tk.DISABLED)
+
+    def update_progress(self, file, site, stage, fraction):
+        self.fraction.set(fraction)
+        if not self.progress.cancelled:
+            self.status.set('{}{}{}'.format(
+                file or '', ' [{}]'.format(site) if site else '',
+                ': {}'.format(stage) if stage else ''
+            ))
+
 
 class FileInputs(tk.LabelFrame):
     def __init__(self, parent, section_name, inputs, *args, **kwargs):
@@ -264,15 +432,31 @@ class FileInputs(tk.LabelFrame):
             entry.xview_moveto(1.0)
 
 
+def describe_mismatches(report, limit=10):
+    problems = [(s.path, p) for s, p in zip(report.schemas, report.problems)
+                if p]
+    lines = ['{}: {}'.format(os.path.basename(path), '; '.join(p))
+             for path, p in problems[:limit]]
+    if len(problems) > limit:
+        lines.append('and {} more'.format(len(problems) - limit))
+
+    return '{} of {} input files differ from the rest:\n\n{}\n'.format(
+        len(problems), len(report.schemas), '\n'.join(lines)
+    )
+
+
 class ColumnSelector(tk.LabelFrame):
     def __init__(self, parent, section_name, inputs, folder_variable,
-                 *args, **kwargs):
+                 date_variable=None, *args, **kwargs):
         super(ColumnSelector, self).__init__(parent, text=section_name,
                                              padx=5, pady=5,
                                              *args, **kwargs)
 
         self.folder_variable = folder_variable
+        self.date_variable = date_variable
         self.values = ['<Columns not loaded>']
+        # Files already read are only read again once they change
+        self.schema_cache = schema.SchemaCache()
 
         butt = tk.Button(self, text='Update Column Choices',
                          command=lambda: self.update_choices())
@@ -294,17 +478,18 @@ class ColumnSelector(tk.LabelFrame):
         box['values'] = self.values
 
     def update_choices(self):
-        # TODO validate that a file exists.
-        files = glob(os.path.join(self.folder_variable.get(), '*.csv'))
+        files = sorted(glob(os.path.join(self.folder_variable.get(),
+                                         '*.csv')))
         if files:
-            with open(files[0], 'r') as f:
-                columns = f.readline().split(',')
-
-            # Line will probably end with a carriage return
-            # TODO consider a single-line file (i.e. no data). What happens?
-            if columns[-1].endswith('\n'):
-                columns[-1] = columns[-1][:-1]
-            self.values = columns
+            date_col = self.date_variable.get() if self.date_variable \
+                else None
+            report = schema.inspect_files(files, date_col=date_col or None,
+                                          cache=self.schema_cache)
+            if report.columns:
+                self.values = report.columns
+            if not report.consistent:
+                messagebox.showwarning(title='Input files differ',
+                                       message=describe_mismatches(report))
         else:
             messagebox.showerror(title='No CSV files found',
                                  message='No CSV files could be found in the '
@@ -348,6 +533,7 @@ class AdvancedSettings(tk.Toplevel):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     root = tk.Tk()
     ATCProcessorGUI(root).grid(row=0, column=0, sticky='NEWS')
     root.grid_columnconfigure(0, weight=1)
@@ -9,5 +9,12 @@ setup(
     license='',
     author='Transport Scotland',
     author_email='',
-    description=''
+    description='',
+    extras_require={
+        'cache': ['pyarrow'],
+        'parquet': ['pyarrow'],
+    },
+    entry_points={
+        'console_scripts': ['atcprocessor=atcprocessor.cli:main'],
+    }
 )